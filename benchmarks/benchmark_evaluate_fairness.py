@@ -0,0 +1,124 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+import io
+import pandas as pd
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '../src'))
+
+import reference_utils
+from endpoint_probing import EndpointProber
+from evaluate_fairness import EvaluateFAIRness
+from reference_evaluate_fairness import EvaluateFAIRness as BaselineEvaluateFAIRness
+
+def score(fairness):
+    fairness.evaluate_findability()
+    fairness.evaluate_availability()
+    fairness.evaluate_interoperability()
+    fairness.evaluate_reusability()
+    fairness.calculate_FAIR_score()
+
+def run_baseline(quality_data_path, output_file_path, lodcloud_data_path):
+    '''
+        Run the baseline evaluation of a snapshot, it probes the endpoints row by row while scoring.
+
+        :return: seconds to read the snapshot, to probe (always 0, the probes are part of the scoring) and to score and save it.
+    '''
+    reference_utils.lodcloud_data_path = lodcloud_data_path
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        fairness = BaselineEvaluateFAIRness(quality_data_path, output_file_path)
+        loaded = time.perf_counter()
+        score(fairness)
+        fairness.save_file()
+        end = time.perf_counter()
+    return loaded - start, 0.0, end - loaded
+
+def run_vectorized(quality_data_path, output_file_path, lodcloud_data_path):
+    '''
+        Run the vectorized evaluation of a snapshot, with the endpoints probed once before scoring.
+
+        :return: seconds to read the snapshot, to probe the endpoints and to score and save it.
+    '''
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        fairness = EvaluateFAIRness(quality_data_path, output_file_path, lodcloud_data_path)
+        loaded = time.perf_counter()
+        fairness.probe_endpoints(EndpointProber())
+        probed = time.perf_counter()
+        score(fairness)
+        fairness.save_file()
+        end = time.perf_counter()
+    return loaded - start, probed - loaded, end - probed
+
+def fastest(run, repeat, *args):
+    '''
+        Fastest of repeat runs, by total time.
+    '''
+    return min((run(*args) for _ in range(repeat)), key=sum)
+
+def compare_outputs(baseline_output, vectorized_output):
+    '''
+        Compare the values of the two evaluations (the baseline writes F3-M as float, so the files are not byte-identical).
+        The baseline looks up the LOD Cloud with the raw KG id and misses the KGs whose id was rewritten by the split,
+        leaving their Ontology and DOI empty: only these KGs are expected to differ.
+
+        :return: number of KGs that differ, and True if they are all KGs missed by the baseline lookup.
+    '''
+    baseline = pd.read_csv(baseline_output)
+    vectorized = pd.read_csv(vectorized_output)
+    if list(baseline.columns) != list(vectorized.columns) or len(baseline) != len(vectorized):
+        return max(len(baseline), len(vectorized)), False
+    differs = ~((baseline == vectorized) | (baseline.isna() & vectorized.isna())).all(axis=1)
+    missed_by_baseline = baseline['Ontology'].isna()
+    return int(differs.sum()), bool((missed_by_baseline | ~differs).all())
+
+def benchmark(quality_data_paths, lodcloud_data_path, repeat):
+    '''
+        Compare the baseline and the vectorized EvaluateFAIRness on each snapshot.
+        Prints rows/second of the whole evaluation and of the scoring alone (without reading the snapshot and probing the endpoints),
+        the probing time of the vectorized evaluation and the KGs whose metrics differ (see compare_outputs).
+    '''
+    all_expected = True
+    print(f"{'snapshot':<30}{'rows':>8}{'baseline rows/s':>17}{'vectorized rows/s':>19}{'speedup':>9}"
+          f"{'baseline scoring rows/s':>25}{'vectorized scoring rows/s':>27}{'scoring speedup':>17}{'probe s':>9}{'KGs differing':>15}  expected")
+    with tempfile.TemporaryDirectory() as output_dir:
+        for quality_data_path in quality_data_paths:
+            name = os.path.basename(quality_data_path)
+            baseline_output = os.path.join(output_dir, f'baseline_{name}')
+            vectorized_output = os.path.join(output_dir, f'vectorized_{name}')
+
+            baseline_times = fastest(run_baseline, repeat, quality_data_path, baseline_output, lodcloud_data_path)
+            vectorized_times = fastest(run_vectorized, repeat, quality_data_path, vectorized_output, lodcloud_data_path)
+
+            with open(baseline_output, encoding='utf-8') as file:
+                rows = sum(1 for _ in file) - 1
+            differing, expected = compare_outputs(baseline_output, vectorized_output)
+            all_expected = all_expected and expected
+            baseline_time, vectorized_time = sum(baseline_times), sum(vectorized_times)
+            print(f"{name:<30}{rows:>8}{rows / baseline_time:>17.0f}{rows / vectorized_time:>19.0f}{baseline_time / vectorized_time:>8.1f}x"
+                  f"{rows / baseline_times[2]:>25.0f}{rows / vectorized_times[2]:>27.0f}{baseline_times[2] / vectorized_times[2]:>16.1f}x{vectorized_times[1]:>9.2f}{differing:>15}  {expected}")
+    return all_expected
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the vectorized FAIRness scoring against the baseline row-wise implementation.')
+    parser.add_argument('quality_data', nargs='+', help='KGHeartBeat quality CSV files (glob patterns are expanded)')
+    parser.add_argument('--lodcloud', default=os.path.join(here, '../data/lodcloud.json'), help='LOD Cloud dump matching the snapshots')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per implementation, the fastest is reported')
+    parser.add_argument('--with-probes', action='store_true', help='query the SPARQL endpoints instead of treating them all as offline')
+    args = parser.parse_args()
+
+    if not args.with_probes:
+        # Network probes would dominate the timings, both implementations treat every endpoint as offline
+        reference_utils.check_at_least_sparql_on = lambda sparql_url: 0
+        reference_utils.check_meta_in_sparql = lambda endpoint_url: 0
+        EndpointProber.check_sparql_on = lambda self, sparql_url, timeout: 0
+        EndpointProber.check_metadata_in_sparql = lambda self, endpoint_url, timeout: 0
+
+    quality_data_paths = sorted(path for pattern in args.quality_data for path in glob.glob(pattern))
+    sys.exit(0 if benchmark(quality_data_paths, os.path.abspath(args.lodcloud), args.repeat) else 1)
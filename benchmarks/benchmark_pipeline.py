@@ -0,0 +1,175 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout, ExitStack
+from datetime import datetime
+import io
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+from mock_sparql_server import MockSPARQLServer
+
+STAGES = ['generate', 'split', 'probe', 'evaluate', 'evaluate_chunks', 'correlate', 'spearman_ci']
+
+def get_rss_mb():
+    '''
+        Peak resident memory of this process in MB, None where the resource module is not available (Windows).
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10 # Bytes on macOS, KB on Linux
+
+def run_stage(stage, workspace, options):
+    '''
+        Run a stage of the pipeline on the synthetic data of the workspace, in a new process so that its peak memory is its own.
+        The data folder of the pipeline is the one next to its src/ folder, so the code runs from the copy in the workspace.
+
+        :return: dictionary with the wall and CPU seconds, the peak memory, the rows processed and the counters of the stage.
+    '''
+    sys.path.insert(0, os.path.join(workspace, 'src'))
+    os.chdir(os.path.join(workspace, 'src'))
+    import pipeline
+    import snapshot_store
+    from synthetic_data import SyntheticLODCloud
+    from calculate_correlation import spearman_ci
+
+    snapshot_files = pipeline.sort_by_date(pipeline.list_snapshots('../data/quality_data/kghb_output'))
+    no_render = {'workers': 0, 'dpi': None, 'image_format': 'png', 'render': False}
+    baseline_rss = get_rss_mb()
+    counters = {}
+    start, cpu_start = time.perf_counter(), time.process_time()
+    with redirect_stdout(io.StringIO()):
+        if stage == 'generate':
+            synthetic = SyntheticLODCloud(options['kgs'], options['sentinel_ratio'], endpoint_base_urls=options['endpoint_base_urls'], seed=options['seed'])
+            csv_files = synthetic.write('../data', options['snapshots'], options['change_ratio'], options['missing_ratio'])
+            rows = sum(sum(1 for _ in open(csv_file, encoding='utf-8')) - 1 for csv_file in csv_files)
+        elif stage == 'split':
+            pipeline.split_quality_data()
+            rows = sum(len(snapshot_store.read_snapshot(f'../data/quality_data/kghb_output/{snapshot_file}', usecols=['KG id'])) for snapshot_file in snapshot_files)
+        elif stage == 'probe':
+            for snapshot_file in snapshot_files:
+                for name, value in pipeline.probe_snapshot(snapshot_file, force=True).items():
+                    counters[name] = counters.get(name, 0) + value
+            rows = counters.get('network_probes', 0)
+        elif stage == 'evaluate':
+            kgs_by_topic = pipeline.load_kgs_by_topic()
+            topics = [topic for topic in kgs_by_topic if topic != 'all']
+            for snapshot_file in snapshot_files:
+                for name, value in pipeline.evaluate_subclouds(snapshot_file, topics, kgs_by_topic, force=True).items():
+                    if name != 'manifest':
+                        counters[name] = counters.get(name, 0) + value
+            rows = counters.get('evaluated_rows', 0)
+        elif stage == 'evaluate_chunks':
+            for snapshot_file in snapshot_files:
+                result = pipeline.evaluate_snapshot('all', snapshot_file, force=True, chunksize=options['chunksize'])
+                for name, value in result.items():
+                    if name != 'manifest':
+                        counters[name] = counters.get(name, 0) + value
+            rows = counters.get('evaluated_rows', 0)
+        elif stage == 'correlate':
+            for snapshot_file in snapshot_files:
+                pipeline.correlate_snapshot('all', snapshot_file, force=True, render_options=no_render)
+            rows = sum(len(snapshot_store.read_snapshot(f'../data/fairness_evaluation_results/all/{snapshot_file}', usecols=['KG id'])) for snapshot_file in snapshot_files)
+        elif stage == 'spearman_ci':
+            scores = snapshot_store.read_snapshot(f'../data/fairness_evaluation_results/all/{snapshot_files[0]}', usecols=['F score', 'FAIR score'])
+            spearman_ci(scores['F score'].to_numpy(dtype=float), scores['FAIR score'].to_numpy(dtype=float), n_bootstrap=options['bootstrap'], random_state=0)
+            rows = len(scores)
+        else:
+            raise ValueError(f"Unknown stage {stage}")
+    wall_seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+    return {'wall_seconds': wall_seconds, 'cpu_seconds': cpu_seconds, 'peak_rss_mb': get_rss_mb(), 'baseline_rss_mb': baseline_rss,
+            'rows': rows, 'rows_per_second': rows / wall_seconds if wall_seconds > 0 else None, 'counters': counters}
+
+def get_environment():
+    import numpy
+    import pandas
+    import scipy
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(), 'numpy': numpy.__version__,
+            'pandas': pandas.__version__, 'scipy': scipy.__version__, 'commit': commit}
+
+def benchmark(options, stages, workspace_root=None):
+    '''
+        Run the stages on synthetic data for each scale, each scale in its own workspace with its mock SPARQL servers
+        (one for each endpoint host, the prober limits the concurrent probes of each host).
+
+        :return: list of the results of each (scale, stage).
+    '''
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for n_kgs in options['kgs_scales']:
+        with tempfile.TemporaryDirectory(dir=workspace_root) as workspace, ExitStack() as servers:
+            hosts = [servers.enter_context(MockSPARQLServer(latency=options['latency'], failure_rate=options['failure_rate'], slow_rate=options['slow_rate'], slow_latency=options['slow_latency']))
+                     for _ in range(options['hosts'])]
+            stage_options = {**options, 'kgs': n_kgs, 'endpoint_base_urls': [server.base_url for server in hosts]}
+            shutil.copytree(os.path.join(here, '../src'), os.path.join(workspace, 'src'), ignore=shutil.ignore_patterns('__pycache__'))
+            for stage in STAGES:
+                if stage not in stages and stage != 'generate':
+                    continue
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_stage, (stage, workspace, stage_options))
+                if stage == 'probe':
+                    result['counters']['server_requests'] = sum(server.requests for server in hosts)
+                results.append({'kgs': n_kgs, 'stage': stage, **result})
+                print(f"{n_kgs:>9} {stage:<16}{result['wall_seconds']:>10.2f}{result['cpu_seconds']:>10.2f}{format_mb(result['peak_rss_mb']):>12}{result['rows']:>10}")
+    return results
+
+def format_mb(value):
+    return f'{value:.0f}' if value is not None else '-'
+
+def compare(results, baseline_file):
+    '''
+        Print the wall time of each (scale, stage) relative to the one in a previous results file.
+    '''
+    with open(baseline_file, encoding='utf-8') as file:
+        baseline = {(result['kgs'], result['stage']): result for result in json.load(file)['results']}
+    print(f"\nCompared with {baseline_file} (wall time, > 1 is slower)")
+    for result in results:
+        previous = baseline.get((result['kgs'], result['stage']))
+        if previous is not None and previous['wall_seconds'] > 0:
+            print(f"{result['kgs']:>9} {result['stage']:<16}{result['wall_seconds'] / previous['wall_seconds']:>9.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages on synthetic LOD Cloud data, with the SPARQL endpoints served locally.')
+    parser.add_argument('--kgs', type=int, nargs='+', default=[1000, 10000], help='number of KGs of each scale to run (e.g. 1000 100000 1000000)')
+    parser.add_argument('--snapshots', type=int, default=2)
+    parser.add_argument('--sentinel-ratio', type=float, default=0.2, help="share of the measurements missing ('-', '', '[]')")
+    parser.add_argument('--change-ratio', type=float, default=0.1, help='share of the KGs whose measurements change in each snapshot')
+    parser.add_argument('--missing-ratio', type=float, default=0.05, help='share of the KGs not analyzed in each snapshot')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds waited by the mock endpoints before every answer')
+    parser.add_argument('--failure-rate', type=float, default=0.1, help='share of the mock endpoints answering with a 500 status')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='share of the mock endpoints answering after --slow-latency seconds')
+    parser.add_argument('--slow-latency', type=float, default=2.0)
+    parser.add_argument('--hosts', type=int, default=8, help='mock SPARQL servers, the endpoints are spread over them as over distinct hosts')
+    parser.add_argument('--bootstrap', type=int, default=1000, help='bootstrap resamples of spearman_ci')
+    parser.add_argument('--chunksize', type=int, default=10000, help='rows of each chunk of the streaming evaluation (evaluate_chunks stage)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='stages to time, the data is always generated')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workspace', default=None, help='folder in which to create the temporary workspaces')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file in which to write the results')
+    parser.add_argument('--baseline', default=None, help='results file of a previous run to compare with')
+    args = parser.parse_args()
+
+    options = {'kgs_scales': args.kgs, 'snapshots': args.snapshots, 'sentinel_ratio': args.sentinel_ratio, 'change_ratio': args.change_ratio,
+               'missing_ratio': args.missing_ratio, 'latency': args.latency, 'failure_rate': args.failure_rate, 'slow_rate': args.slow_rate,
+               'slow_latency': args.slow_latency, 'hosts': args.hosts, 'bootstrap': args.bootstrap, 'chunksize': args.chunksize, 'seed': args.seed}
+    print(f"{'KGs':>9} {'stage':<16}{'wall s':>10}{'CPU s':>10}{'peak MB':>12}{'rows':>10}")
+    results = benchmark(options, args.stages, args.workspace)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({'created': datetime.now().isoformat(timespec='seconds'), 'environment': get_environment(), 'parameters': options, 'results': results}, file, indent=4)
+    print(f"Results written to {args.output}")
+    if args.baseline is not None:
+        compare(results, args.baseline)
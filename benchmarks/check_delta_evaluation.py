@@ -0,0 +1,65 @@
+import argparse
+import filecmp
+import io
+import os
+import sys
+import tempfile
+import time
+import zlib
+from contextlib import redirect_stdout
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '../src'))
+
+from endpoint_probing import EndpointProber
+from evaluate_fairness import EvaluateFAIRness, load_row_hashes
+
+def evaluate(quality_data_path, output_file_path, lodcloud_data_path, previous=None):
+    '''
+        Evaluate a snapshot, in delta mode if previous = (evaluation path, row hashes path) is given.
+
+        :return: (elapsed seconds, KGs reused).
+    '''
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        fairness = EvaluateFAIRness(quality_data_path, output_file_path, lodcloud_data_path)
+        reused = fairness.reuse_unchanged(previous[0], load_row_hashes(previous[1], 'check')) if previous is not None else 0
+        fairness.probe_endpoints(EndpointProber(max_workers=1))
+        fairness.evaluate_findability()
+        fairness.evaluate_availability()
+        fairness.evaluate_interoperability()
+        fairness.evaluate_reusability()
+        fairness.calculate_FAIR_score()
+        fairness.save_file()
+        fairness.save_row_hashes(f'{output_file_path}.json', 'check')
+    return time.perf_counter() - start, reused
+
+def check(previous_snapshot, snapshot, lodcloud_data_path):
+    '''
+        Evaluate the previous snapshot, then the snapshot both from scratch and in delta mode: the two results must be byte-identical.
+    '''
+    with tempfile.TemporaryDirectory() as output_dir:
+        previous_output = os.path.join(output_dir, 'previous.csv')
+        full_output = os.path.join(output_dir, 'full.csv')
+        delta_output = os.path.join(output_dir, 'delta.csv')
+        evaluate(previous_snapshot, previous_output, lodcloud_data_path)
+        full_time, _ = evaluate(snapshot, full_output, lodcloud_data_path)
+        delta_time, reused = evaluate(snapshot, delta_output, lodcloud_data_path, (previous_output, f'{previous_output}.json'))
+        with open(full_output, encoding='utf-8') as file:
+            rows = sum(1 for _ in file) - 1
+        identical = filecmp.cmp(full_output, delta_output, shallow=False)
+    print(f"{os.path.basename(snapshot)}: {reused} of {rows} KGs reused from {os.path.basename(previous_snapshot)}, full {full_time:.2f}s, delta {delta_time:.2f}s, identical: {identical}")
+    return identical
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check that the delta evaluation of a snapshot gives the same result of the full one.')
+    parser.add_argument('previous_snapshot', help='KGHeartBeat quality CSV of the previous snapshot')
+    parser.add_argument('snapshot', help='KGHeartBeat quality CSV of the snapshot to evaluate')
+    parser.add_argument('--lodcloud', default=os.path.join(here, '../data/lodcloud.json'), help='LOD Cloud dump matching the snapshots')
+    args = parser.parse_args()
+
+    # Reproducible probes: the reused KGs must get the same result they would get from the network
+    EndpointProber.check_sparql_on = lambda self, sparql_url, timeout: int(zlib.crc32(sparql_url.encode()) % 3 == 0)
+    EndpointProber.check_metadata_in_sparql = lambda self, endpoint_url, timeout: int(zlib.crc32(endpoint_url.encode()) % 2 == 0)
+
+    sys.exit(0 if check(args.previous_snapshot, args.snapshot, os.path.abspath(args.lodcloud)) else 1)
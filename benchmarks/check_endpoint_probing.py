@@ -0,0 +1,52 @@
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '../src'))
+
+from endpoint_probing import EndpointProber
+
+def slow_probe(self, url, timeout):
+    '''
+        Probe answered after probe_seconds (1 if it is answered within the timeout, 0 otherwise), without the network.
+    '''
+    time.sleep(min(probe_seconds, timeout))
+    return 1 if probe_seconds <= timeout else 0
+
+probe_seconds = 0.1
+
+def probe(endpoints, per_host_limit, deadline, timeout):
+    prober = EndpointProber(max_workers=len(endpoints) * 2, per_host_limit=per_host_limit, deadline=deadline, sparql_on_timeout=timeout, metadata_timeout=timeout)
+    with redirect_stdout(io.StringIO()):
+        results = prober.probe(endpoints)
+    return results, prober.expired_probes
+
+def check(endpoints_per_host):
+    '''
+        Probe many endpoints of the same host, one probe at a time: the probes queued for the host longer than their timeout
+        must not expire while the deadline is far, and the probes still queued when a short deadline passes must expire.
+    '''
+    endpoints = [f'http://same-host.example/{i}/sparql' for i in range(endpoints_per_host)]
+    queued = len(endpoints) * 2 * probe_seconds
+    results, expired = probe(endpoints, 1, 1000, queued / 4)
+    ok = expired == 0 and bool((results == 1).all().all())
+    print(f"{len(endpoints) * 2} probes queued on one host for {queued:.1f}s with a timeout of {queued / 4:.1f}s and a far deadline: {expired} expired, all answered: {ok}")
+
+    _, expired_by_deadline = probe(endpoints, 1, queued / 2, queued)
+    ok_deadline = 0 < expired_by_deadline < len(endpoints) * 2
+    print(f"Same probes with a deadline of {queued / 2:.1f}s: {expired_by_deadline} expired, as expected: {ok_deadline}")
+    return ok and ok_deadline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check that the probes waiting for a slot of their host expire only at the deadline.')
+    parser.add_argument('--endpoints', type=int, default=6, help='endpoints of the same host')
+    args = parser.parse_args()
+
+    EndpointProber.check_sparql_on = slow_probe
+    EndpointProber.check_metadata_in_sparql = slow_probe
+
+    sys.exit(0 if check(args.endpoints) else 1)
@@ -0,0 +1,132 @@
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import zlib
+from contextlib import redirect_stdout
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '../src'))
+
+import paths
+import pipeline
+from endpoint_probing import EndpointProber
+from mock_sparql_server import MockSPARQLServer
+from synthetic_data import SyntheticLODCloud
+
+def run_stages(kgs_by_topic, stages, **options):
+    '''
+        Run the stages in this process (the probes of the workers would not be stubbed), with the charts not rendered.
+
+        :return: (results, failed) of the task graph.
+    '''
+    no_render = {'workers': 0, 'dpi': None, 'image_format': 'png', 'render': False}
+    with redirect_stdout(io.StringIO()):
+        graph = pipeline.build_task_graph(kgs_by_topic, stages, render_options=no_render, **options)
+        results, failed = graph.run(1)
+        pipeline.update_manifest(results)
+    return results, failed
+
+def split_synthetic_data(data_root, n_kgs, n_snapshots):
+    '''
+        Write the synthetic LOD Cloud and snapshots in data_root, with the endpoints on a few hosts, and split them by topic.
+
+        :return: the topics, as loaded by the pipeline.
+    '''
+    SyntheticLODCloud(n_kgs, endpoint_base_urls=[f'http://host-{i}.example' for i in range(3)]).write(data_root, n_snapshots)
+    paths.set_roots(data_root)
+    with redirect_stdout(io.StringIO()):
+        pipeline.split_quality_data()
+    return pipeline.load_kgs_by_topic()
+
+def check_probe_once(data_root, n_kgs, n_snapshots):
+    '''
+        Split the synthetic snapshots, then evaluate them: the probe task of each snapshot probes every endpoint,
+        the evaluate tasks of the topics must find all of them in the probe cache.
+    '''
+    results, failed = run_stages(split_synthetic_data(data_root, n_kgs, n_snapshots), ['evaluate'])
+    probed = sum(result.get('network_probes', 0) for task_id, result in results.items() if task_id[0] == 'probe')
+    evaluate_probes = {task_id: result['network_probes'] for task_id, result in results.items() if task_id[0] == 'evaluate' and 'network_probes' in result}
+    ok = len(failed) == 0 and probed > 0 and len(evaluate_probes) > 0 and sum(evaluate_probes.values()) == 0
+    print(f"Probe tasks: {probed} network probes, {len(evaluate_probes)} evaluate tasks: {sum(evaluate_probes.values())} network probes, failed tasks: {failed}, ok: {ok}")
+    return ok
+
+def check_expired_not_recorded(data_root, n_kgs, n_snapshots):
+    '''
+        Evaluate the synthetic snapshots with the probes of one host expiring: the evaluations that used them must be neither
+        recorded as fresh in the manifest nor have row hashes, and the next run, without expired probes, must evaluate them again.
+    '''
+    kgs_by_topic = split_synthetic_data(data_root, n_kgs, n_snapshots)
+    run_probe = EndpointProber.run_probe
+    EndpointProber.run_probe = lambda self, endpoint_url, probe, deadline_at: self.expire_probe() if 'host-0' in endpoint_url else run_probe(self, endpoint_url, probe, deadline_at)
+    try:
+        results, failed = run_stages(kgs_by_topic, ['evaluate'])
+    finally:
+        EndpointProber.run_probe = run_probe
+    expired = {task_id for task_id, result in results.items() if task_id[0] == 'evaluate' and result.get('expired_probes', 0) > 0}
+    manifest = pipeline.Manifest()
+    recorded_fresh = [task_id for task_id in expired if manifest.is_fresh(*pipeline.get_evaluation_build(task_id[1], task_id[2]))]
+    row_hashes = [task_id for task_id in expired if os.path.exists(pipeline.get_row_hashes_file(task_id[1], task_id[2]))]
+
+    results, _ = run_stages(kgs_by_topic, ['evaluate'])
+    evaluated_again = {task_id for task_id, result in results.items() if task_id[0] == 'evaluate' and 'manifest' in result}
+    ok = len(failed) == 0 and len(expired) > 0 and len(recorded_fresh) == 0 and len(row_hashes) == 0 and expired <= evaluated_again
+    print(f"{len(expired)} evaluations with expired probes: {len(recorded_fresh)} recorded as fresh, {len(row_hashes)} with row hashes, "
+          f"{len(expired & evaluated_again)} evaluated again by the next run, ok: {ok}")
+    return ok
+
+def check_selected_topics_probed(data_root, n_kgs, n_snapshots):
+    '''
+        Evaluate only two topics: the probe tasks must probe the endpoints of these topics, not all the ones of the snapshots.
+    '''
+    import pandas as pd
+    kgs_by_topic = split_synthetic_data(data_root, n_kgs, n_snapshots)
+    topics = sorted(topic for topic in kgs_by_topic if topic != 'all')[:2]
+    results, failed = run_stages({topic: kgs_by_topic[topic] for topic in topics}, ['evaluate'])
+    probed = sum(result.get('network_probes', 0) for task_id, result in results.items() if task_id[0] == 'probe')
+    expected = 0
+    for snapshot_file in pipeline.list_snapshots(paths.data_path('quality_data', 'all')):
+        endpoint_urls = pd.concat([pd.read_csv(paths.data_path('quality_data', topic, snapshot_file), usecols=['SPARQL endpoint URL'])['SPARQL endpoint URL']
+                                   for topic in topics if os.path.exists(paths.data_path('quality_data', topic, snapshot_file))])
+        expected += len(endpoint_urls.dropna().loc[lambda urls: urls != ''].unique()) * 2
+    ok = len(failed) == 0 and probed == expected
+    print(f"Topics {topics}: {probed} network probes in the probe tasks, {expected} for their endpoints, ok: {ok}")
+    return ok
+
+def check_fresh_data_root(data_root, n_kgs, n_snapshots):
+    '''
+        Run main.py with the split and the evaluation on a data root with only the LOD Cloud and the KGHeartBeat snapshots
+        (no kgs_by_topic.json and no topic folders yet), with the endpoints served locally: every topic written by the split
+        must be evaluated on every snapshot.
+    '''
+    with MockSPARQLServer() as server:
+        csv_files = SyntheticLODCloud(n_kgs, endpoint_base_urls=[server.base_url]).write(data_root, n_snapshots)
+        process = subprocess.run([sys.executable, '-W', 'ignore', os.path.join(here, '../src/main.py'), 'run', '--stages', 'split', 'evaluate', '--no-render',
+                                  '--data-root', data_root], cwd=tempfile.gettempdir(), capture_output=True, text=True)
+    paths.set_roots(data_root)
+    topics = pipeline.load_kgs_by_topic() if os.path.exists(paths.data_path('kgs_by_topic.json')) else {}
+    missing = [(topic, os.path.basename(csv_file)) for topic in topics for csv_file in csv_files
+               if not os.path.exists(paths.output_path('fairness_evaluation_results', topic, os.path.basename(csv_file)))]
+    ok = process.returncode == 0 and len(topics) > 1 and len(missing) == 0
+    print(f"Split and evaluation on a fresh data root: exit status {process.returncode}, {len(topics)} topics, {len(missing)} evaluations missing, ok: {ok}")
+    if process.returncode != 0:
+        print(process.stderr[-2000:])
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check the probes and the evaluations of the pipeline on synthetic data, without the network.')
+    parser.add_argument('--kgs', type=int, default=300, help='KGs of the synthetic LOD Cloud')
+    parser.add_argument('--snapshots', type=int, default=2)
+    args = parser.parse_args()
+
+    # Reproducible probes, answered without the network
+    EndpointProber.check_sparql_on = lambda self, sparql_url, timeout: int(zlib.crc32(sparql_url.encode()) % 3 == 0)
+    EndpointProber.check_metadata_in_sparql = lambda self, endpoint_url, timeout: int(zlib.crc32(endpoint_url.encode()) % 2 == 0)
+
+    ok = True
+    for check in [check_probe_once, check_expired_not_recorded, check_selected_topics_probed, check_fresh_data_root]:
+        with tempfile.TemporaryDirectory() as data_root:
+            ok = check(data_root, args.kgs, args.snapshots) and ok
+    sys.exit(0 if ok else 1)
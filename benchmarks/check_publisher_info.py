@@ -0,0 +1,51 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import pandas as pd
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '../src'))
+
+import utils
+from quality_data import get_publisher_flags, get_publisher_info
+
+def check(quality_data_paths, repeat):
+    '''
+        Compare the column-level publisher detection with the row-wise utils.check_publisher_info on each snapshot.
+        Prints the rows/second of both and the number of KGs where they disagree.
+    '''
+    all_equal = True
+    print(f"{'snapshot':<30}{'rows':>8}{'row-wise rows/s':>18}{'vectorized rows/s':>20}{'mismatches':>12}")
+    for quality_data_path in quality_data_paths:
+        quality_data = pd.read_csv(quality_data_path)
+        rows = len(quality_data)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            reference = quality_data.apply(utils.check_publisher_info, axis=1) if rows > 0 else pd.Series(dtype=int)
+        reference_time = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            publisher_info = get_publisher_info(get_publisher_flags(quality_data))
+        vectorized_time = (time.perf_counter() - start) / repeat
+
+        mismatches = int((reference.astype(int) != publisher_info).sum())
+        all_equal = all_equal and mismatches == 0
+        name = os.path.basename(quality_data_path)
+        print(f"{name:<30}{rows:>8}{rows / reference_time:>18.0f}{rows / vectorized_time:>20.0f}{mismatches:>12}")
+    return all_equal
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check the column-level publisher detection against utils.check_publisher_info.')
+    parser.add_argument('quality_data', nargs='*', default=[os.path.join(here, '../data/quality_data/*/*.csv')], help='KGHeartBeat quality CSV files (glob patterns are expanded)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each implementation, the mean time is reported')
+    args = parser.parse_args()
+
+    quality_data_paths = sorted({path for pattern in args.quality_data for path in glob.glob(pattern)})
+    if len(quality_data_paths) == 0:
+        sys.exit('No quality data found')
+    if not check(quality_data_paths, args.repeat):
+        sys.exit(1)
@@ -0,0 +1,111 @@
+import argparse
+import json
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class MockSPARQLServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0, slow_rate=0.0, slow_latency=2.0, metadata_rate=0.5):
+        '''
+            A local HTTP server that answers as a set of SPARQL endpoints, one for each path, to probe them offline.
+            The behaviour of each endpoint depends only on its path, so the same endpoint answers always in the same way.
+
+            :param port: port to listen on, 0 for a free one (see base_url).
+            :param latency: seconds waited before every answer.
+            :param failure_rate: share of the endpoints that answer with a 500 status.
+            :param slow_rate: share of the endpoints that wait slow_latency seconds before answering (e.g. more than the probe timeout).
+            :param metadata_rate: share of the working endpoints with at least one void:Dataset or dcat:Dataset.
+        '''
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.metadata_rate = metadata_rate
+        self.requests = 0
+        self.requests_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.create_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @staticmethod
+    def get_draw(endpoint_path, salt):
+        '''
+            Pseudo-random number in [0, 1) fixed for each endpoint path.
+        '''
+        return zlib.crc32(f'{salt}:{endpoint_path}'.encode('utf-8')) / 2**32
+
+    def get_answer(self, endpoint_path, is_query):
+        '''
+            Return (seconds to wait, status, content type, body) of the answer of an endpoint.
+        '''
+        delay = self.latency + (self.slow_latency if self.get_draw(endpoint_path, 'slow') < self.slow_rate else 0)
+        if self.get_draw(endpoint_path, 'failure') < self.failure_rate:
+            return delay, 500, 'text/plain', b'Internal Server Error'
+        if not is_query:
+            return delay, 200, 'text/html', b'<html><body>SPARQL query editor</body></html>'
+        bindings = [{'s': {'type': 'uri', 'value': f'http://example.org{endpoint_path}#dataset'}}] if self.get_draw(endpoint_path, 'metadata') < self.metadata_rate else []
+        return delay, 200, 'application/sparql-results+json', json.dumps({'head': {'vars': ['s']}, 'results': {'bindings': bindings}}).encode('utf-8')
+
+    def create_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with mock.requests_lock:
+                    mock.requests += 1
+                endpoint_path, _, query = self.path.partition('?')
+                delay, status, content_type, body = mock.get_answer(endpoint_path, 'query=' in query)
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # The client stopped waiting (probe timeout)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve mock SPARQL endpoints with configurable latency and failure rates.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8890)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds waited before every answer')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of the endpoints answering with a 500 status')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='share of the endpoints answering after --slow-latency seconds')
+    parser.add_argument('--slow-latency', type=float, default=2.0)
+    parser.add_argument('--metadata-rate', type=float, default=0.5, help='share of the working endpoints with VoID/DCAT metadata')
+    args = parser.parse_args()
+
+    server = MockSPARQLServer(args.host, args.port, args.latency, args.failure_rate, args.slow_rate, args.slow_latency, args.metadata_rate)
+    print(f"Mock SPARQL endpoints on {server.base_url}/<path>")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+DOMAINS = ['cross_domain', 'geography', 'government', 'life_sciences', 'linguistics', 'media', 'publications', 'social_networking', 'user_generated', '']
+
+KEYWORDS = [[], ['lod'], ['ontology'], ['lod', 'ontology'], ['vocabulary']]
+
+VOCABULARIES = ['http://rdfs.org/ns/void#', 'http://xmlns.com/foaf/0.1/', 'http://purl.org/dc/terms/', 'http://www.w3.org/2004/02/skos/core#',
+                'http://www.w3.org/2000/01/rdf-schema#', 'http://example.org/vocabulary#', 'http://schema.org/']
+
+# Values of each generated KGHeartBeat column: (regular values, sentinel values used by KGHeartBeat for a missing measurement).
+# '{i}' is replaced by the number of the KG, '{endpoint}' by the URL of its SPARQL endpoint.
+COLUMN_VALUES = {
+    'KG name': (['Knowledge graph {i}'], ['']),
+    'SPARQL endpoint URL': (['{endpoint}'], ['']),
+    'URL for download the dataset': (["['http://example.org/{i}/dump.nt']", "['http://example.org/{i}/dump.nt', 'http://example.org/{i}/dump.ttl']"], ['[]']),
+    'Url file VoID': (['http://example.org/{i}/void.ttl'], ['']),
+    'Sparql endpoint': (['Available', 'offline'], ['-']),
+    'Availability of RDF dump (metadata)': (['1', '0', 'True', 'False'], ['-', '']),
+    'metadata-media-type': (["['api/sparql', 'meta/void']", "['rdf']", "['text/turtle']", "['application/rdf+xml', 'rdf']"], ['[]', "['']", '[,]']),
+    'Serialization formats': (["['text/turtle']", "['application/rdf+xml']", "['meta/void', 'rdf']"], ['[]', '']),
+    'License machine redeable (metadata)': (['http://creativecommons.org/licenses/by/4.0/', 'True', 'False'], ['-', '']),
+    'License machine redeable (query)': (["['http://creativecommons.org/licenses/by/4.0/']", 'False', '[]'], ['-', '']),
+    'License human redeable': (['True', 'False'], ['-', '']),
+    'Degree of connection': (['0', '1', '3', '12', '250'], ['-', '[]', '']),
+    'Number of samAs chains': (['0', '2', '15'], ['-', '']),
+    'URIs Deferenceability': (['0', '0.5', '1', '0.9631852741096438'], ['-', '']),
+    'Use HTTPS': (['True', 'False'], ['-']),
+    'Requires authentication': (['True', 'False'], ['-', '']),
+    'Author (query)': (["['Alice']", '[]'], ['-', '']),
+    'Author (metadata)': (['Name: Alice, email: alice@example.org', 'Name: absent, email: absent', 'False'], ['-', '']),
+    'Contributor': (["['Bob']", '[]'], ['-', '']),
+    'Publisher': (["['Example publisher']", '[]'], ['-', '']),
+    'Sources': (['Web: http://example.org, Name: absent, Email: absent', 'Web: absent, Name: absent, Email: absent', 'Name: Alice'], ['-', '']),
+    'Availability score': (['0', '0.25', '0.5', '1'], ['-']),
+    'Security score': (['0', '0.5', '1'], ['-']),
+    'Verifiability score': (['0.1', '0.3', '0.6'], ['-']),
+    'Interlinking score': (['0', '0.33', '1'], ['-']),
+    'Licensing score': (['0', '0.5', '1'], ['-']),
+}
+
+# The column order of the generated CSVs, as in the KGHeartBeat output (only the columns read by the pipeline)
+COLUMNS = ['KG id', 'KG name', 'SPARQL endpoint URL', 'URL for download the dataset', 'Sparql endpoint', 'Availability of RDF dump (metadata)',
+           'Author (query)', 'Author (metadata)', 'Contributor', 'Publisher', 'Sources', 'metadata-media-type', 'Serialization formats',
+           'License machine redeable (metadata)', 'License machine redeable (query)', 'License human redeable', 'Vocabularies',
+           'Degree of connection', 'Number of samAs chains', 'Url file VoID', 'URIs Deferenceability', 'Use HTTPS', 'Requires authentication',
+           'Availability score', 'Security score', 'Verifiability score', 'Interlinking score', 'Licensing score']
+
+class SyntheticLODCloud:
+    def __init__(self, n_kgs=1000, sentinel_ratio=0.2, doi_ratio=0.3, extra_ratio=0.02, endpoint_base_urls=('http://127.0.0.1:8890',), seed=0):
+        '''
+            A synthetic LOD Cloud and its KGHeartBeat quality snapshots, with the shape of the real ones, to run the pipeline offline at any scale.
+
+            :param n_kgs: number of KGs in the LOD Cloud.
+            :param sentinel_ratio: share of the measurements that are missing ('-', empty string, '[]' as in KGHeartBeat).
+            :param doi_ratio: share of the KGs with a DOI in the LOD Cloud.
+            :param extra_ratio: KGs analyzed by KGHeartBeat that are not in the LOD Cloud, as a share of n_kgs.
+            :param endpoint_base_urls: base URLs of the SPARQL endpoints (e.g. of MockSPARQLServers), assigned round-robin to the KGs.
+            :param seed: seed of the random generator, the same parameters always generate the same files.
+        '''
+        self.n_kgs = n_kgs
+        self.sentinel_ratio = sentinel_ratio
+        self.doi_ratio = doi_ratio
+        self.extra_ratio = extra_ratio
+        self.endpoint_base_urls = [base_url.rstrip('/') for base_url in endpoint_base_urls]
+        self.rng = np.random.default_rng(seed)
+        # A few identifiers have a comma, written as ';' in the KG id of KGHeartBeat
+        self.identifiers = np.array([f'kg-{i}' if i % 97 else f'kg,{i}' for i in range(n_kgs)], dtype=object)
+        self.kg_ids = np.array([identifier.replace(',', ';') for identifier in self.identifiers], dtype=object)
+
+    def generate_lodcloud(self):
+        '''
+            Return the LOD Cloud dump, as the lod-data.json of the LOD Cloud: a dictionary from the dataset key to its metadata.
+        '''
+        domains = self.rng.choice(len(DOMAINS), self.n_kgs)
+        keywords = self.rng.choice(len(KEYWORDS), self.n_kgs)
+        has_doi = self.rng.random(self.n_kgs) < self.doi_ratio
+        lodcloud = {}
+        for i in range(self.n_kgs):
+            dataset = {'identifier': self.identifiers[i], 'title': f'Knowledge graph {i}', 'domain': DOMAINS[domains[i]], 'keywords': KEYWORDS[keywords[i]]}
+            if has_doi[i]:
+                dataset['doi'] = f'10.5281/zenodo.{i}'
+            lodcloud[f'dataset-{i}'] = dataset
+        return lodcloud
+
+    def get_endpoints(self, numbers):
+        return np.array([f'{self.endpoint_base_urls[i % len(self.endpoint_base_urls)]}/{i}/sparql' for i in numbers], dtype=object)
+
+    def draw_column(self, column, numbers):
+        '''
+            Draw the values of a column for the KGs with the given numbers.
+        '''
+        if column == 'Vocabularies':
+            return self.draw_vocabularies(numbers)
+        values, sentinels = COLUMN_VALUES[column]
+        sentinel = self.rng.random(len(numbers)) < self.sentinel_ratio
+        drawn = np.where(sentinel, np.array(sentinels, dtype=object)[self.rng.choice(len(sentinels), len(numbers))],
+                         np.array(values, dtype=object)[self.rng.choice(len(values), len(numbers))])
+        templates = pd.Series(drawn, dtype=object)
+        with_number = templates.str.contains('{i}', regex=False).to_numpy()
+        if with_number.any():
+            drawn[with_number] = [template.replace('{i}', str(i)) for template, i in zip(drawn[with_number], numbers[with_number])]
+        with_endpoint = templates.eq('{endpoint}').to_numpy()
+        if with_endpoint.any():
+            drawn[with_endpoint] = self.get_endpoints(numbers[with_endpoint])
+        return drawn
+
+    def draw_vocabularies(self, numbers):
+        counts = self.rng.integers(1, 5, len(numbers))
+        sentinel = self.rng.random(len(numbers)) < self.sentinel_ratio
+        choices = self.rng.integers(0, len(VOCABULARIES), (len(numbers), 4))
+        return np.array(['-' if missing else "['" + "', '".join(VOCABULARIES[v] for v in row[:count]) + "']"
+                         for missing, row, count in zip(sentinel, choices, counts)], dtype=object)
+
+    def generate_snapshots(self, n_snapshots=2, change_ratio=0.1, missing_ratio=0.05, first_date=date(2024, 1, 7), days_between=91):
+        '''
+            Generate the KGHeartBeat snapshots, each one from the previous: the measurements of change_ratio of the KGs are drawn again.
+
+            :param missing_ratio: share of the KGs not analyzed by KGHeartBeat in each snapshot.
+            :return: generator of (snapshot date, DataFrame) in date order.
+        '''
+        n_extra = int(round(self.n_kgs * self.extra_ratio))
+        numbers = np.arange(self.n_kgs + n_extra)
+        kg_ids = np.concatenate([self.kg_ids, np.array([f'not-in-lodcloud-{i}' for i in range(n_extra)], dtype=object)])
+        values = {column: self.draw_column(column, numbers) for column in COLUMNS if column != 'KG id'}
+        for snapshot in range(n_snapshots):
+            if snapshot > 0:
+                changed = np.flatnonzero(self.rng.random(len(numbers)) < change_ratio)
+                for column in values:
+                    values[column][changed] = self.draw_column(column, numbers[changed])
+            observed = self.rng.random(len(numbers)) >= missing_ratio
+            snapshot_data = pd.DataFrame({'KG id': kg_ids[observed], **{column: column_values[observed] for column, column_values in values.items()}}, columns=COLUMNS)
+            yield (first_date + timedelta(days=days_between * snapshot)).isoformat(), snapshot_data
+
+    def write(self, data_path, n_snapshots=2, change_ratio=0.1, missing_ratio=0.05):
+        '''
+            Write lodcloud.json and the snapshots in quality_data/kghb_output of data_path, as the data folder of the repository.
+
+            :return: paths of the snapshot CSVs.
+        '''
+        os.makedirs(os.path.join(data_path, 'quality_data', 'kghb_output'), exist_ok=True)
+        with open(os.path.join(data_path, 'lodcloud.json'), 'w', encoding='utf-8') as file:
+            json.dump(self.generate_lodcloud(), file)
+        csv_files = []
+        for snapshot_date, snapshot_data in self.generate_snapshots(n_snapshots, change_ratio, missing_ratio):
+            csv_file = os.path.join(data_path, 'quality_data', 'kghb_output', f'{snapshot_date}.csv')
+            snapshot_data.to_csv(csv_file, index=False)
+            csv_files.append(csv_file)
+        return csv_files
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic LOD Cloud dump and KGHeartBeat quality snapshots with the shape of the real ones.')
+    parser.add_argument('data_path', help='folder in which to write lodcloud.json and quality_data/kghb_output')
+    parser.add_argument('--kgs', type=int, default=1000, help='number of KGs in the LOD Cloud')
+    parser.add_argument('--snapshots', type=int, default=2, help='number of snapshots, three months apart')
+    parser.add_argument('--sentinel-ratio', type=float, default=0.2, help="share of the measurements missing ('-', '', '[]')")
+    parser.add_argument('--change-ratio', type=float, default=0.1, help='share of the KGs whose measurements change in each snapshot')
+    parser.add_argument('--missing-ratio', type=float, default=0.05, help='share of the KGs not analyzed in each snapshot')
+    parser.add_argument('--endpoint-base-urls', nargs='+', default=['http://127.0.0.1:8890'], help='base URLs of the SPARQL endpoints (e.g. of mock_sparql_server.py)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    synthetic = SyntheticLODCloud(args.kgs, args.sentinel_ratio, endpoint_base_urls=args.endpoint_base_urls, seed=args.seed)
+    for csv_file in synthetic.write(args.data_path, args.snapshots, args.change_ratio, args.missing_ratio):
+        print(f"{csv_file} written")
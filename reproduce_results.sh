@@ -6,4 +6,4 @@ python3 -m venv venv
 source venv/bin/activate
 pip install -r requirements.txt
 cd src
-python3 main.py
\ No newline at end of file
+python3 main.py run
\ No newline at end of file
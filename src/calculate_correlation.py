@@ -2,16 +2,16 @@ import pandas as pd
 pd.set_option('future.no_silent_downcasting', True)
 from scipy.stats import pearsonr
 from scipy.stats import spearmanr
+from scipy.stats import rankdata
+from scipy.stats import t as t_distribution
 import os
 import numpy as np
 from scipy.stats import ttest_ind
 import utils
-import matplotlib
-from matplotlib.colors import TwoSlopeNorm
-from matplotlib.colors import LinearSegmentedColormap
-import matplotlib.pyplot as plt
-import seaborn as sns
-matplotlib.use('Agg')
+import paths
+import snapshot_store
+import instrumentation
+from rendering import RenderQueue, render_heatmap
 
 
 here = os.path.dirname(os.path.abspath(__file__))
@@ -25,22 +25,27 @@ class CalculateCorrelation:
             :param output_file: name of the file in which to write the results
         '''
         self.analysis_result = file_path
-        os.makedirs(f"../data/correlation_results/{topic}",exist_ok=True)
-        self.output_file = os.path.join(here,f'../data/correlation_results/{topic}/{analysis_result_date}')
+        os.makedirs(paths.output_path('correlation_results', topic),exist_ok=True)
+        self.output_file = paths.output_path('correlation_results', topic, analysis_result_date)
 
 
-    def calculate_spearman_correlation_matrix(self, columns_to_use, filter_by_ids=False, traditional_dimensions=False, sparql_up=False,ci_level=95, n_bootstrap=1000):
+    def calculate_spearman_correlation_matrix(self, columns_to_use, filter_by_ids=False, traditional_dimensions=False, sparql_up=False,ci_level=95, n_bootstrap=1000, random_state=None, render_queue=None,
+                                              significance='asymptotic', n_permutations=9999, correction='holm'):
         """
         Generate the Spearman correlation matrix with CI and significance.
+        Pass random_state (a seed, or a list of integers) to get reproducible confidence intervals and permutation p-values:
+        the bootstrap and the permutation test draw from two independent streams spawned from it.
+        The heatmap is drawn by render_queue (None draws it here, as a 300 dpi PNG), the statistics are returned as a CorrelationResult.
+        With significance='permutation' the stars come from a permutation test with n_permutations, corrected for multiple testing
+        across the matrix ('holm', 'bh' or None), instead of the asymptotic p-value of spearmanr (see spearman_matrix_permutation_p).
         """
-        columns_to_use.append('KG id')
+        columns_to_use = columns_to_use + ['KG id'] # Copy, the caller's list is not modified
         if traditional_dimensions:
-            columns_to_use.append('Sparql endpoint')
-        df = pd.read_csv(self.analysis_result, usecols=columns_to_use)
+            columns_to_use = columns_to_use + ['Sparql endpoint']
+        df = snapshot_store.read_snapshot(self.analysis_result, usecols=columns_to_use)
 
         if filter_by_ids:
-            import utils
-            df = df[df['KG id'].isin(utils.get_always_observed_ids('../data/quality_data/all/2024-01-07.csv'))]
+            df = utils.filter_always_observed(df)
         if traditional_dimensions:
             df.replace('-', np.nan, inplace=True)
         if traditional_dimensions and sparql_up:
@@ -54,83 +59,80 @@ class CalculateCorrelation:
         df.columns = df.columns.str.strip()
 
         # Prepare matrices
-        correlation_numeric = pd.DataFrame(index=df.columns, columns=df.columns, dtype=float)
-        annotation_matrix = pd.DataFrame(index=df.columns, columns=df.columns, dtype=object)
-
-        for i, col1 in enumerate(df.columns):
-            for j, col2 in enumerate(df.columns):
-                if j < i:
-                    continue
-                rho, (ci_low, ci_high) = spearman_ci(df[col1], df[col2], ci=ci_level, n_bootstrap=n_bootstrap)
-                _, p = spearmanr(df[col1], df[col2])
-                
-                # numeric for heatmap colors
-                correlation_numeric.loc[col1, col2] = rho
-                correlation_numeric.loc[col2, col1] = rho
+        bootstrap_seed, permutation_seed = np.random.SeedSequence(random_state).spawn(2) if random_state is not None else (None, None)
+        with instrumentation.phase('correlation statistics'):
+            rho, p_values, ci_low, ci_high = spearman_matrix_ci(df.astype(float), ci=ci_level, n_bootstrap=n_bootstrap, random_state=bootstrap_seed)
+        if significance == 'permutation':
+            with instrumentation.phase('permutation test'):
+                p_values = spearman_matrix_permutation_p(df.astype(float), n_permutations, correction, permutation_seed)
+        elif significance != 'asymptotic':
+            raise ValueError(f"Unknown significance test {significance}, use 'asymptotic' or 'permutation'")
+        instrumentation.count('correlation matrices')
+        correlation_result = CorrelationResult(list(df.columns), rho, p_values, ci_low, ci_high)
 
-                # annotation string including r^2
-                annotation_val = f"{rho:.2f} {add_significance_stars(p)} CI=[{ci_low:.2f}, {ci_high:.2f}]"
-                annotation_matrix.loc[col1, col2] = annotation_val
-                annotation_matrix.loc[col2, col1] = annotation_val
+        output_file = self.get_output_file(traditional_dimensions, sparql_up)
+
+        # save csv with annotations
+        correlation_result.get_annotations().to_csv(f'{output_file}.csv')
+
+        # draw heatmap
+        if render_queue is None:
+            render_queue = RenderQueue(workers=0)
+        render_queue.submit(render_heatmap, output_file, correlation_result, os.path.basename(output_file))
+        return correlation_result
 
+    def get_output_file(self, traditional_dimensions=False, sparql_up=False):
+        '''
+            Return the path (without extension) of the results of a correlation matrix, self.output_file is never modified
+            so the same object can compute more matrices.
+        '''
         if traditional_dimensions and not sparql_up:
-            self.output_file = self.output_file + '_dimensions'
+            return self.output_file + '_dimensions'
         if traditional_dimensions and sparql_up:
-            self.output_file = self.output_file + '_dimensions' + '_sparql_up'
+            return self.output_file + '_dimensions' + '_sparql_up'
+        return self.output_file
 
-        # save csv with annotations
-        annotation_matrix.to_csv(f'{self.output_file}.csv')
+class CorrelationResult:
+    def __init__(self, labels, rho, p_values, ci_low, ci_high):
+        '''
+            Result of a correlation matrix, what is needed to write the CSV and to draw the heatmap without recomputing anything.
 
-        # draw heatmap
-        self.draw_heatmap(correlation_numeric, annotation_matrix, os.path.basename(self.output_file))
+            :param labels: names of the metrics, in the order of the rows and columns of the arrays.
+            :param rho: matrix of the Spearman coefficients.
+            :param p_values: matrix of the p-values.
+            :param ci_low: matrix of the lower bounds of the bootstrap confidence intervals.
+            :param ci_high: matrix of the upper bounds of the bootstrap confidence intervals.
+        '''
+        self.labels = labels
+        self.rho = rho
+        self.p_values = p_values
+        self.ci_low = ci_low
+        self.ci_high = ci_high
 
+    def get_rho_matrix(self):
+        return pd.DataFrame(self.rho, index=self.labels, columns=self.labels, dtype=float)
 
-    def draw_heatmap(self, correlation_numeric, annotation_matrix, title):
-        """
-        Draw heatmap with numeric values for color and annotations with rho + stars only.
-        """
-        # Build simplified annotation matrix: just rho + stars
-        simple_annotations = correlation_numeric.copy().astype(str)
-        for i in range(annotation_matrix.shape[0]):
-            for j in range(annotation_matrix.shape[1]):
-                if pd.notna(correlation_numeric.iloc[i, j]):
-                    rho_val = correlation_numeric.iloc[i, j]
-                    # Extract stars from full annotation string
-                    stars = ""
-                    ann_str = annotation_matrix.iloc[i, j]
-                    if ann_str and isinstance(ann_str, str):
-                        if "***" in ann_str:
-                            stars = "***"
-                        elif "**" in ann_str:
-                            stars = "**"
-                        elif "*" in ann_str:
-                            stars = "*"
-                    simple_annotations.iloc[i, j] = f"{rho_val:.2f} {stars}"
-                else:
-                    simple_annotations.iloc[i, j] = ""
-
-        # Heatmap colors still based on numeric rho
-        norm = TwoSlopeNorm(vmin=-1, vcenter=0, vmax=1)
-        cmap = LinearSegmentedColormap.from_list('BlueWhiteBlue', ['blue', 'white', 'blue'])
-
-        plt.figure(figsize=(20, 10))
-        ax = sns.heatmap(
-            correlation_numeric.astype(float),
-            annot=simple_annotations.values,
-            fmt="",
-            cmap=cmap,
-            cbar=True,
-            norm=norm,
-            linewidths=0.5,
-            linecolor="gray"
-        )
-
-        plt.title(title, fontsize=16)
-        ax.set_xticklabels(ax.get_xticklabels(), fontsize=14, rotation=45, ha="right")
-        ax.set_yticklabels(ax.get_yticklabels(), fontsize=14)
-        plt.tight_layout()
-        plt.savefig(self.output_file, dpi=300)
-        plt.close()
+    def get_annotations(self):
+        '''
+            Matrix with the rho, the significance stars and the confidence interval of each pair, as written in the CSV.
+        '''
+        annotation_matrix = pd.DataFrame(index=self.labels, columns=self.labels, dtype=object)
+        for i in range(len(self.labels)):
+            for j in range(i, len(self.labels)):
+                # annotation string including r^2
+                annotation_val = f"{self.rho[i, j]:.2f} {add_significance_stars(self.p_values[i, j])} CI=[{self.ci_low[i, j]:.2f}, {self.ci_high[i, j]:.2f}]"
+                annotation_matrix.iloc[i, j] = annotation_val
+                annotation_matrix.iloc[j, i] = annotation_val
+        return annotation_matrix
+
+    def get_heatmap_annotations(self):
+        '''
+            Array with only the rho and the significance stars of each pair, empty for the pairs without a coefficient.
+        '''
+        annotations = np.full(self.rho.shape, "", dtype=object)
+        for i, j in zip(*np.nonzero(~np.isnan(self.rho))):
+            annotations[i, j] = f"{self.rho[i, j]:.2f} {add_significance_stars(self.p_values[i, j])}"
+        return annotations
 
 def spearman_ci(x, y, n_bootstrap=1000, ci=95, random_state=None):
     """
@@ -165,6 +167,187 @@ def spearman_ci(x, y, n_bootstrap=1000, ci=95, random_state=None):
 
     return rho, (lower, upper)
 
+def spearman_matrix_ci(df, n_bootstrap=1000, ci=95, random_state=None, max_batch_bytes=256 * 1024**2):
+    """
+    Compute the Spearman correlation matrix with bootstrap confidence intervals for all the column pairs at once.
+
+    Each pair uses only the rows where both columns are not NaN, as spearman_ci. Pairs with the same complete rows
+    share the same bootstrap resamples, whose correlation matrices are computed as batched NumPy operations.
+    The p-value is the one of spearmanr on the full columns (NaN if one of the two columns has missing values).
+
+    :param df: DataFrame with the numeric columns to correlate
+    :param n_bootstrap: number of bootstrap resamples
+    :param ci: confidence level (e.g., 95)
+    :param random_state: seed for reproducible confidence intervals
+    :param max_batch_bytes: memory budget for the resamples ranked at the same time
+    :return: rho, p_values, ci_low, ci_high as (n_cols x n_cols) arrays
+    """
+    rng = np.random.default_rng(random_state)
+    values = df.to_numpy(dtype=float)
+    n_rows, n_cols = values.shape
+    not_nan = ~np.isnan(values)
+
+    rho = np.full((n_cols, n_cols), np.nan)
+    ci_low = np.full((n_cols, n_cols), np.nan)
+    ci_high = np.full((n_cols, n_cols), np.nan)
+
+    for rows, pairs in _group_pairs_by_rows(not_nan).values():
+        n_complete = int(rows.sum())
+        if n_complete < 3: # not enough data
+            continue
+        columns, pair_i, pair_j = _get_pair_positions(pairs)
+        data = values[rows][:, columns]
+
+        # observed Spearman correlation
+        observed = _rank_correlation(rankdata(data, axis=0)[np.newaxis])[0]
+
+        # bootstrap resampling, in batches to bound the memory of the ranked resamples
+        bootstrapped = np.empty((n_bootstrap, len(pairs)))
+        batch_size = max(1, min(n_bootstrap, max_batch_bytes // (n_complete * len(columns) * 8 * 3)))
+        for start in range(0, n_bootstrap, batch_size):
+            size = min(batch_size, n_bootstrap - start)
+            idx = rng.integers(0, n_complete, (size, n_complete))
+            correlations = _rank_correlation(rankdata(data[idx], axis=1))
+            bootstrapped[start:start + size] = correlations[:, pair_i, pair_j]
+
+        lower = np.percentile(bootstrapped, (100-ci)/2, axis=0)
+        upper = np.percentile(bootstrapped, 100-(100-ci)/2, axis=0)
+        for k, (i, j) in enumerate(pairs):
+            rho[i, j] = rho[j, i] = observed[pair_i[k], pair_j[k]]
+            ci_low[i, j] = ci_low[j, i] = lower[k]
+            ci_high[i, j] = ci_high[j, i] = upper[k]
+
+    # p-values of spearmanr on the full columns, NaN propagates as in spearmanr
+    complete_columns = np.all(not_nan, axis=0)
+    full_rho = _rank_correlation(rankdata(values, axis=0)[np.newaxis])[0] if n_rows > 0 else np.full((n_cols, n_cols), np.nan)
+    full_rho[~(complete_columns[:, np.newaxis] & complete_columns[np.newaxis, :])] = np.nan
+    dof = n_rows - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = full_rho * np.sqrt((dof / ((full_rho + 1.0) * (1.0 - full_rho))).clip(0))
+        p_values = 2 * t_distribution.sf(np.abs(t), dof)
+
+    return rho, p_values, ci_low, ci_high
+
+def spearman_matrix_permutation_p(df, n_permutations=9999, correction='holm', random_state=None, max_batch_bytes=256 * 1024**2):
+    """
+    Compute the permutation-test p-values of the Spearman correlation of all the column pairs, corrected for multiple testing across the matrix.
+
+    Each pair uses only the rows where both columns are not NaN, as the rho of spearman_matrix_ci. The columns are ranked and
+    standardized once, then the rows of all of them are permuted together: the correlations of every column with every permuted
+    column are a single matrix product per batch of permutations, so all the pairs are tested against the same permutations.
+    The p-value is two-sided, (1 + permutations with |rho| >= the observed |rho|) / (1 + n_permutations), so it is never
+    lower than 1 / (1 + n_permutations). It is exact also for the binary and near-constant metrics, where the t approximation is not.
+
+    :param df: DataFrame with the numeric columns to correlate
+    :param n_permutations: number of random permutations
+    :param correction: 'holm', 'bh' (Benjamini-Hochberg) or None, applied to the pairs above the diagonal
+    :param random_state: seed for reproducible p-values
+    :param max_batch_bytes: memory budget for the permuted columns of a batch
+    :return: (n_cols x n_cols) array of p-values, 0 on the diagonal and NaN for the pairs with a constant column (as the asymptotic ones)
+    """
+    rng = np.random.default_rng(random_state)
+    values = df.to_numpy(dtype=float)
+    n_cols = values.shape[1]
+    not_nan = ~np.isnan(values)
+    p_values = np.full((n_cols, n_cols), np.nan)
+
+    for rows, pairs in _group_pairs_by_rows(not_nan).values():
+        n_complete = int(rows.sum())
+        if n_complete < 3: # not enough data
+            continue
+        columns, pair_i, pair_j = _get_pair_positions(pairs)
+        ranks = rankdata(values[rows][:, columns], axis=0)
+        centered = ranks - ranks.mean(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            standardized = centered / np.sqrt((centered ** 2).sum(axis=0)) # Constant columns are NaN
+        observed = np.abs((standardized.T @ standardized)[pair_i, pair_j])
+        threshold = observed - 1e-12 # Permutations with the same rho (ties of the discrete metrics) up to the rounding errors
+
+        # Many metrics are constant or repeated (e.g. I1-M and R1.3-M): only the distinct non-constant columns are permuted
+        tested = ~np.isnan(observed)
+        variable = ~np.isnan(standardized[0])
+        distinct, column_codes = np.unique(standardized[:, variable].T, axis=0, return_inverse=True)
+        codes = np.full(len(columns), -1)
+        codes[variable] = column_codes.ravel()
+        rows_by_column = np.ascontiguousarray(distinct.T) # A permutation moves whole rows of all the columns
+        code_i, code_j = codes[pair_i[tested]], codes[pair_j[tested]]
+
+        exceeding = np.zeros(int(tested.sum()))
+        batch_size = max(1, min(n_permutations, max_batch_bytes // (n_complete * (len(distinct) + 1) * 8 * 2)))
+        for start in range(0, n_permutations, batch_size):
+            size = min(batch_size, n_permutations - start)
+            permutations = rng.permuted(np.broadcast_to(np.arange(n_complete), (size, n_complete)), axis=1)
+            # correlations[b, l, k] = rho between column k and the permutation b of column l, one batched matrix product
+            correlations = np.matmul(rows_by_column[permutations].transpose(0, 2, 1), rows_by_column)
+            exceeding += (np.abs(correlations[:, code_j, code_i]) >= threshold[tested]).sum(axis=0)
+
+        p = np.full(len(pairs), np.nan)
+        p[tested] = (1 + exceeding) / (1 + n_permutations)
+        for k, (i, j) in enumerate(pairs):
+            p_values[i, j] = p_values[j, i] = p[k] if i != j or np.isnan(p[k]) else 0
+
+    if correction is not None:
+        upper = np.triu_indices(n_cols, k=1)
+        p_values[upper] = adjust_p_values(p_values[upper], correction)
+        p_values.T[upper] = p_values[upper]
+    return p_values
+
+def adjust_p_values(p_values, method='holm'):
+    """
+    Adjust the p-values of a family of tests for multiple testing, NaN p-values are not counted as tests.
+
+    :param p_values: 1-D array of p-values
+    :param method: 'holm' (controls the family-wise error rate) or 'bh' (Benjamini-Hochberg, controls the false discovery rate)
+    :return: array of adjusted p-values, in the same order
+    """
+    adjusted = np.full(len(p_values), np.nan)
+    tested = np.flatnonzero(~np.isnan(p_values))
+    m = len(tested)
+    if m == 0:
+        return adjusted
+    order = tested[np.argsort(p_values[tested], kind='stable')]
+    ordered = p_values[order]
+    if method == 'holm':
+        ordered = np.maximum.accumulate((m - np.arange(m)) * ordered)
+    elif method == 'bh':
+        ordered = np.minimum.accumulate((m / np.arange(m, 0, -1) * ordered[::-1]))[::-1]
+    else:
+        raise ValueError(f"Unknown correction {method}, use 'holm' or 'bh'")
+    adjusted[order] = np.minimum(ordered, 1)
+    return adjusted
+
+def _group_pairs_by_rows(not_nan):
+    """
+    Group the column pairs (i <= j) by the rows where both columns are available.
+    """
+    pairs_by_rows = {}
+    n_cols = not_nan.shape[1]
+    for i in range(n_cols):
+        for j in range(i, n_cols):
+            rows = not_nan[:, i] & not_nan[:, j]
+            pairs_by_rows.setdefault(rows.tobytes(), (rows, []))[1].append((i, j))
+    return pairs_by_rows
+
+def _get_pair_positions(pairs):
+    """
+    Columns used by the pairs and the position of the two columns of each pair among them.
+    """
+    columns = sorted(set(col for pair in pairs for col in pair))
+    position = {col: k for k, col in enumerate(columns)}
+    return columns, np.array([position[i] for i, _ in pairs]), np.array([position[j] for _, j in pairs])
+
+def _rank_correlation(ranks):
+    """
+    Pearson correlation between the columns of each ranked sample, ranks has shape (n_samples, n_rows, n_cols).
+    Columns with constant ranks give NaN, as spearmanr.
+    """
+    centered = ranks - ranks.mean(axis=1, keepdims=True)
+    covariance = np.einsum('bki,bkj->bij', centered, centered)
+    std = np.sqrt(np.einsum('bii->bi', covariance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / (std[:, :, np.newaxis] * std[:, np.newaxis, :])
+    return np.clip(correlation, -1, 1)
+
 def add_significance_stars(p):
     if p < 0.001:
         return '***'
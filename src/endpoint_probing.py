@@ -0,0 +1,204 @@
+import time
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import instrumentation
+
+METADATA_QUERY = """
+    PREFIX void: <http://rdfs.org/ns/void#>
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+    PREFIX dcat: <http://www.w3.org/ns/dcat#>
+
+    SELECT DISTINCT ?s
+    WHERE {
+    {
+        ?s a void:Dataset .
+    }
+    UNION
+    {
+        ?s a dcat:Dataset .
+    }
+    }
+    """
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+SPARQL_JSON_HEADERS = {
+    'Accept': 'application/sparql-results+json,application/json,text/javascript,application/javascript',
+    'User-Agent': 'sparqlwrapper 2.0.0 (rdflib.github.io/sparqlwrapper)'
+}
+
+PROBES = ('sparql_on', 'metadata_in_sparql')
+
+class EndpointProber:
+    def __init__(self, max_workers=32, per_host_limit=4, deadline=None, sparql_on_timeout=10, metadata_timeout=5, cache=None):
+        '''
+            Probe the SPARQL endpoints concurrently, sharing a pooled HTTP session between all the requests.
+
+            :param max_workers: number of probes running at the same time.
+            :param per_host_limit: maximum number of probes running at the same time against the same host.
+            :param deadline: seconds available to probe all the endpoints of a call to probe(); probes not completed in time count as failed.
+            :param sparql_on_timeout: timeout of the request that checks if the endpoint is on (10 seconds, as the original row-wise check).
+            :param metadata_timeout: timeout of the VoID/DCAT metadata query (5 seconds, as the original row-wise query).
+            :param cache: ProbeCache with the results of the previous probes, only the endpoints missing from it are probed.
+        '''
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.deadline = deadline
+        self.sparql_on_timeout = sparql_on_timeout
+        self.metadata_timeout = metadata_timeout
+        self.cache = cache
+        self.network_probes = 0
+        self.unknown_probes = 0 # Probes expired in all the calls to probe(), their outcome is unknown and scored as failed
+        self.session = None # Created by the first probe sent over the network, see get_session
+
+        self.host_semaphores = {}
+        self.host_semaphores_lock = threading.Lock()
+        self.expired_probes = 0
+        self.expired_probes_lock = threading.Lock()
+
+    def probe(self, endpoint_urls, probes=PROBES, snapshot_date=''):
+        '''
+            Run the probes on every distinct endpoint URL.
+
+            :param endpoint_urls: iterable of SPARQL endpoint URLs (NaN and empty values are ignored).
+            :param probes: probes to run, any of 'sparql_on' and 'metadata_in_sparql'.
+            :param snapshot_date: date of the snapshot the probes belong to, used as part of the cache key.
+            :return: DataFrame indexed by endpoint URL with one 0/1 column for each probe.
+        '''
+        endpoint_urls = self.interleave_by_host(pd.Series(list(endpoint_urls), dtype=object).dropna().loc[lambda urls: urls != ''].unique())
+        jobs = [(endpoint_url, probe) for endpoint_url in endpoint_urls for probe in probes]
+        self.expired_probes = 0
+
+        outcomes = {}
+        if self.cache is not None:
+            cached = self.cache.get_many([(endpoint_url, probe, snapshot_date) for endpoint_url, probe in jobs])
+            outcomes = {(endpoint_url, probe): result for (endpoint_url, probe, _), result in cached.items()}
+        jobs_to_run = [job for job in jobs if job not in outcomes]
+        if len(jobs_to_run) > 0:
+            self.get_session()
+
+        deadline_at = time.monotonic() + self.deadline if self.deadline is not None else None
+        with instrumentation.phase('probe endpoints'), ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            probed = dict(zip(jobs_to_run, executor.map(lambda job: self.run_probe(job[0], job[1], deadline_at), jobs_to_run)))
+        self.network_probes += len(jobs_to_run)
+        instrumentation.count('network probes', len(jobs_to_run))
+        instrumentation.count('probe cache hits', len(jobs) - len(jobs_to_run))
+        if self.cache is not None:
+            # Probes stopped by the deadline are not cached, they will be tried again in the next run
+            self.cache.put_many({(endpoint_url, probe, snapshot_date): result for (endpoint_url, probe), result in probed.items() if result is not None})
+        outcomes.update(probed)
+
+        # Built at once from the outcomes, the probes without an outcome (stopped by the deadline) count as failed
+        results = pd.DataFrame({probe: [outcomes.get((endpoint_url, probe)) or 0 for endpoint_url in endpoint_urls] for probe in probes},
+                               index=pd.Index(endpoint_urls, name='SPARQL endpoint URL', dtype=object), columns=list(probes), dtype='int64')
+        self.unknown_probes += self.expired_probes
+        if self.expired_probes > 0:
+            print(f"{self.expired_probes} probes not completed before the deadline, considered as failed")
+        return results
+
+    def get_session(self):
+        '''
+            Pooled HTTP session shared by the probes, created only when an endpoint is not in the cache (requests is imported here).
+        '''
+        if self.session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=0)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+        return self.session
+
+    def run_probe(self, endpoint_url, probe, deadline_at):
+        '''
+            Run a probe once a slot of its host is free. The wait for the slot is bounded only by the deadline (none without a deadline),
+            the timeout of the probe applies only to its HTTP request, cut to the time left before the deadline.
+
+            :return: 0/1 outcome of the probe, None if it expired before the deadline.
+        '''
+        host_semaphore = self.get_host_semaphore(endpoint_url)
+        wait = deadline_at - time.monotonic() if deadline_at is not None else None
+        if wait is not None and wait <= 0:
+            return self.expire_probe()
+        if not host_semaphore.acquire(timeout=wait):
+            return self.expire_probe()
+        try:
+            timeout = self.sparql_on_timeout if probe == 'sparql_on' else self.metadata_timeout
+            cut_by_deadline = False
+            if deadline_at is not None:
+                time_left = deadline_at - time.monotonic()
+                if time_left <= 0:
+                    return self.expire_probe()
+                if time_left < timeout:
+                    timeout, cut_by_deadline = time_left, True
+            if probe == 'sparql_on':
+                result = self.check_sparql_on(endpoint_url, timeout)
+            else:
+                result = self.check_metadata_in_sparql(endpoint_url, timeout)
+            if result == 0 and cut_by_deadline and time.monotonic() >= deadline_at:
+                return self.expire_probe() # Failed because the timeout was cut by the deadline
+            return result
+        finally:
+            host_semaphore.release()
+
+    def expire_probe(self):
+        with self.expired_probes_lock:
+            self.expired_probes += 1
+
+    def check_sparql_on(self, sparql_url, timeout):
+        '''
+        Check if the SPARQL endpoint return a 200 status, also if the sparql editor is not interoperable
+        '''
+        import requests
+        try:
+            response = self.session.get(sparql_url, headers=BROWSER_HEADERS, timeout=timeout, verify=False)
+            return 1 if 200 <= response.status_code < 300 else 0
+        except requests.exceptions.RequestException:
+            return 0
+
+    def check_metadata_in_sparql(self, endpoint_url, timeout):
+        '''
+        Check if the SPARQL endpoint has at least one void:Dataset or dcat:Dataset, sending the same request as SPARQLWrapper.
+        Only JSON results are counted: with XML results the original row-wise query always ended in its except branch.
+        '''
+        try:
+            response = self.session.get(endpoint_url, params={'query': METADATA_QUERY, 'format': 'json', 'output': 'json', 'results': 'json'},
+                                        headers=SPARQL_JSON_HEADERS, timeout=timeout)
+            response.raise_for_status()
+            content_type = response.headers.get('content-type', '')
+            if any(mime in content_type for mime in SPARQL_JSON_HEADERS['Accept'].split(',')):
+                bindings = response.json().get('results').get('bindings')
+                return 1 if isinstance(bindings,list) and len(bindings) > 0 else 0
+            return 0
+        except Exception:
+            return 0
+
+    def get_host_semaphore(self, endpoint_url):
+        host = urlparse(endpoint_url).netloc
+        with self.host_semaphores_lock:
+            if host not in self.host_semaphores:
+                self.host_semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self.host_semaphores[host]
+
+    @staticmethod
+    def interleave_by_host(endpoint_urls):
+        '''
+            Order the URLs round-robin by host, so that the workers are not all waiting on the same host.
+        '''
+        by_host = {}
+        for endpoint_url in endpoint_urls:
+            by_host.setdefault(urlparse(endpoint_url).netloc, []).append(endpoint_url)
+        interleaved = []
+        for i in range(max((len(urls) for urls in by_host.values()), default=0)):
+            interleaved.extend(urls[i] for urls in by_host.values() if i < len(urls))
+        return interleaved
+
+def lookup_probe_results(probe_results, endpoint_urls, probe):
+    '''
+        Align the results of a probe with the endpoint URLs of the quality data; KGs without a probed endpoint get 0.
+    '''
+    return endpoint_urls.map(probe_results[probe]).fillna(0).astype(int)
@@ -1,186 +1,326 @@
+import os
+import copy
+import json
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
-import utils 
+import snapshot_store
+from lodcloud_index import get_lodcloud_index
+from quality_data import load_quality_data, get_memory_usage, normalize_quality_data
+from fair_metrics import METRICS, FAIR_SCORE, DEFAULT_PROFILE, EvaluationPlan
+from endpoint_probing import EndpointProber, lookup_probe_results
+
+# Columns read from the CSV of a subcloud derived from the 'all' snapshot: the ones copied in the output and the dereferenceability,
+# whose dtype (and so the one of F1-D) depends on the values in the subcloud
+SUBCLOUD_COLUMNS = ['KG id', 'KG name', 'SPARQL endpoint URL', 'URL for download the dataset', 'URIs Deferenceability']
+
+# Features computed per KG, taken from the 'all' snapshot by the derived subclouds instead of being computed again
+SHARED_FEATURES = ['publisher_flags', 'fair_vocabularies']
 
 class EvaluateFAIRness:
 
-    def __init__(self,quality_data_to_evaluate, output_file_path):
-        self.quality_data = pd.read_csv(quality_data_to_evaluate)
+    def __init__(self,quality_data_to_evaluate, output_file_path, lodcloud_data_path = None, probe_results = None, metrics = METRICS):
+        '''
+            :param quality_data_to_evaluate: path to the KGHeartBeat CSV file, or a chunk of it loaded with load_quality_chunks.
+            :param lodcloud_data_path: path to the LOD Cloud dump (None for the one in the data root).
+        '''
+        if isinstance(quality_data_to_evaluate, pd.DataFrame):
+            self.quality_data = quality_data_to_evaluate
+        else:
+            self.quality_data = load_quality_data(quality_data_to_evaluate) # Only the columns used by the metrics, with compact types
+            print(f"{os.path.basename(quality_data_to_evaluate)}: {len(self.quality_data)} KGs, {len(self.quality_data.columns)} columns, {get_memory_usage(self.quality_data).sum() / 2**20:.2f} MB in memory")
         self.output_file_path = output_file_path
+        self.lodcloud_data_path = lodcloud_data_path
+        self.metrics = metrics
+        self.lodcloud_flags = get_lodcloud_index(lodcloud_data_path).lookup(self.quality_data['KG id']) # Ontology, DOI and domain flags from the LOD Cloud, aligned with the quality data
+        self.normalized = normalize_quality_data(self.quality_data) # Sentinel values converted once into boolean/numeric columns
+        self.probe_results = probe_results # Results of the SPARQL endpoint probes, keyed by endpoint URL (see probe_endpoints)
+        self.plan = self.compile_plan()
+        self.unchanged = None # KGs whose evaluation is taken from the previous snapshot (see reuse_unchanged)
+        self.previous_evaluation = None
         self.fairness_evaluation = self.initialize_output_file()
-            
+
+    def compile_plan(self):
+        '''
+            The metrics of the registry compiled for this snapshot, the shared sub-expressions are computed only once.
+        '''
+        return EvaluationPlan({
+            'normalized': self.normalized,
+            'quality_data': self.quality_data,
+            'DOI': self.lodcloud_flags['DOI'],
+            'sparql_on': lambda: self.get_probe_result('sparql_on'),
+            'metadata_in_sparql': lambda: self.get_probe_result('metadata_in_sparql'),
+        }, self.metrics)
+
+    def derive_subcloud(self, rows, quality_data_path, output_file_path):
+        '''
+            Evaluation of a subcloud whose KGs are rows of this snapshot (e.g. a topic of the 'all' subcloud), without loading,
+            normalizing and probing its quality data again: the per-KG inputs and features are taken from this evaluation,
+            only the columns whose dtype depends on the KGs in the subcloud (SUBCLOUD_COLUMNS) are read from its CSV.
+            The metrics are then computed on the subcloud as if it was evaluated on its own, so the result is the same.
+
+            :param rows: positions of the KGs of the subcloud in this snapshot, in the order of its CSV.
+            :param quality_data_path: path to the CSV of the subcloud, it must have the same KGs in the same order.
+            :param output_file_path: path to the CSV in which to write the FAIRness evaluation of the subcloud.
+            :return: an EvaluateFAIRness of the subcloud, to score with the evaluate_* methods.
+        '''
+        subcloud_columns = snapshot_store.read_snapshot(quality_data_path, usecols=SUBCLOUD_COLUMNS)
+        kg_ids = self.quality_data['KG id'].iloc[rows].reset_index(drop=True)
+        if not subcloud_columns['KG id'].equals(kg_ids):
+            raise ValueError(f"The KGs in {quality_data_path} are not the ones of the subcloud in the evaluated snapshot")
+
+        subcloud = copy.copy(self)
+        subcloud.quality_data = self.quality_data.iloc[rows].reset_index(drop=True)
+        for column in SUBCLOUD_COLUMNS:
+            subcloud.quality_data[column] = subcloud_columns[column]
+        subcloud.output_file_path = output_file_path
+        subcloud.lodcloud_flags = get_lodcloud_index(self.lodcloud_data_path).lookup(subcloud.quality_data['KG id'])
+        subcloud.normalized = self.normalized.iloc[rows].reset_index(drop=True)
+        subcloud.plan = subcloud.compile_plan()
+        for name in SHARED_FEATURES:
+            subcloud.plan.values[name] = self.plan.get(name).iloc[rows].reset_index(drop=True)
+        if self.unchanged is not None:
+            subcloud.unchanged = self.unchanged[rows]
+            subcloud.previous_evaluation = self.previous_evaluation.iloc[rows].reset_index(drop=True)
+        subcloud.fairness_evaluation = subcloud.initialize_output_file()
+        return subcloud
+
+    def evaluate_metrics(self, principle = None):
+        '''
+            Compute the metrics of a principle (all if None), the ones of the unchanged KGs are taken from the previous evaluation.
+        '''
+        metric_values = self.plan.evaluate_metrics(principle)
+        if self.unchanged is not None:
+            metric_values = [(column, carry_forward(values, self.previous_evaluation[column], self.unchanged) if column in self.previous_evaluation.columns else values)
+                             for column, values in metric_values]
+        return metric_values
+
+    def evaluate_principle(self, principle, profile = DEFAULT_PROFILE):
+        for column, values in self.evaluate_metrics(principle):
+            self.fairness_evaluation[column] = values
+        score = next(score for score in profile.scores if score.principle == principle)
+        self.fairness_evaluation[score.column] = profile.score_principle(score, self.fairness_evaluation)
+
     def evaluate_findability(self):
-        
-        self.fairness_evaluation["F1-M Unique and persistent ID"] = 1 # Data are at least in the LOD Cloud
-
-        self.fairness_evaluation["F1-D URIs dereferenceability"] = (pd.to_numeric(self.quality_data['URIs Deferenceability'], errors='coerce').fillna('-'))
-        self.fairness_evaluation["F1-D URIs dereferenceability"] = self.fairness_evaluation["F1-D URIs dereferenceability"].apply(lambda x: x if x != '-' else 0)
-
-        self.fairness_evaluation["F2a-M - Metadata availability via standard primary sources"] = 1 #Dataset is at least in the LOD Cloud
-
-        sparql_indication = self.quality_data["SPARQL endpoint URL"].apply(lambda x: 1 if pd.notna(x) and x != '' else 0)
-        doi_indication = self.quality_data['KG id'].apply(utils.recover_doi_from_lodcloud)
-        dump_indication = self.quality_data["Availability of RDF dump (metadata)"].apply(lambda x: 1 if x in [1,"1"] else 0)
-        verifiability_info = self.quality_data.apply(utils.check_publisher_info,axis=1)
-        try:
-            mediatype_indication = self.quality_data['metadata-media-type'].apply(lambda x: 1 if x not in ('[]','['',]',"['']") else 0)
-        except:
-            mediatype_indication = self.quality_data['Serialization formats'].apply(lambda x: 1 if x not in ('[]','['',]',"['']") else 0)
-
-        license = self.quality_data['License machine redeable (metadata)'].apply(lambda x: 1 if x not in ['-', '',False,'False'] and pd.notna(x) else 0)
-        license_query = self.quality_data['License machine redeable (query)'].apply(lambda x: 1 if x not in ['-', '',False,'False','[]'] and pd.notna(x) else 0)
-        license_value = (license | license_query).astype(int)
-        vocabs =  self.quality_data['Vocabularies'].apply(lambda x: 1 if x not in ['[]','-'] and pd.notna(x) else 0)      
-        links = self.quality_data.apply(
-            lambda row: (
-                1 if (
-                    (row['Degree of connection'] != '-' and row['Degree of connection'] != '[]' and pd.notna(row['Degree of connection']) and int(row['Degree of connection']) > 0)
-                    or (row['Number of samAs chains'] not in ['-', 0, '0'] and pd.notna(row['Number of samAs chains']) and int(row['Number of samAs chains']) > 0)
-                    #or (row['SKOS mapping properties'] not in ['-', 0, '0'] and pd.notna(row['SKOS mapping properties']) and int(row['SKOS mapping properties']) > 0) 
-                ) else 0
-            ), axis=1
-        )
-        void_indication = self.quality_data['Url file VoID'].apply(lambda x: 1 if pd.notna(x) and x != '' else 0)
-        self.fairness_evaluation["F2b-M Metadata availability for all the attributes covered in the FAIR score computation"] = ((sparql_indication + doi_indication + dump_indication + verifiability_info + mediatype_indication + license_value + vocabs + links + void_indication) / 9).round(2)
-
-        self.fairness_evaluation["F3-M Data referrable via a DOI"] = self.quality_data['KG id'].apply(utils.recover_doi_from_lodcloud)
-
-        self.fairness_evaluation["F4-M Metadata registered in a searchable engine"] = 1 # Dataset is at least in the LOD Cloud
-
-        self.fairness_evaluation["F score"] = (self.fairness_evaluation[["F1-M Unique and persistent ID", "F1-D URIs dereferenceability", "F2a-M - Metadata availability via standard primary sources", "F2b-M Metadata availability for all the attributes covered in the FAIR score computation", "F3-M Data referrable via a DOI", "F4-M Metadata registered in a searchable engine"]].sum(axis=1) / 6).round(2)
+        self.evaluate_principle('F')
         print("Findability evaluation completed!")
 
-
     def evaluate_availability(self):
-
-        sparql_availability = self.quality_data["Sparql endpoint"].apply(lambda x: 1 if x == 'Available' else 0)
-        dump_availability = self.quality_data["Availability of RDF dump (metadata)"].apply(lambda x: 1 if x in [1,"1"] else 0) # No consideration about the mediatype of the available dump
-        sparql_on_not_interop = self.quality_data["SPARQL endpoint URL"].apply(utils.check_at_least_sparql_on)
-        sparql_or_dump_on = (
-            (sparql_availability == 1) | (dump_availability == 1)
-        ).astype(int)
-
-        self.fairness_evaluation["A1-D Working access point(s)"] = sparql_or_dump_on.combine(
-            sparql_on_not_interop,
-            lambda x, y: 1 if x == 1 else (0.5 if x == 0 and y == 1 else 0)
-        )
-
-        self.fairness_evaluation["A1-M Metadata availability via working primary sources"] = 1 # Metadata is at available at least in the LOD Cloud
-
-        self.fairness_evaluation["A1.2 Authentication & HTTPS support"] = self.quality_data.apply(
-            lambda row: ((1 if (row["Use HTTPS"] in ['True',True] or row["Sparql endpoint"] == 'Available') else 0) + 
-                        (1 if row["Requires authentication"] in ["False", False, True, 'True'] else 0)) / 2,
-            axis=1
-        )
-
-        self.fairness_evaluation["A2-M Registered in search engines"] = 1  # Metadata is registered at least in the LOD Cloud
-        
-        self.fairness_evaluation["A score"] = (self.fairness_evaluation[["A1-D Working access point(s)", "A1-M Metadata availability via working primary sources", "A1.2 Authentication & HTTPS support", "A2-M Registered in search engines"]].sum(axis=1) / 4).round(2)
+        self.evaluate_principle('A')
         print("Availability evaluation completed!")
-    
-    def evaluate_reusability(self):
-
-        self.fairness_evaluation['R1.1 Machine- or human-readable license retrievable via any primary source'] = self.quality_data.apply(
-            lambda row: 1 if (
-                pd.notna(row['License machine redeable (metadata)']) and row['License machine redeable (metadata)'] not in ['-', '',False,'False']
-            ) or (
-                pd.notna(row['License machine redeable (query)']) and row['License machine redeable (query)'] not in ['-', ''] 
-            ) or (
-                row['License human redeable'] in [True, 'True']
-            ) else 0,
-            axis=1
-        )
-
-        self.fairness_evaluation['R1.2 Publisher information, such as authors, contributors, publishers, and sources'] = self.quality_data.apply(utils.check_publisher_info,axis=1)
-        
-        # If the media type is is standard and open (SW standard), in this community also this format is common accepted. If not, we have to check if the data are in a standard format only for the community
-        try:
-            self.fairness_evaluation['R1.3-D Data organized in a standardized way'] = self.quality_data.apply(
-                lambda row: 1 if row['Availability of a common accepted Media Type'] in ['True', True] 
-                else (1 if 'api/sparql' or 'rdf' in row['metadata-media-type'] else row['metadata-media-type']),
-                axis=1
-            )
-        except:
-            self.fairness_evaluation['R1.3-D Data organized in a standardized way'] = self.quality_data.apply(
-                lambda row: 1 if 'api/sparql' or 'rdf' in row['Serialization formats'].lower() else 0,
-                axis=1
-            )
-
-
-        metadata_in_sparql = self.quality_data['SPARQL endpoint URL'].apply(utils.check_meta_in_sparql)
-        try:
-            self.fairness_evaluation['R1.3-M Metadata are described with VoID/DCAT predicates'] = (
-                (self.quality_data['Serialization formats'].str.contains('meta/void', na=False).astype(int) | 
-                (metadata_in_sparql == 1)).astype(int) | 
-                (~self.quality_data['License machine redeable (query)'].isin(['-','',False,'False'])).astype(int)
-            )
-        except:
-            self.fairness_evaluation['R1.3-M Metadata are described with VoID/DCAT predicates'] = (
-                (self.quality_data['Serialization formats'].str.contains('meta/void', na=False).astype(int) | 
-                (metadata_in_sparql == 1)).astype(int) | 
-                (~self.quality_data['License machine redeable (query)'].isin(['-','',False,'False'])).astype(int)
-            )
-
-        self.fairness_evaluation["R score"] = (self.fairness_evaluation[["R1.1 Machine- or human-readable license retrievable via any primary source", "R1.2 Publisher information, such as authors, contributors, publishers, and sources", "R1.3-D Data organized in a standardized way", "R1.3-M Metadata are described with VoID/DCAT predicates"]].sum(axis=1) / 4).round(2)
 
+    def evaluate_reusability(self):
+        self.evaluate_principle('R')
         print("Reusability evaluation completed!")
 
     def evaluate_interoperability(self):
-        
-        try:
-            self.fairness_evaluation['I1-D Standard & open representation format'] = self.quality_data.apply(
-                lambda row: 1 if row['Availability of a common accepted Media Type'] in ['True', True] 
-                else (1 if 'api/sparql' or 'rdf' in row['metadata-media-type'].lower() else 0),
-                axis=1
-            )
-        except:
-            self.fairness_evaluation['I1-D Standard & open representation format'] = self.quality_data.apply(
-                lambda row: 1 if 'api/sparql' or 'rdf' in row['Serialization formats'].lower() else 0,
-                axis=1
-            )
-        
-        metadata_in_sparql = self.quality_data['SPARQL endpoint URL'].apply(utils.check_meta_in_sparql)
-        try:
-            self.fairness_evaluation['I1-M Metadata are described with VoID/DCAT predicates'] = (
-                (self.quality_data['Serialization formats'].str.contains('meta/void', na=False).astype(int) | 
-                (metadata_in_sparql == 1)).astype(int) | 
-                (~self.quality_data['License machine redeable (query)'].isin(['-','',False,'False'])).astype(int)
-            )
-        except:
-            self.fairness_evaluation['I1-M Metadata are described with VoID/DCAT predicates'] = (
-                (self.quality_data['Serialization formats'].str.contains('meta/void', na=False).astype(int) | 
-                (metadata_in_sparql == 1)).astype(int) | 
-                (~self.quality_data['License machine redeable (query)'].isin(['-','',False,'False'])).astype(int)
-            )
-
-        self.fairness_evaluation['I2 Use of FAIR vocabularies'] = (self.quality_data['Vocabularies'].apply(utils.check_if_fair_vocabs)).round(2)
-
-        
-        self.fairness_evaluation['I3-D Degree of connection'] = self.quality_data.apply(
-            lambda row: (
-                1 if (
-                    (row['Degree of connection'] != '-' and row['Degree of connection'] != '[]'  and pd.notna(row['Degree of connection']) and int(row['Degree of connection']) > 0)
-                    or (row['Number of samAs chains'] not in ['-', 0, '0'] and pd.notna(row['Number of samAs chains']) and int(row['Number of samAs chains']) > 0)
-                    #or (row['SKOS mapping properties'] not in ['-', 0, '0'] and pd.notna(row['SKOS mapping properties']) and int(row['SKOS mapping properties']) > 0) 
-                ) else 0
-            ), axis=1
-        )
-        self.fairness_evaluation['I score'] = (self.fairness_evaluation[["I1-D Standard & open representation format", "I1-M Metadata are described with VoID/DCAT predicates", "I2 Use of FAIR vocabularies", "I3-D Degree of connection"]].sum(axis=1).round(2) / 4).round(2)
+        self.evaluate_principle('I')
         print("Interoperability evaluation completed!")
 
-    def calculate_FAIR_score(self):
-        self.fairness_evaluation["FAIR score"] = self.fairness_evaluation[["F score", "A score", "I score", "R score"]].sum(axis=1).round(2)
+    def calculate_FAIR_score(self, profile = DEFAULT_PROFILE):
+        self.fairness_evaluation[FAIR_SCORE] = profile.score_fair(self.fairness_evaluation)
+
+    def evaluate_profiles(self, profiles):
+        '''
+            Score the whole snapshot with custom scoring profiles, the metrics are computed only once for all of them.
+
+            :param profiles: list of ScoringProfile.
+            :return: DataFrame with the KG id and, for each profile, its scores named '<score> (<profile name>)'.
+        '''
+        metric_values = pd.DataFrame(dict(self.evaluate_metrics()), index=self.quality_data.index)
+        results = pd.DataFrame({"KG id": self.quality_data["KG id"]})
+        for profile in profiles:
+            scores = profile.score(metric_values)
+            for column in scores.columns:
+                results[f'{column} ({profile.name})'] = scores[column]
+        return results
+
+    def probe_endpoints(self, prober=None, snapshot_date=''):
+        '''
+            Probe all the SPARQL endpoints of the snapshot before the scoring.
+
+            :param prober: EndpointProber to use, a new one with the default limits if not given.
+            :param snapshot_date: date of the quality data, used to reuse the cached probes of the same snapshot.
+        '''
+        if prober is None:
+            prober = EndpointProber()
+        endpoint_urls = self.quality_data['SPARQL endpoint URL']
+        if self.unchanged is not None:
+            endpoint_urls = endpoint_urls[~self.unchanged] # The probes of the unchanged KGs are part of their previous evaluation
+        self.probe_results = prober.probe(endpoint_urls, snapshot_date=snapshot_date)
+        print(f"{len(self.probe_results)} SPARQL endpoints probed")
+
+    def get_probe_result(self, probe):
+        if self.probe_results is None:
+            self.probe_endpoints()
+        return lookup_probe_results(self.probe_results, self.quality_data['SPARQL endpoint URL'], probe)
+
+    def get_row_hashes(self):
+        '''
+            Hash of the inputs of each KG: its quality data and its LOD Cloud flags. If the hash of a KG is the same of the
+            previous snapshot, its FAIRness evaluation is the same too.
+
+            :return: Series of hexadecimal strings, aligned with the quality data.
+        '''
+        inputs = self.quality_data.assign(Ontology=self.lodcloud_flags['Ontology'], DOI=self.lodcloud_flags['DOI'])
+        return pd.util.hash_pandas_object(inputs, index=False).map(lambda row_hash: f'{row_hash:016x}')
+
+    def save_row_hashes(self, row_hashes_file_path, version):
+        '''
+            Save the hashes of the inputs of each KG, to find the unchanged KGs in the next snapshot.
+
+            :param version: version of the evaluation code, the hashes are not reused by another version.
+        '''
+        os.makedirs(os.path.dirname(row_hashes_file_path), exist_ok=True)
+        tmp_file_path = f'{row_hashes_file_path}.tmp{os.getpid()}'
+        with open(tmp_file_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': version, 'hashes': dict(zip(self.quality_data['KG id'].astype(str), self.get_row_hashes()))}, file)
+        os.replace(tmp_file_path, row_hashes_file_path)
+
+    def reuse_unchanged(self, previous_evaluation_path, previous_row_hashes):
+        '''
+            Delta evaluation: the KGs with the same inputs of the previous snapshot keep their previous FAIR metrics,
+            only the changed and new KGs are probed and scored. Call it before probe_endpoints and the evaluate_* methods.
+
+            :param previous_evaluation_path: path to the FAIRness evaluation of the previous snapshot.
+            :param previous_row_hashes: dictionary from the KG id to the hash of its inputs in the previous snapshot (see load_row_hashes).
+            :return: number of KGs whose evaluation is reused.
+        '''
+        previous_evaluation = pd.read_csv(previous_evaluation_path)
+        previous_evaluation = previous_evaluation.drop_duplicates('KG id', keep=False).set_index('KG id') # KGs listed twice are always evaluated again
+        kg_ids = self.quality_data['KG id']
+        previous_hashes = kg_ids.astype(str).map(previous_row_hashes)
+        self.unchanged = (~kg_ids.duplicated(keep=False) & kg_ids.isin(previous_evaluation.index) & (previous_hashes == self.get_row_hashes())).to_numpy()
+        self.previous_evaluation = previous_evaluation.reindex(kg_ids).set_axis(self.quality_data.index)
+        reused = int(self.unchanged.sum())
+        print(f"{reused} of {len(kg_ids)} KGs unchanged since the previous snapshot, their evaluation is reused")
+        return reused
+
+    def get_publisher_info(self):
+        '''
+            Publisher information is used both by F2b-M and R1.2, the plan computes it only once.
+        '''
+        return self.plan.get('publisher_info')
+
+    def get_publisher_flags(self):
+        '''
+            The sources of publisher information (author query/metadata, contributors, publishers and sources) as 0/1 columns.
+        '''
+        return self.plan.get('publisher_flags')
+
+    def get_void_dcat_metadata(self):
+        '''
+            Metadata described with VoID/DCAT predicates (shared by I1-M and R1.3-M).
+        '''
+        return self.plan.get('void_dcat_metadata')
 
     def initialize_output_file(self):
         output_df = pd.DataFrame({
-            "KG id": self.quality_data["KG id"],             
-            "KG name": self.quality_data["KG name"], 
+            "KG id": self.quality_data["KG id"],
+            "KG name": self.quality_data["KG name"],
             "KG SPARQL endpoint": self.quality_data['SPARQL endpoint URL'],
             "RDF dump link" : self.quality_data["URL for download the dataset"],
-            "Ontology": self.quality_data['KG id'].apply(utils.check_if_ontology)
+            "Ontology": self.lodcloud_flags['Ontology']
         })
 
         return output_df
 
     def save_file(self):
         self.fairness_evaluation.to_csv(self.output_file_path,index=False)
-    
\ No newline at end of file
+
+
+class ChunkedEvaluationWriter:
+    def __init__(self, output_file_path):
+        '''
+            Write the FAIRness evaluation of a snapshot evaluated in chunks of KGs as the evaluation of the whole snapshot is written.
+            The dtype of some columns depends on all the KGs (e.g. A1-D is integer only if no KG has 0.5), so the evaluated chunks are
+            kept in a temporary folder next to the output and written at the end, each column with its dtype over all the chunks.
+            Use it as a context manager, the temporary folder is removed also if the evaluation fails.
+        '''
+        self.output_file_path = output_file_path
+        self.chunks_path = tempfile.mkdtemp(prefix=f'.{os.path.basename(output_file_path)}.', dir=os.path.dirname(os.path.abspath(output_file_path)))
+        self.chunk_files = []
+        self.chunk_dtypes = [] # None for the empty chunks, their dtypes do not count
+        self.rows = 0
+
+    def append(self, fairness_evaluation):
+        chunk_file = os.path.join(self.chunks_path, f'{len(self.chunk_files)}.pkl')
+        fairness_evaluation.to_pickle(chunk_file)
+        self.chunk_files.append(chunk_file)
+        self.chunk_dtypes.append(fairness_evaluation.dtypes if len(fairness_evaluation) > 0 else None)
+        self.rows += len(fairness_evaluation)
+
+    def write(self):
+        '''
+            Write the chunks to the output CSV one at a time, with the common dtypes (an empty evaluation if all the chunks are empty).
+        '''
+        dtypes = get_common_dtypes([chunk_dtypes for chunk_dtypes in self.chunk_dtypes if chunk_dtypes is not None])
+        tmp_file_path = f'{self.output_file_path}.tmp{os.getpid()}'
+        written = False
+        for chunk_file, chunk_dtypes in zip(self.chunk_files, self.chunk_dtypes):
+            if chunk_dtypes is None and (self.rows > 0 or written):
+                continue
+            fairness_evaluation = pd.read_pickle(chunk_file).astype(dtypes)
+            fairness_evaluation.to_csv(tmp_file_path, index=False, mode='a' if written else 'w', header=not written)
+            written = True
+        os.replace(tmp_file_path, self.output_file_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        shutil.rmtree(self.chunks_path, ignore_errors=True)
+
+def get_common_dtypes(chunk_dtypes):
+    '''
+        Dtype of each column of the concatenation of the chunks, as pd.concat would give: the common numeric dtype
+        (e.g. float64 for integers and floats) if the dtypes are all numeric, object if they are different otherwise.
+
+        :param chunk_dtypes: list of the dtypes of the chunks, as Series from the column name to the dtype.
+        :return: dictionary from the column name to its dtype, only for the columns with different dtypes in the chunks.
+    '''
+    common_dtypes = {}
+    if len(chunk_dtypes) == 0:
+        return common_dtypes
+    for column in chunk_dtypes[0].index:
+        dtypes = [dtypes[column] for dtypes in chunk_dtypes]
+        if all(dtype == dtypes[0] for dtype in dtypes):
+            continue
+        if all(isinstance(dtype, np.dtype) and dtype.kind in 'iuf' for dtype in dtypes):
+            common_dtypes[column] = np.result_type(*dtypes)
+        else:
+            common_dtypes[column] = object
+    return common_dtypes
+
+def load_row_hashes(row_hashes_file_path, version):
+    '''
+        Return the hashes saved by EvaluateFAIRness.save_row_hashes, None if missing or saved by another version of the evaluation code.
+    '''
+    if not os.path.exists(row_hashes_file_path):
+        return None
+    with open(row_hashes_file_path, "r", encoding="utf-8") as file:
+        row_hashes = json.load(file)
+    return row_hashes['hashes'] if row_hashes['version'] == version else None
+
+def carry_forward(values, previous_values, unchanged):
+    '''
+        Replace the values of the unchanged KGs with their previous ones, with the dtype the column would have if computed for all the KGs
+        (e.g. A1-D stays integer only if no KG, reused or not, has 0.5).
+
+        :param values: metric computed on the current snapshot, a Series or a constant.
+        :param previous_values: the metric in the previous evaluation, aligned with values.
+        :param unchanged: boolean array of the KGs to take from the previous evaluation.
+    '''
+    if not isinstance(values, pd.Series) or not unchanged.any():
+        return values
+    carried = previous_values.to_numpy()[unchanged]
+    if pd.api.types.is_integer_dtype(values.dtype) and np.all(pd.notna(carried)) and np.all(carried.astype(float) % 1 == 0):
+        result = values.to_numpy().copy()
+        carried = carried.astype(result.dtype)
+    elif pd.api.types.is_numeric_dtype(values.dtype) and pd.api.types.is_numeric_dtype(previous_values.dtype):
+        result = values.to_numpy(dtype=float).copy()
+    else:
+        result = values.to_numpy(dtype=object).copy()
+    result[unchanged] = carried
+    return pd.Series(result, index=values.index)
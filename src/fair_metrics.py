@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+from quality_data import get_uris_dereferenceability, get_vocabulary_table, get_fair_vocabularies_ratio, get_publisher_flags, get_publisher_info
+
+class Feature:
+    def __init__(self, name, inputs, function):
+        '''
+            A sub-expression shared by more metrics, computed only once for each snapshot.
+
+            :param name: name used by the metrics (and the other features) to refer to it.
+            :param inputs: names of the features, normalized KGHeartBeat columns or sources it is computed from.
+            :param function: function of the input values, in the same order of inputs.
+        '''
+        self.name = name
+        self.inputs = inputs
+        self.function = function
+
+class Metric:
+    def __init__(self, column, principle, inputs, function):
+        '''
+            A FAIR metric, defined once as a rule over the normalized KGHeartBeat columns and the shared features.
+
+            :param column: name of the column in the FAIRness evaluation.
+            :param principle: 'F', 'A', 'I' or 'R', the score in which the metric is grouped.
+            :param inputs: names of the features, normalized KGHeartBeat columns or sources the metric is computed from.
+            :param function: function of the input values, it returns a Series or a constant for all the KGs.
+        '''
+        self.column = column
+        self.principle = principle
+        self.inputs = inputs
+        self.function = function
+
+class Score:
+    def __init__(self, column, principle, round_sum=False):
+        '''
+            Score of a FAIR principle, the (weighted) mean of its metrics rounded to 2 decimals.
+
+            :param round_sum: round the sum of the metrics before the division, as in the published I score.
+        '''
+        self.column = column
+        self.principle = principle
+        self.round_sum = round_sum
+
+def any_of(*values):
+    result = values[0]
+    for value in values[1:]:
+        result = result | value
+    return result
+
+def share_of(*attributes):
+    '''
+        Share of the attributes available for each KG, rounded to 2 decimals.
+    '''
+    return (sum(attribute.astype(float) for attribute in attributes) / len(attributes)).round(2)
+
+def get_working_access_points(sparql_available, dump_available, sparql_on):
+    '''
+        1 if the SPARQL endpoint or the dump is available (no consideration about the mediatype of the dump), 0.5 if the endpoint
+        answers only to a plain request and 0 otherwise. Integer if no KG has 0.5, as in the published results.
+    '''
+    working_access_points = pd.Series(np.where(sparql_available | dump_available, 1, np.where(sparql_on == 1, 0.5, 0)), index=sparql_available.index)
+    if not (working_access_points == 0.5).any():
+        working_access_points = working_access_points.astype(int)
+    return working_access_points
+
+FEATURES = [
+    Feature('uris_dereferenceability', ['quality_data'], get_uris_dereferenceability),
+    Feature('publisher_flags', ['quality_data'], get_publisher_flags), # Author (query/metadata), contributors, publishers and sources
+    Feature('publisher_info', ['publisher_flags'], get_publisher_info),
+    Feature('license_value', ['license_metadata', 'license_query'], any_of),
+    # Shared by I1-M and R1.3-M
+    Feature('void_dcat_metadata', ['void_serialization', 'metadata_in_sparql', 'license_query_not_missing'],
+            lambda void_serialization, metadata_in_sparql, license_query_not_missing: (void_serialization | (metadata_in_sparql == 1) | license_query_not_missing).astype(int)),
+    Feature('vocabulary_table', ['quality_data'], get_vocabulary_table), # Vocabularies parsed once, one row for each vocabulary of each KG
+    Feature('fair_vocabularies', ['vocabulary_table', 'quality_data'], lambda vocabulary_table, quality_data: get_fair_vocabularies_ratio(vocabulary_table, quality_data.index).round(2)),
+]
+
+METRICS = [
+    Metric('F1-M Unique and persistent ID', 'F', [], lambda: 1), # Data are at least in the LOD Cloud
+    Metric('F1-D URIs dereferenceability', 'F', ['uris_dereferenceability'], lambda uris_dereferenceability: uris_dereferenceability),
+    Metric('F2a-M - Metadata availability via standard primary sources', 'F', [], lambda: 1), # Dataset is at least in the LOD Cloud
+    Metric('F2b-M Metadata availability for all the attributes covered in the FAIR score computation', 'F',
+           ['sparql_url', 'DOI', 'dump_available', 'publisher_info', 'media_types', 'license_value', 'vocabularies', 'links', 'void_url'], share_of),
+    Metric('F3-M Data referrable via a DOI', 'F', ['DOI'], lambda doi: doi),
+    Metric('F4-M Metadata registered in a searchable engine', 'F', [], lambda: 1), # Dataset is at least in the LOD Cloud
+
+    Metric('A1-D Working access point(s)', 'A', ['sparql_available', 'dump_available', 'sparql_on'], get_working_access_points),
+    Metric('A1-M Metadata availability via working primary sources', 'A', [], lambda: 1), # Metadata is at available at least in the LOD Cloud
+    Metric('A1.2 Authentication & HTTPS support', 'A', ['use_https', 'sparql_available', 'authentication_declared'],
+           lambda use_https, sparql_available, authentication_declared: ((use_https | sparql_available).astype(int) + authentication_declared.astype(int)) / 2),
+    Metric('A2-M Registered in search engines', 'A', [], lambda: 1), # Metadata is registered at least in the LOD Cloud
+
+    # The published results consider the format always standard and open ('api/sparql' or 'rdf' in ... is always true)
+    Metric('I1-D Standard & open representation format', 'I', [], lambda: 1),
+    Metric('I1-M Metadata are described with VoID/DCAT predicates', 'I', ['void_dcat_metadata'], lambda void_dcat_metadata: void_dcat_metadata),
+    Metric('I2 Use of FAIR vocabularies', 'I', ['fair_vocabularies'], lambda fair_vocabularies: fair_vocabularies),
+    Metric('I3-D Degree of connection', 'I', ['links'], lambda links: links.astype(int)),
+
+    Metric('R1.1 Machine- or human-readable license retrievable via any primary source', 'R', ['license_metadata', 'license_query_retrievable', 'license_human'],
+           lambda *licenses: any_of(*licenses).astype(int)),
+    Metric('R1.2 Publisher information, such as authors, contributors, publishers, and sources', 'R', ['publisher_info'], lambda publisher_info: publisher_info),
+    # As for I1-D, the published results consider the data always organized in a standardized way
+    Metric('R1.3-D Data organized in a standardized way', 'R', [], lambda: 1),
+    Metric('R1.3-M Metadata are described with VoID/DCAT predicates', 'R', ['void_dcat_metadata'], lambda void_dcat_metadata: void_dcat_metadata),
+]
+
+SCORES = [Score('F score', 'F'), Score('A score', 'A'), Score('I score', 'I', round_sum=True), Score('R score', 'R')]
+
+FAIR_SCORE = 'FAIR score'
+
+class EvaluationPlan:
+    def __init__(self, sources, metrics=METRICS, features=FEATURES):
+        '''
+            The metrics compiled for a snapshot: the features they need are computed in dependency order, each one only once,
+            and reused by all the metrics (and scoring profiles) that refer to it.
+
+            :param sources: dictionary with the values the rules are computed from: a DataFrame whose columns are available by name
+                            (the normalized quality data), Series, or functions called the first time the value is needed (e.g. the endpoint probes).
+            :param metrics: list of Metric, in the order of the output columns.
+            :param features: list of Feature.
+        '''
+        self.sources = sources
+        self.metrics = metrics
+        self.features = {feature.name: feature for feature in features}
+        self.values = {}
+
+    def get_evaluation_order(self, names):
+        '''
+            Return the features needed to compute the given names, each one after its inputs.
+        '''
+        order = []
+        def visit(name, path):
+            if name in order or name not in self.features:
+                return
+            if name in path:
+                raise ValueError(f"Circular definition of the feature {name}")
+            for input_name in self.features[name].inputs:
+                visit(input_name, path | {name})
+            order.append(name)
+        for name in names:
+            visit(name, frozenset())
+        return order
+
+    def get(self, name):
+        if name not in self.values:
+            if name in self.features:
+                feature = self.features[name]
+                self.values[name] = feature.function(*[self.get(input_name) for input_name in feature.inputs])
+            else:
+                self.values[name] = self.get_source(name)
+        return self.values[name]
+
+    def get_source(self, name):
+        if name in self.sources:
+            source = self.sources[name]
+            return source() if callable(source) else source
+        for source in self.sources.values():
+            if isinstance(source, pd.DataFrame) and name in source.columns:
+                return source[name]
+        raise KeyError(f"{name} is not a feature, a normalized column or a source of the evaluation plan")
+
+    def evaluate_metrics(self, principle=None):
+        '''
+            Compute the metrics of a principle (all if None).
+
+            :return: list of (column, values) in the order of the registry.
+        '''
+        metrics = [metric for metric in self.metrics if principle is None or metric.principle == principle]
+        for name in self.get_evaluation_order([input_name for metric in metrics for input_name in metric.inputs]):
+            self.get(name)
+        return [(metric.column, metric.function(*[self.get(input_name) for input_name in metric.inputs])) for metric in metrics]
+
+class ScoringProfile:
+    def __init__(self, name, metric_weights=None, principle_weights=None, metrics=METRICS, scores=SCORES):
+        '''
+            Weights used to aggregate the metrics into the F, A, I, R and FAIR scores.
+
+            :param name: name of the profile.
+            :param metric_weights: dictionary from the metric column to its weight in the score of its principle (1 if missing, 0 to exclude it).
+            :param principle_weights: dictionary from the score column to its weight in the FAIR score (1 if missing).
+        '''
+        self.name = name
+        self.metric_weights = metric_weights if metric_weights is not None else {}
+        self.principle_weights = principle_weights if principle_weights is not None else {}
+        self.metrics = metrics
+        self.scores = scores
+
+    def score_principle(self, score, metric_values):
+        '''
+            Weighted mean of the metrics of a principle, rounded to 2 decimals.
+
+            :param score: the Score to compute.
+            :param metric_values: DataFrame with the columns of the metrics.
+        '''
+        columns = [metric.column for metric in self.metrics if metric.principle == score.principle]
+        weights = [self.metric_weights.get(column, 1) for column in columns]
+        values = metric_values[columns]
+        if any(weight != 1 for weight in weights):
+            values = values * weights
+        total = values.sum(axis=1)
+        if score.round_sum:
+            total = total.round(2)
+        return (total / sum(weights)).round(2)
+
+    def score_fair(self, score_values):
+        '''
+            Weighted sum of the F, A, I and R scores, rounded to 2 decimals.
+        '''
+        columns = [score.column for score in self.scores]
+        weights = [self.principle_weights.get(column, 1) for column in columns]
+        values = score_values[columns]
+        if any(weight != 1 for weight in weights):
+            values = values * weights
+        return values.sum(axis=1).round(2)
+
+    def score(self, metric_values):
+        '''
+            Compute all the scores of the profile over a whole snapshot.
+
+            :param metric_values: DataFrame with the columns of the metrics.
+            :return: DataFrame with the F, A, I, R and FAIR scores.
+        '''
+        scores = pd.DataFrame(index=metric_values.index)
+        for score in self.scores:
+            scores[score.column] = self.score_principle(score, metric_values)
+        scores[FAIR_SCORE] = self.score_fair(scores)
+        return scores
+
+DEFAULT_PROFILE = ScoringProfile('default')
@@ -2,30 +2,35 @@ import glob
 import os
 import json
 import pandas as pd
-import seaborn as sns
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 from datetime import datetime
 import utils
+import paths
+import snapshot_store
+from rendering import RenderQueue, render_boxplot
 
 class GenerateBoxplots():
     def __init__(self,fariness_evaluation_path):
-        with open('../data/kgs_by_topic.json', "r", encoding="utf-8") as f:
+        with open(paths.data_path('kgs_by_topic.json'), "r", encoding="utf-8") as f:
             kgs_by_topic = json.load(f)
         kgs_by_topic['all'] = []
         self.csv_files = []
         for topic in kgs_by_topic:
             self.csv_files.append((topic,glob.glob(os.path.join(f'{fariness_evaluation_path}/{topic}/', '*.csv')))) 
     
-    def generate_combined_boxplot(self,output_dir,column_to_plot,y_min,y_max,filter_by_ids = False):
+    def generate_combined_boxplot(self,output_dir,column_to_plot,y_min,y_max,filter_by_ids = False,render_queue = None):
+        '''
+            Compare the distribution of a score across the subclouds, on the last snapshot of each one.
+
+            :param render_queue: RenderQueue that draws the boxplot (None draws it here, as a PNG).
+            :return: DataFrame with the values of the score and the subcloud of each KG.
+        '''
         fair_scores = []
         for label, file in self.csv_files:
             file = sorted(file, key=lambda x: datetime.strptime(x.split('/')[-1].split('.')[0], "%Y-%m-%d"))
             if len(file) > 0:
-                df = pd.read_csv(file[len(file) - 1]) # Generate the boxplot based on the last analyisis data
+                df = snapshot_store.read_snapshot(file[len(file) - 1]) # Generate the boxplot based on the last analyisis data
                 if filter_by_ids:
-                    df = df[df['KG id'].isin(utils.get_always_observed_ids('../data/quality_data/all/2024-01-07.csv'))]
+                    df = utils.filter_always_observed(df)
                 if column_to_plot in df.columns:
                     fair_scores.append(pd.DataFrame({
                         column_to_plot : df[column_to_plot],
@@ -39,15 +44,12 @@ class GenerateBoxplots():
         summary = combined_df.groupby('Subclouds')[column_to_plot].describe()
         outliers_df = self.get_outliers(combined_df, value_column=column_to_plot, category_column='Subclouds')
         print(summary)
-        outliers_df.to_csv('outliers.csv', index=False)
+        outliers_df.to_csv(os.path.join(output_dir, 'outliers.csv'), index=False)
 
-        plt.figure(figsize=(12, 6))
-        sns.boxplot(data=combined_df, x='Subclouds', y=f'{column_to_plot}')
-        plt.xticks(rotation=45)
-        plt.ylim(y_min,y_max)
-        plt.title(f'{column_to_plot} distribution across subclouds')
-        plt.tight_layout()
-        plt.savefig(f'{output_dir}/{column_to_plot}')
+        if render_queue is None:
+            render_queue = RenderQueue(workers=0)
+        render_queue.submit(render_boxplot, f'{output_dir}/{column_to_plot}', combined_df, column_to_plot, y_min, y_max)
+        return combined_df
 
 
     def get_outliers(self, df, value_column, category_column):
@@ -0,0 +1,156 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+import paths
+from contextlib import contextmanager
+
+class TaskRecorder:
+    def __init__(self):
+        '''
+            Timers and counters of the task running in this process, filled by phase() and count() from the code of the stages.
+        '''
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        '''
+            Add the wall and CPU time of the block to the phase, a phase entered more times is summed.
+        '''
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            totals = self.phases.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})
+            totals['wall_seconds'] += time.perf_counter() - start
+            totals['cpu_seconds'] += time.process_time() - cpu_start
+            totals['calls'] += 1
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+recorder = TaskRecorder() # Replaced at the start of every task, see run_task
+
+def phase(name):
+    return recorder.phase(name)
+
+def count(name, value=1):
+    recorder.count(name, value)
+
+def get_task_name(task_id):
+    return '/'.join(str(part) for part in task_id if part is not None)
+
+def run_task(task_id, function, args, options=None):
+    '''
+        Run a task of the pipeline recording its wall and CPU time, the phases and counters recorded by its code and,
+        if requested, its Python profile and the peak of the memory it allocates.
+
+        :param options: dictionary with 'profile' (save the cProfile stats of the task in 'profile_path'), 'trace_memory'
+                        (measure the peak allocated memory with tracemalloc, it slows down the task) and 'top_functions'
+                        (functions with the highest cumulative time to list in the report).
+        :return: (result of the function, report of the task).
+    '''
+    global recorder
+    options = options if options is not None else {}
+    recorder = TaskRecorder()
+    profiler = cProfile.Profile() if options.get('profile') else None
+    if options.get('trace_memory'):
+        tracemalloc.start()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        if profiler is not None:
+            result = profiler.runcall(function, *args)
+        else:
+            result = function(*args)
+    finally:
+        report = {'task': get_task_name(task_id), 'stage': task_id[0], 'pid': os.getpid(),
+                  'wall_seconds': time.perf_counter() - start, 'cpu_seconds': time.process_time() - cpu_start,
+                  'phases': recorder.phases, 'counters': recorder.counters}
+        if options.get('trace_memory'):
+            report['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        if profiler is not None:
+            report['profile'] = save_profile(profiler, task_id, options.get('profile_path', paths.output_path('run_reports', 'profiles')), options.get('top_functions', 10))
+    return result, report
+
+def save_profile(profiler, task_id, profile_path, top_functions=10):
+    '''
+        Save the cProfile stats of a task (readable with pstats or snakeviz) and return its path with the top functions by cumulative time.
+    '''
+    os.makedirs(profile_path, exist_ok=True)
+    profile_file = os.path.join(profile_path, f"{get_task_name(task_id).replace('/', '_').replace('.csv', '')}.prof")
+    profiler.dump_stats(profile_file)
+    stats = pstats.Stats(profiler, stream=io.StringIO()).sort_stats('cumulative')
+    top = []
+    for (file_name, line, function_name), (_, calls, _, cumulative_time, _) in sorted(stats.stats.items(), key=lambda item: -item[1][3])[:top_functions]:
+        top.append({'function': f'{os.path.basename(file_name)}:{line}({function_name})', 'calls': calls, 'cumulative_seconds': cumulative_time})
+    return {'file': profile_file, 'top_functions': top}
+
+class RunReport:
+    def __init__(self, arguments):
+        '''
+            Report of a run of the pipeline: the options, the report of every task and the totals of each stage.
+
+            :param arguments: options of the run (e.g. the parsed command line), saved as they are.
+        '''
+        self.arguments = arguments
+        self.started_at = time.time()
+        self.tasks = []
+        self.failed = []
+        self.wall_seconds = None
+
+    def add_tasks(self, task_reports, failed=()):
+        self.tasks.extend(task_reports.values())
+        self.failed.extend(get_task_name(task_id) for task_id in failed)
+
+    def finish(self):
+        self.wall_seconds = time.time() - self.started_at
+
+    def get_stage_totals(self):
+        '''
+            Sum the time, the phases and the counters of the tasks of each stage, in the order in which the stages were run.
+        '''
+        stages = {}
+        for task in self.tasks:
+            totals = stages.setdefault(task['stage'], {'tasks': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'phases': {}, 'counters': {}})
+            totals['tasks'] += 1
+            totals['wall_seconds'] += task['wall_seconds']
+            totals['cpu_seconds'] += task['cpu_seconds']
+            for name, phase_totals in task['phases'].items():
+                stage_phase = totals['phases'].setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})
+                for key in stage_phase:
+                    stage_phase[key] += phase_totals[key]
+            for name, value in task['counters'].items():
+                totals['counters'][name] = totals['counters'].get(name, 0) + value
+            if 'peak_memory_mb' in task:
+                totals['peak_memory_mb'] = max(totals.get('peak_memory_mb', 0), task['peak_memory_mb'])
+        return stages
+
+    def save(self, report_file):
+        '''
+            Write the report as JSON.
+        '''
+        os.makedirs(os.path.dirname(os.path.abspath(report_file)), exist_ok=True)
+        report = {'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)), 'wall_seconds': self.wall_seconds,
+                  'arguments': self.arguments, 'stages': self.get_stage_totals(), 'tasks': self.tasks, 'failed': self.failed}
+        tmp_file = f'{report_file}.tmp{os.getpid()}'
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4, default=str)
+        os.replace(tmp_file, report_file)
+
+    def print_summary(self):
+        '''
+            Print one row for each stage with the number of tasks, the time, the slowest phases and the counters.
+        '''
+        print(f"{'stage':<22}{'tasks':>6}{'wall s':>10}{'CPU s':>10}  phases (wall s) / counters")
+        for stage, totals in self.get_stage_totals().items():
+            phases = sorted(totals['phases'].items(), key=lambda item: -item[1]['wall_seconds'])
+            details = [f"{name} {phase_totals['wall_seconds']:.1f}" for name, phase_totals in phases[:4]]
+            details += [f"{name} {value:g}" for name, value in totals['counters'].items()]
+            if 'peak_memory_mb' in totals:
+                details.append(f"peak {totals['peak_memory_mb']:.0f} MB")
+            print(f"{stage:<22}{totals['tasks']:>6}{totals['wall_seconds']:>10.1f}{totals['cpu_seconds']:>10.1f}  {', '.join(details)}")
@@ -0,0 +1,90 @@
+import os
+import json
+import pandas as pd
+import paths
+import instrumentation
+from lodcloud_store import get_compact, load_active_compact
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+_loaded_indexes = {}
+
+class LODCloudIndex:
+    def __init__(self, lodcloud_data):
+        '''
+            Build an in-memory index of the LOD Cloud metadata keyed by KG identifier.
+
+            :param lodcloud_data: LOD Cloud dump as loaded from lod-data.json.
+        '''
+        self.set_flags(get_compact(lodcloud_data))
+
+    def set_flags(self, compact):
+        '''
+            Index the Ontology, DOI and domain flags of a dump in compact form (see lodcloud_store.get_compact).
+        '''
+        flags = pd.DataFrame({
+            'KG id': compact['kg_ids'],
+            'Ontology': compact['ontology'],
+            'DOI': compact['doi'],
+            'Domain': [domain if domain != '' else 'no-domain' for domain in compact['domains']],
+        }, columns=['KG id','Ontology','DOI','Domain'])
+        self.flags = flags.drop_duplicates('KG id').set_index('KG id') # Keep the first match, as the linear scan did
+
+    @classmethod
+    def from_file(cls, lodcloud_file_path):
+        with open(lodcloud_file_path, "r", encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    @classmethod
+    def from_compact(cls, compact):
+        index = cls.__new__(cls)
+        index.set_flags(compact)
+        return index
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __contains__(self, kg_id):
+        return kg_id in self.flags.index
+
+    def lookup(self, kg_ids):
+        '''
+            Return the precomputed LOD Cloud flags aligned with the given KG ids.
+            KGs missing from the LOD Cloud get NaN flags.
+
+            :param kg_ids: Series with the KG ids (e.g. the 'KG id' column of the quality data).
+        '''
+        flags = self.flags.reindex(kg_ids.values)
+        flags.index = kg_ids.index
+        return flags
+
+    def is_ontology(self, kg_id):
+        if kg_id in self:
+            return bool(self.flags.at[kg_id, 'Ontology'])
+
+    def has_doi(self, kg_id):
+        if kg_id in self:
+            return int(self.flags.at[kg_id, 'DOI'])
+
+    def get_domain(self, kg_id):
+        if kg_id in self:
+            return self.flags.at[kg_id, 'Domain']
+
+def get_lodcloud_index(path_to_lodcloud_data_to_use = None):
+    '''
+        Return the LOD Cloud index for the given file, loading it only the first time
+        and again only if the file has been modified since. If the file is the version of the LOD Cloud store in use,
+        the index is built from the compact form of the version instead of parsing the whole dump.
+
+        :param path_to_lodcloud_data_to_use: path to the LOD Cloud dump, relative to this folder (None for the one in the data root).
+    '''
+    lodcloud_file_path = os.path.abspath(os.path.join(here,path_to_lodcloud_data_to_use if path_to_lodcloud_data_to_use is not None else paths.data_path('lodcloud.json')))
+    mtime = os.stat(lodcloud_file_path).st_mtime_ns
+    loaded = _loaded_indexes.get(lodcloud_file_path)
+    if loaded is None or loaded[0] != mtime:
+        with instrumentation.phase('load LOD Cloud'):
+            compact = load_active_compact(lodcloud_file_path)
+            loaded = (mtime, LODCloudIndex.from_compact(compact) if compact is not None else LODCloudIndex.from_file(lodcloud_file_path))
+        instrumentation.count('LOD Cloud loads')
+        _loaded_indexes[lodcloud_file_path] = loaded
+    return loaded[1]
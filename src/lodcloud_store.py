@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import paths
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+LODCLOUD_URL = 'https://lod-cloud.net/versions/{version}/lod-data.json'
+DEFAULT_VERSION = '2025-03-26' # Version of the LOD Cloud used in the article
+
+INDEX_FILE = 'index.json'
+DUMP_FILE = 'lod-data.json'
+COMPACT_FILE = 'compact.json'
+
+class LODCloudStore:
+    def __init__(self, store_path = None, active_file_path = None):
+        '''
+            Local store of the LOD Cloud dumps, one for each version (the date of the LOD Cloud release), so that the pipeline
+            never downloads the LOD Cloud: the dumps are added with the refresh command (or imported from a file) and validated
+            by their SHA-256 when they are used. Next to each dump the store keeps a compact form with only the fields used
+            by the pipeline (identifier, domain, ontology keyword and DOI of each dataset), read in place of the whole dump.
+
+            :param store_path: folder of the store, relative to this folder (None for the one in the data root).
+            :param active_file_path: the dump used by the evaluation (lodcloud.json), a copy of the selected version, relative to this folder
+                                     (None for the one in the data root).
+        '''
+        self.store_path = os.path.join(here, store_path if store_path is not None else paths.data_path('lodcloud_store'))
+        self.active_file_path = os.path.join(here, active_file_path if active_file_path is not None else paths.data_path('lodcloud.json'))
+        self.index_file_path = os.path.join(self.store_path, INDEX_FILE)
+        if os.path.exists(self.index_file_path):
+            with open(self.index_file_path, "r", encoding="utf-8") as file:
+                self.index = json.load(file)
+        else:
+            self.index = {'versions': {}, 'active': None}
+
+    def get_versions(self):
+        return sorted(self.index['versions'])
+
+    def select(self, version=None):
+        '''
+            Return the stored version to use: the latest one released on or before the given date (e.g. '2025-03-26' or the date
+            of a snapshot), the latest one if None. A store without versions is initialized with the lodcloud.json already in
+            the data folder, as the DEFAULT_VERSION.
+        '''
+        if len(self.index['versions']) == 0 and os.path.exists(self.active_file_path):
+            print(f"No LOD Cloud version stored, {os.path.basename(self.active_file_path)} imported as version {DEFAULT_VERSION}")
+            self.import_file(self.active_file_path, DEFAULT_VERSION)
+        versions = [stored for stored in self.get_versions() if version is None or stored <= version]
+        if len(versions) == 0:
+            raise ValueError(f"No LOD Cloud version stored on or before {version} (stored: {self.get_versions()}), add one with: python lodcloud_store.py refresh <version>")
+        return versions[-1]
+
+    def add(self, dump, version):
+        '''
+            Add the dump of a version (the bytes of its lod-data.json) to the store, with its compact form.
+        '''
+        lodcloud_data = json.loads(dump)
+        version_path = os.path.join(self.store_path, version)
+        os.makedirs(version_path, exist_ok=True)
+        compact = json.dumps(get_compact(lodcloud_data), ensure_ascii=False).encode('utf-8')
+        write_file(os.path.join(version_path, DUMP_FILE), dump)
+        write_file(os.path.join(version_path, COMPACT_FILE), compact)
+        self.index['versions'][version] = {'sha256': hashlib.sha256(dump).hexdigest(), 'compact_sha256': hashlib.sha256(compact).hexdigest(),
+                                           'datasets': len(lodcloud_data), 'added_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self.save_index()
+        print(f"LOD Cloud version {version} stored: {len(lodcloud_data)} datasets")
+
+    def import_file(self, dump_file_path, version):
+        with open(dump_file_path, 'rb') as file:
+            self.add(file.read(), version)
+
+    def refresh(self, version=DEFAULT_VERSION, timeout=60):
+        '''
+            Download the dump of a version of the LOD Cloud and add it to the store, the only access to the network.
+
+            :param timeout: seconds to wait for the server to answer, as in requests.get.
+        '''
+        import requests
+        url = LODCLOUD_URL.format(version=version)
+        print(f"Downloading {url}")
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        self.add(response.content, version)
+
+    def read_file(self, version, file_name, hash_key):
+        '''
+            Read a file of a stored version, raising a ValueError if its content is not the one stored.
+        '''
+        if version not in self.index['versions']:
+            raise ValueError(f"LOD Cloud version {version} not stored (stored: {self.get_versions()})")
+        with open(os.path.join(self.store_path, version, file_name), 'rb') as file:
+            content = file.read()
+        if hashlib.sha256(content).hexdigest() != self.index['versions'][version][hash_key]:
+            raise ValueError(f"{file_name} of the LOD Cloud version {version} does not match its hash, add the version again with: python lodcloud_store.py refresh {version}")
+        return content
+
+    def load_compact(self, version):
+        '''
+            Load the compact form of a version (see get_compact), rebuilt from the dump if it does not match its hash.
+        '''
+        try:
+            return json.loads(self.read_file(version, COMPACT_FILE, 'compact_sha256'))
+        except (OSError, ValueError):
+            print(f"Compact form of the LOD Cloud version {version} missing or corrupted, rebuilt from the dump")
+            self.add(self.read_file(version, DUMP_FILE, 'sha256'), version)
+            return json.loads(self.read_file(version, COMPACT_FILE, 'compact_sha256'))
+
+    def activate(self, version):
+        '''
+            Make the dump of a version the one used by the evaluation (lodcloud.json), written only if it is another version.
+            A lodcloud.json that is not a stored version is never overwritten, it has to be imported first.
+        '''
+        if self.get_active_version() == version:
+            return
+        dump = self.read_file(version, DUMP_FILE, 'sha256')
+        if os.path.exists(self.active_file_path) and self.get_active_version() is None:
+            if file_sha256(self.active_file_path) not in [stored['sha256'] for stored in self.index['versions'].values()]:
+                raise ValueError(f"{self.active_file_path} is not a stored LOD Cloud version, import it with: python lodcloud_store.py import {self.active_file_path} <version>")
+        write_file(self.active_file_path, dump)
+        stat = os.stat(self.active_file_path)
+        self.index['active'] = {'version': version, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        self.save_index()
+        print(f"LOD Cloud version {version} in use")
+
+    def get_active_version(self):
+        '''
+            Version copied in lodcloud.json by activate, None if the file was changed since or was not written by the store.
+        '''
+        active = self.index.get('active')
+        if active is None or not os.path.exists(self.active_file_path):
+            return None
+        stat = os.stat(self.active_file_path)
+        if (stat.st_size, stat.st_mtime_ns) != (active['size'], active['mtime_ns']) or active['version'] not in self.index['versions']:
+            return None
+        return active['version']
+
+    def save_index(self):
+        write_file(self.index_file_path, json.dumps(self.index, indent=4).encode('utf-8'))
+
+def get_compact(lodcloud_data):
+    '''
+        Compact form of a LOD Cloud dump: one list for each field used by the pipeline, with an item for each dataset in the order of the dump.
+        The KG ids have the ',' replaced by ';', as the KG id in the KGHeartBeat CSV files.
+    '''
+    datasets = list(lodcloud_data.values())
+    return {
+        'kg_ids': [dataset['identifier'].replace(',',';') for dataset in datasets],
+        'domains': [dataset.get('domain','') for dataset in datasets],
+        'ontology': ['ontology' in dataset.get('keywords','') for dataset in datasets],
+        'doi': [1 if dataset.get('doi','') != '' else 0 for dataset in datasets],
+    }
+
+def load_active_compact(lodcloud_file_path, store=None):
+    '''
+        Compact form of the LOD Cloud dump in lodcloud_file_path if it is the active version of the store, None otherwise.
+    '''
+    store = store if store is not None else LODCloudStore()
+    if os.path.abspath(lodcloud_file_path) != os.path.abspath(store.active_file_path):
+        return None
+    version = store.get_active_version()
+    return store.load_compact(version) if version is not None else None
+
+def file_sha256(file_path):
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def write_file(file_path, content):
+    '''
+        Write a file through a temporary file renamed at the end, so that readers never see it half written.
+    '''
+    tmp_file_path = f'{file_path}.tmp{os.getpid()}'
+    with open(tmp_file_path, 'wb') as file:
+        file.write(content)
+    os.replace(tmp_file_path, file_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Manage the local store of the LOD Cloud dumps used by the pipeline.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = commands.add_parser('refresh', help='download a version of the LOD Cloud into the store')
+    refresh_parser.add_argument('version', nargs='?', default=DEFAULT_VERSION, help='date of the LOD Cloud release, as in lod-cloud.net/versions')
+    refresh_parser.add_argument('--timeout', type=float, default=60, help='seconds to wait for lod-cloud.net')
+    import_parser = commands.add_parser('import', help='add a lod-data.json file to the store')
+    import_parser.add_argument('file', help='path to the lod-data.json file')
+    import_parser.add_argument('version', help='date of the LOD Cloud release of the file')
+    commands.add_parser('list', help='list the stored versions')
+    args = parser.parse_args()
+
+    store = LODCloudStore()
+    if args.command == 'refresh':
+        store.refresh(args.version, args.timeout)
+    elif args.command == 'import':
+        store.import_file(args.file, args.version)
+    else:
+        active_version = store.get_active_version()
+        for version in store.get_versions():
+            stored = store.index['versions'][version]
+            print(f"{version}  {stored['datasets']} datasets  sha256 {stored['sha256'][:12]}{'  (in use)' if version == active_version else ''}")
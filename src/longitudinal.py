@@ -0,0 +1,219 @@
+import os
+import glob
+import warnings
+import numpy as np
+import pandas as pd
+import paths
+import snapshot_store
+
+TREND_SCORES = ['F score', 'A score', 'I score', 'R score', 'FAIR score']
+
+# Upper bounds of the score bands (a score equal to a bound is in the next band), the FAIR score is the sum of the four scores
+SCORE_BANDS = {
+    'F score': [0.25, 0.5, 0.75],
+    'A score': [0.25, 0.5, 0.75],
+    'I score': [0.25, 0.5, 0.75],
+    'R score': [0.25, 0.5, 0.75],
+    'FAIR score': [1, 2, 3],
+}
+
+RESULT_FILES = ['kg_changes.csv', 'summary.csv', 'band_transitions.csv']
+
+class LongitudinalScores:
+    def __init__(self, fairness_evaluation_path = None, subclouds = None, metrics = TREND_SCORES):
+        '''
+            The FAIRness results of all the snapshots of all the subclouds, read once and aligned in a single
+            (KG x snapshot x metric) array, NaN where a KG was not observed. Each row is a KG of a subcloud: the same KG is
+            evaluated separately in the 'all' subcloud and in its topic, so the two series are kept apart.
+
+            :param fairness_evaluation_path: folder with one subfolder of snapshot CSVs for each subcloud (None for the one in the output root).
+            :param subclouds: names of the subclouds to read (None for all the subfolders).
+            :param metrics: columns of the FAIRness results to follow over time.
+        '''
+        fairness_evaluation_path = fairness_evaluation_path if fairness_evaluation_path is not None else paths.output_path('fairness_evaluation_results')
+        if subclouds is None:
+            subclouds = sorted(os.path.basename(os.path.dirname(path)) for path in glob.glob(os.path.join(fairness_evaluation_path, '*', '')))
+        self.metrics = list(metrics)
+
+        frames = []
+        for subcloud in subclouds:
+            for csv_file in glob.glob(os.path.join(fairness_evaluation_path, subcloud, '*.csv')):
+                df = snapshot_store.read_snapshot(csv_file, usecols=['KG id'] + self.metrics)
+                df = df.drop_duplicates('KG id') # A few KGs are listed twice in a snapshot, the first evaluation is kept
+                frames.append(df.assign(Subcloud=subcloud, Snapshot=os.path.basename(csv_file).split('.')[0]))
+        observations = pd.concat(frames, ignore_index=True) if len(frames) > 0 else pd.DataFrame(columns=['KG id', 'Subcloud', 'Snapshot'] + self.metrics)
+
+        snapshot_codes, self.snapshots = pd.factorize(observations['Snapshot'], sort=True) # The dates are ISO formatted, sorted as strings
+        keys = pd.MultiIndex.from_frame(observations[['Subcloud', 'KG id']])
+        self.rows = keys.unique()
+        row_codes = self.rows.get_indexer(keys)
+        self.subcloud_codes, self.subclouds = pd.factorize(self.rows.get_level_values('Subcloud'), sort=True)
+
+        self.values = np.full((len(self.rows), len(self.snapshots), len(self.metrics)), np.nan)
+        self.values[row_codes, snapshot_codes] = observations[self.metrics].to_numpy(dtype=float)
+        print(f"{len(observations)} observations of {len(self.rows)} KGs in {len(self.subclouds)} subclouds and {len(self.snapshots)} snapshots")
+
+    def get_series(self, metric):
+        '''
+            Return the values of a metric with one row for each KG of each subcloud and one column for each snapshot.
+        '''
+        return pd.DataFrame(self.values[:, :, self.metrics.index(metric)], index=self.rows, columns=self.snapshots)
+
+    def get_previous_observations(self):
+        '''
+            For each KG and snapshot, the values of the last earlier snapshot in which the KG was observed (NaN if none),
+            so that the deltas skip the snapshots in which a KG (or its whole subcloud) is missing.
+        '''
+        observed = ~np.isnan(self.values)
+        positions = np.where(observed, np.arange(len(self.snapshots))[None, :, None], -1)
+        last_observed = np.maximum.accumulate(positions, axis=1)
+        previous = np.full(self.values.shape, -1)
+        previous[:, 1:] = last_observed[:, :-1]
+        previous_values = np.take_along_axis(self.values, np.maximum(previous, 0), axis=1)
+        return np.where(previous >= 0, previous_values, np.nan)
+
+    def get_deltas(self):
+        '''
+            Change of each metric from the previous observation of the KG, NaN for the first one and where the KG is not observed.
+        '''
+        return self.values - self.get_previous_observations()
+
+    def get_bands(self, metric, bands = None):
+        '''
+            Band of each value of a metric (0 is the lowest), -1 where the KG is not observed.
+
+            :param bands: upper bounds of the bands, SCORE_BANDS[metric] if None.
+        '''
+        values = self.values[:, :, self.metrics.index(metric)]
+        bands = SCORE_BANDS[metric] if bands is None else bands
+        return np.where(np.isnan(values), -1, np.digitize(values, bands))
+
+    def get_kg_changes(self):
+        '''
+            Longitudinal statistics of each KG of each subcloud, for each metric: number of observations, first and last value,
+            total delta (last - first), mean absolute delta between consecutive observations and volatility
+            (standard deviation of the observed values).
+
+            :return: DataFrame indexed by (subcloud, KG id) with one '<metric> <statistic>' column for each statistic.
+        '''
+        observed = ~np.isnan(self.values)
+        observations = observed.sum(axis=1)
+        padded = np.concatenate([self.values, np.full(self.values[:, :1].shape, np.nan)], axis=1) # The last position is NaN, for the KGs never observed
+        positions = np.arange(len(self.snapshots))[None, :, None]
+        first_position = np.where(observed, positions, len(self.snapshots)).min(axis=1, keepdims=True, initial=len(self.snapshots))
+        last_position = np.where(observed, positions, -1).max(axis=1, keepdims=True, initial=-1)
+        first = np.take_along_axis(padded, first_position, axis=1)[:, 0]
+        last = np.take_along_axis(padded, np.where(last_position >= 0, last_position, len(self.snapshots)), axis=1)[:, 0]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning) # KGs observed once or never
+            mean_absolute_delta = np.nanmean(np.abs(self.get_deltas()), axis=1)
+            volatility = np.where(observations >= 2, np.nanstd(self.values, axis=1), np.nan)
+
+        statistics = {'observations': observations, 'first': first, 'last': last, 'total delta': last - first,
+                      'mean absolute delta': mean_absolute_delta, 'volatility': volatility}
+        changes = pd.DataFrame(index=self.rows)
+        for i, metric in enumerate(self.metrics):
+            for statistic, values in statistics.items():
+                changes[f'{metric} {statistic}'] = values[:, i]
+        return changes
+
+    def summarize(self):
+        '''
+            Aggregate the changes of the KGs of each subcloud observed at least twice, for all the metrics at once:
+            mean total delta, KGs that improved, worsened or stayed the same, mean volatility and KGs that changed band at least once.
+
+            :return: DataFrame indexed by (subcloud, metric).
+        '''
+        observed = ~np.isnan(self.values)
+        followed = observed.sum(axis=1) >= 2
+        changes = self.get_kg_changes()
+        total_delta = np.stack([changes[f'{metric} total delta'].to_numpy() for metric in self.metrics], axis=1)
+        volatility = np.stack([changes[f'{metric} volatility'].to_numpy() for metric in self.metrics], axis=1)
+        moved_band = np.stack([self.get_band_moves(metric) > 0 for metric in self.metrics], axis=1)
+
+        statistics = {
+            'KGs followed': followed,
+            'mean total delta': np.where(followed, total_delta, 0),
+            'improved': followed & (total_delta > 0),
+            'worsened': followed & (total_delta < 0),
+            'unchanged': followed & (total_delta == 0),
+            'mean volatility': np.where(followed, volatility, 0),
+            'changed band': followed & moved_band,
+        }
+        # One grouped sum for each statistic, over all the (subcloud, metric) pairs
+        groups = (self.subcloud_codes[:, None] * len(self.metrics) + np.arange(len(self.metrics))[None, :]).ravel()
+        size = len(self.subclouds) * len(self.metrics)
+        sums = {statistic: np.bincount(groups, weights=values.astype(float).ravel(), minlength=size) for statistic, values in statistics.items()}
+        followed_kgs = sums['KGs followed']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for statistic in ('mean total delta', 'mean volatility'):
+                sums[statistic] = np.where(followed_kgs > 0, sums[statistic] / followed_kgs, np.nan)
+
+        index = pd.MultiIndex.from_product([self.subclouds, self.metrics], names=['Subcloud', 'Metric'])
+        summary = pd.DataFrame(sums, index=index)
+        for statistic in ('KGs followed', 'improved', 'worsened', 'unchanged', 'changed band'):
+            summary[statistic] = summary[statistic].astype(int)
+        return summary
+
+    def get_band_moves(self, metric, bands = None):
+        '''
+            Number of times each KG moved to another band of a metric between two consecutive observations.
+        '''
+        current, previous = self.get_band_pairs(metric, bands)
+        return ((current >= 0) & (previous >= 0) & (current != previous)).sum(axis=1)
+
+    def get_band_pairs(self, metric, bands = None):
+        '''
+            Return the band of each observation of a metric and the band of the previous observation of the same KG (-1 if none).
+        '''
+        bands = SCORE_BANDS[metric] if bands is None else bands
+        i = self.metrics.index(metric)
+        current = self.get_bands(metric, bands)
+        previous_values = self.get_previous_observations()[:, :, i]
+        previous = np.where(np.isnan(previous_values), -1, np.digitize(previous_values, bands))
+        return current, previous
+
+    def get_band_transitions(self, metric, bands = None):
+        '''
+            Number of KGs of each subcloud that moved from a band of the metric to another (or stayed in the same) between
+            consecutive observations, summed over all the snapshots.
+
+            :param bands: upper bounds of the bands, SCORE_BANDS[metric] if None.
+            :return: DataFrame with the subcloud, the band before, the band after and the number of transitions (only the pairs observed).
+        '''
+        bands = SCORE_BANDS[metric] if bands is None else bands
+        n_bands = len(bands) + 1
+        current, previous = self.get_band_pairs(metric, bands)
+        pairs = (current >= 0) & (previous >= 0)
+        subclouds = np.broadcast_to(self.subcloud_codes[:, None], current.shape)
+        codes = (subclouds[pairs] * n_bands + previous[pairs]) * n_bands + current[pairs]
+        counts = np.bincount(codes, minlength=len(self.subclouds) * n_bands * n_bands)
+
+        labels = get_band_labels(bands)
+        index = pd.MultiIndex.from_product([self.subclouds, labels, labels], names=['Subcloud', 'From', 'To'])
+        transitions = pd.DataFrame({'Transitions': counts}, index=index)
+        return transitions[transitions['Transitions'] > 0].reset_index()
+
+    def save_results(self, output_path = None):
+        '''
+            Write the changes of each KG, the summary of each subcloud and the band transitions of each metric as CSVs.
+
+            :param output_path: folder of the CSVs (None for the one in the output root).
+            :return: paths of the files written.
+        '''
+        output_path = output_path if output_path is not None else paths.output_path('longitudinal_results')
+        os.makedirs(output_path, exist_ok=True)
+        output_files = [os.path.join(output_path, result_file) for result_file in RESULT_FILES]
+        self.get_kg_changes().to_csv(output_files[0])
+        self.summarize().to_csv(output_files[1])
+        transitions = [self.get_band_transitions(metric).assign(Metric=metric) for metric in self.metrics]
+        pd.concat(transitions, ignore_index=True)[['Metric', 'Subcloud', 'From', 'To', 'Transitions']].to_csv(output_files[2], index=False)
+        return output_files
+
+def get_band_labels(bands):
+    '''
+        Labels of the bands delimited by the given upper bounds, e.g. '< 0.25', '0.25 - 0.5', ..., '>= 0.75'.
+    '''
+    if len(bands) == 0:
+        return ['all']
+    return [f'< {bands[0]}'] + [f'{low} - {high}' for low, high in zip(bands[:-1], bands[1:])] + [f'>= {bands[-1]}']
@@ -1,94 +1,118 @@
-from split_data_by_topic import SplitLODCKGsByTopic
-from evaluate_fairness import EvaluateFAIRness
-from calculate_correlation import CalculateCorrelation
-from generate_boxplots import GenerateBoxplots
-import json
-import glob
 import os
-import utils
+import argparse
+import time
 from datetime import datetime
+import paths
+from instrumentation import RunReport
+from pipeline import STAGES, RENDER_OPTIONS, SIGNIFICANCE_OPTIONS, load_kgs_by_topic, get_split_topics, build_task_graph, report_probes, report_reuse, update_manifest
 
-# Split KGHB quality data into quality data separated by topic
-def split_quality_data_by_domain():
-    split_data = SplitLODCKGsByTopic('../data/quality_data/kghb_output')
-    split_data.split_kgs_csv_by_topic()
-    split_data.extract_only_lodc()
+# Stages run by each command, 'run' runs the ones given with --stages
+COMMANDS = {
+    'split': ['split'],
+    'evaluate': ['evaluate'],
+    'correlate': ['correlate'],
+    'boxplots': ['plot'],
+    'trends': ['trends'],
+    'normality': ['normality'],
+}
 
-# Verify the normal distribution of the FAIRness evaluation data (if only one column is not normal distributed, we can't use Pearson correlation but Spearman)
-def verify_normal_distribution(kgs_by_topic):
-   
-    for topic in kgs_by_topic:
-        print(f"Verifying normal distribution for subclouds {topic}...")
-        utils.verify_normal_distribution(f'../data/fairness_evaluation_results/{topic}/2024-01-07.csv',['F1-M Unique and persistent ID','F1-D URIs dereferenceability','F2a-M - Metadata availability via standard primary sources',
-                                                                                                'F2b-M Metadata availability for all the attributes covered in the FAIR score computation','F3-M Data referrable via a DOI',
-                                                                                                'F4-M Metadata registered in a searchable engine','F score','A1-D Working access point(s)','A1-M Metadata availability via working primary sources',
-                                                                                                'A1.2 Authentication & HTTPS support','A2-M Registered in search engines','A score','I1-D Standard & open representation format',
-                                                                                                'I1-M Metadata are described with VoID/DCAT predicates','I2 Use of FAIR vocabularies','I3-D Degree of connection','I score',
-                                                                                                'R1.1 Machine- or human-readable license retrievable via any primary source',"R1.2 Publisher information, such as authors, contributors, publishers, and sources",
-                                                                                                'R1.3-D Data organized in a standardized way','R1.3-M Metadata are described with VoID/DCAT predicates','R score','FAIR score'])
-     
-# Calculate the FAIRness by topic
-def evaluate_fairness(kgs_by_topic):
+def snapshot_date(value):
+    '''
+        Date of a snapshot given on the command line, as 2024-01-07 or as the name of its CSV.
+    '''
+    date = os.path.basename(value).split('.')[0]
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a snapshot date (YYYY-MM-DD)")
+    return date
 
-    for topic in kgs_by_topic:
-        print(f"Evaluating the FAIRness of the {topic} subcloud")
-        csv_files = glob.glob(os.path.join(f'../data/quality_data/{topic}/', '*.csv'))
-        os.makedirs(f"../data/fairness_evaluation_results/{topic}",exist_ok=True)
-        for csv_file in csv_files:
-            fairness = EvaluateFAIRness(csv_file,f"../data/fairness_evaluation_results/{topic}/{os.path.basename(csv_file)}")
-            fairness.evaluate_findability()
-            fairness.evaluate_availability()
-            fairness.evaluate_interoperability()
-            fairness.evaluate_reusability()
-            fairness.calculate_FAIR_score()
-            fairness.save_file()
+def add_options(parser):
+    parser.add_argument('--topics', nargs='+', default=None, help="topics (subclouds) to process, 'all' for the whole LOD Cloud (default all the topics)")
+    parser.add_argument('--snapshots', nargs='+', type=snapshot_date, default=None, help='dates of the snapshots to process, e.g. 2024-01-07 (default all the snapshots)')
+    parser.add_argument('--data-root', default=None, help='folder with the quality data, the LOD Cloud and the caches (default data/ in the repository)')
+    parser.add_argument('--output-root', default=None, help='folder of the results, the manifest, the run reports and the charts (default the data root, and charts/ for the charts)')
+    parser.add_argument('--jobs', type=int, default=1, help='number of worker processes for the (stage, topic, snapshot) tasks')
+    parser.add_argument('--probe-cache-ttl', type=float, default=None, help='seconds after which a cached SPARQL endpoint probe is repeated')
+    parser.add_argument('--snapshot-store', action='store_true', help='cache the parsed CSVs as NumPy columns in data/snapshot_store and read them from there')
+    parser.add_argument('--render-jobs', type=int, default=None, help='processes that draw the heatmaps and boxplots of each task, 0 draws them in the task process (default 1 with --jobs 1, 0 with more jobs)')
+    parser.add_argument('--dpi', type=int, default=RENDER_OPTIONS['dpi'], help='resolution of the charts (default 300 for the heatmaps and 100 for the boxplots)')
+    parser.add_argument('--image-format', default=RENDER_OPTIONS['image_format'], help='format of the charts, e.g. png, svg or pdf')
+    parser.add_argument('--no-render', action='store_true', help='write only the CSV results, without drawing the charts')
+    parser.add_argument('--significance', choices=['asymptotic', 'permutation'], default=SIGNIFICANCE_OPTIONS['significance'], help='test of the significance stars of the correlations')
+    parser.add_argument('--permutations', type=int, default=SIGNIFICANCE_OPTIONS['n_permutations'], help='permutations of the permutation test of each correlation matrix')
+    parser.add_argument('--correction', choices=['holm', 'bh', 'none'], default=SIGNIFICANCE_OPTIONS['correction'], help='multiple-testing correction of the permutation p-values across each matrix')
+    parser.add_argument('--seed', type=int, default=SIGNIFICANCE_OPTIONS['seed'], help='seed of the bootstrap confidence intervals and of the permutation test, for reproducible correlation results (recorded in the manifest)')
+    parser.add_argument('--force', action='store_true', help='rebuild all the outputs, also the ones up to date in the manifest')
+    parser.add_argument('--delta', action='store_true', help='reuse the FAIRness evaluation of the KGs whose quality data did not change since the previous snapshot')
+    parser.add_argument('--derive-subclouds', action='store_true', help="evaluate only the 'all' subcloud of each snapshot and derive the FAIRness of the topics from it")
+    parser.add_argument('--lodcloud-version', default=None, help='LOD Cloud version used by the split, the latest stored on or before this date (default the latest stored)')
+    parser.add_argument('--chunksize', type=int, default=None, help='split and evaluate the snapshots in chunks of this many rows, to bound the memory used by large snapshots')
+    parser.add_argument('--report', default=None, help='JSON file of the run report (default run_reports/run-<date and time>.json in the output root)')
+    parser.add_argument('--profile', action='store_true', help='profile every task with cProfile, the stats are saved in run_reports/profiles in the output root')
+    parser.add_argument('--trace-memory', action='store_true', help='measure the peak memory allocated by every task with tracemalloc (slower)')
 
-def calculate_correlation(kgs_by_topic):
+def get_parser():
+    '''
+        Command line with a command for each stage, e.g. python main.py evaluate --topics life_sciences --snapshots 2024-01-07
+        The options are defined only on the commands, so they go after the command: given before it they are rejected.
+    '''
+    parser = argparse.ArgumentParser(description='Evaluate the FAIRness of the LOD Cloud KGs and the correlation between the FAIR metrics.')
+    options = argparse.ArgumentParser(add_help=False)
+    add_options(options)
+    commands = parser.add_subparsers(dest='command', metavar='command', required=True)
+    run_parser = commands.add_parser('run', parents=[options], help='run the stages given with --stages')
+    run_parser.add_argument('--stages', nargs='+', choices=STAGES, default=['correlate'], help='stages to run (split -> evaluate -> correlate -> plot / trends / normality)')
+    command_help = {'split': 'split the KGHeartBeat snapshots by topic', 'evaluate': 'evaluate the FAIRness of the snapshots of each topic',
+                    'correlate': 'calculate the correlation matrices of the FAIR metrics and of the quality dimensions', 'boxplots': 'draw the boxplots of the FAIR scores of the topics',
+                    'trends': 'follow the FAIR scores of every KG across the snapshots',
+                    'normality': 'test the normal distribution of the FAIR metrics of every snapshot (Pearson or Spearman correlation)'}
+    for command in COMMANDS:
+        commands.add_parser(command, parents=[options], help=command_help[command])
+    return parser
 
-    for topic in kgs_by_topic:
-        csv_files = glob.glob(os.path.join(f'../data/fairness_evaluation_results/{topic}/', '*.csv'))
-        for csv_file in csv_files:
-            correlation = CalculateCorrelation(f'../data/fairness_evaluation_results/{topic}/{os.path.basename(csv_file)}',topic,os.path.basename(csv_file).split('.')[0]) # Only one file we have for now (only one observation)
-            correlation.calculate_spearman_correlation_matrix(
-                ['F1-M Unique and persistent ID','F1-D URIs dereferenceability','F2a-M - Metadata availability via standard primary sources',
-                                                                                                        'F2b-M Metadata availability for all the attributes covered in the FAIR score computation','F3-M Data referrable via a DOI',
-                                                                                                        'F4-M Metadata registered in a searchable engine','F score','A1-D Working access point(s)','A1-M Metadata availability via working primary sources',
-                                                                                                        'A1.2 Authentication & HTTPS support','A2-M Registered in search engines','A score','I1-D Standard & open representation format',
-                                                                                                        'I1-M Metadata are described with VoID/DCAT predicates','I2 Use of FAIR vocabularies','I3-D Degree of connection','I score',
-                                                                                                        'R1.1 Machine- or human-readable license retrievable via any primary source',"R1.2 Publisher information, such as authors, contributors, publishers, and sources",
-                                                                                                        'R1.3-D Data organized in a standardized way','R1.3-M Metadata are described with VoID/DCAT predicates','R score','FAIR score'],
-            True)
-
-def calculate_correlation_on_quality_dimensions(kgs_by_topic):
-    for topic in kgs_by_topic:
-        csv_files = glob.glob(os.path.join(f'../data/quality_data/{topic}/', '*.csv'))
-        csv_files = sorted(csv_files, key=lambda x: datetime.strptime(x.split('/')[-1].split('.')[0], "%Y-%m-%d"))
-
-        correlation = CalculateCorrelation(f'../data/quality_data/{topic}/{os.path.basename(csv_files[len(csv_files) - 1])}',topic,os.path.basename(csv_files[len(csv_files) - 1]).split('.')[0])
-        correlation.calculate_spearman_correlation_matrix(['Availability score','Security score','Verifiability score','Interlinking score','Licensing score'],
-        True,True,False)
-       
-        correlation = CalculateCorrelation(f'../data/quality_data/{topic}/{os.path.basename(csv_files[len(csv_files) - 1])}',topic,os.path.basename(csv_files[len(csv_files) - 1]).split('.')[0])
-        correlation.calculate_spearman_correlation_matrix(['Availability score','Security score','Verifiability score','Interlinking score','Licensing score'],
-        True,True,True)
+if __name__ == "__main__":
+    parser = get_parser()
+    args = parser.parse_args()
+    if args.command in COMMANDS:
+        args.stages = COMMANDS[args.command]
+    if args.seed is not None and args.seed < 0:
+        parser.error('--seed must be a non-negative integer')
+    if args.chunksize is not None and (args.delta or args.derive_subclouds):
+        parser.error('--chunksize cannot be combined with --delta or --derive-subclouds')
 
-def generate_boxplots():
+    paths.set_roots(args.data_root, args.output_root) # Before the stages read or write any file, inherited by the worker processes
+    if args.snapshot_store:
+        os.environ['FAIRLENS_SNAPSHOT_STORE'] = '1' # Read by snapshot_store when imported by the stages, also in the worker processes
 
-    fair_score_boxplot = GenerateBoxplots('../data/fairness_evaluation_results')
+    # The topics are written by the split: when it runs, they are the ones it will write from its LOD Cloud version
+    kgs_by_topic = get_split_topics(args.lodcloud_version) if 'split' in args.stages else load_kgs_by_topic()
+    if args.topics is not None:
+        unknown_topics = [topic for topic in args.topics if topic not in kgs_by_topic]
+        if len(unknown_topics) > 0:
+            parser.error(f"unknown topics {unknown_topics}, the topics are the domains of the LOD Cloud in {paths.data_path('kgs_by_topic.json')} (or 'all')")
+        kgs_by_topic = {topic: kgs_by_topic[topic] for topic in kgs_by_topic if topic in args.topics}
 
-    fair_score_boxplot.generate_combined_boxplot('../charts','F score',0,1.01,True)
-    fair_score_boxplot.generate_combined_boxplot('../charts','A score',0,1.01,True)
-    fair_score_boxplot.generate_combined_boxplot('../charts','I score',0,1.01,True)
-    fair_score_boxplot.generate_combined_boxplot('../charts','R score',0,1.01,True)
-    fair_score_boxplot.generate_combined_boxplot('../charts','FAIR score',0,4,True)
+    start = time.perf_counter()
+    run_report = RunReport(vars(args))
+    instrumentation_options = {'profile': args.profile, 'trace_memory': args.trace_memory, 'profile_path': paths.output_path('run_reports', 'profiles')}
+    # A single rendering process lets the in-process tasks go on while the charts are drawn, the worker processes of --jobs draw them themselves
+    render_jobs = args.render_jobs if args.render_jobs is not None else (1 if args.jobs == 1 else RENDER_OPTIONS['workers'])
+    render_options = {'workers': render_jobs, 'dpi': args.dpi, 'image_format': args.image_format, 'render': not args.no_render}
+    significance_options = {'significance': args.significance, 'n_permutations': args.permutations, 'correction': args.correction if args.correction != 'none' else None, 'seed': args.seed}
+    graph = build_task_graph(kgs_by_topic, args.stages, args.probe_cache_ttl, args.force, render_options, args.delta, args.derive_subclouds, significance_options, args.chunksize, args.lodcloud_version, args.snapshots)
+    results, failed = graph.run(args.jobs, instrumentation_options)
+    report_probes(results)
+    report_reuse(results)
+    update_manifest(results)
+    print(f"{len(results)} of {len(graph)} tasks completed in {time.perf_counter() - start:.1f}s with {args.jobs} jobs")
 
-if __name__ == "__main__":
-    with open('../data/kgs_by_topic.json', "r", encoding="utf-8") as f:
-        kgs_by_topic = json.load(f)
-    kgs_by_topic['all'] = [] # Only useful to evaluate the FAIRness on the entire LOD Cloud, to use it as baseline (no topical distinction)
-    
-    #split_quality_data_by_domain()
-    #evaluate_fairness(kgs_by_topic)
-    #verify_normal_distribution(kgs_by_topic)
-    calculate_correlation(kgs_by_topic)
-    calculate_correlation_on_quality_dimensions(kgs_by_topic)
\ No newline at end of file
+    run_report.add_tasks(graph.reports, failed)
+    run_report.finish()
+    report_file = args.report if args.report is not None else paths.output_path('run_reports', f"run-{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}.json")
+    run_report.save(report_file)
+    run_report.print_summary()
+    print(f"Run report written to {report_file}")
+    if failed:
+        print(f"{len(failed)} tasks failed or skipped: {failed}")
+        raise SystemExit(1)
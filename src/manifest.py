@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+import paths
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+class Manifest:
+    def __init__(self, manifest_file_path = None):
+        '''
+            Record of how every output of the pipeline was built: the content hashes of its inputs, the version of the code and the parameters.
+            An output is rebuilt only if one of them changed since the last run (or the output is missing).
+
+            :param manifest_file_path: path to the JSON file with the manifest, relative to this folder (None for the one in the output root).
+        '''
+        self.manifest_file_path = os.path.join(here, manifest_file_path if manifest_file_path is not None else paths.output_path('manifest.json'))
+        self.file_hashes = {}
+        if os.path.exists(self.manifest_file_path):
+            with open(self.manifest_file_path, "r", encoding="utf-8") as file:
+                self.entries = json.load(file)
+        else:
+            self.entries = {}
+
+    def get_key(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.dirname(self.manifest_file_path))
+
+    def file_hash(self, path):
+        '''
+            SHA-256 of the content of a file (None if it does not exist), memoized by modification time and size.
+        '''
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        if key not in self.file_hashes:
+            sha = hashlib.sha256()
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(1024 * 1024), b''):
+                    sha.update(block)
+            self.file_hashes[key] = sha.hexdigest()
+        return self.file_hashes[key]
+
+    def get_entry(self, inputs, version, params):
+        return {
+            'inputs': {self.get_key(path): self.file_hash(path) for path in sorted(inputs)},
+            'version': version,
+            'params': json.loads(json.dumps(params)),
+        }
+
+    def is_fresh(self, outputs, inputs, version, params):
+        '''
+            Check if the outputs exist and were built from the same inputs, code version and parameters.
+
+            :param outputs: paths of the files written by the task.
+            :param inputs: paths of the files read by the task.
+            :param version: version of the code that computes the outputs (see code_version).
+            :param params: JSON serializable parameters of the task.
+        '''
+        entry = self.get_entry(inputs, version, params)
+        for output in outputs:
+            if not os.path.exists(output) or self.entries.get(self.get_key(output)) != entry:
+                return False
+        return True
+
+    def build_entries(self, outputs, inputs, version, params):
+        '''
+            Return the manifest entries of outputs just built, to be recorded with update.
+        '''
+        entry = self.get_entry(inputs, version, params)
+        return {self.get_key(output): entry for output in outputs}
+
+    def build_stale_entries(self, outputs, reason):
+        '''
+            Return manifest entries that mark outputs just written as stale, so that the next run builds them again.
+
+            :param reason: why the outputs cannot be reused, recorded in the entries.
+        '''
+        return {self.get_key(output): {'stale': reason} for output in outputs}
+
+    def update(self, entries):
+        self.entries.update(entries)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.manifest_file_path), exist_ok=True)
+        tmp_file_path = self.manifest_file_path + '.tmp'
+        with open(tmp_file_path, 'w', encoding='utf-8') as file:
+            json.dump(self.entries, file, indent=4, sort_keys=True)
+        os.replace(tmp_file_path, self.manifest_file_path)
+
+def code_version(module_files):
+    '''
+        Version of the code as the hash of the source files that compute an output, so that a change to a metric rebuilds its results.
+
+        :param module_files: names of the source files in this folder.
+    '''
+    sha = hashlib.sha256()
+    for module_file in sorted(module_files):
+        with open(os.path.join(here, module_file), 'rb') as file:
+            sha.update(module_file.encode())
+            sha.update(file.read())
+    return sha.hexdigest()[:16]
@@ -0,0 +1,109 @@
+import os
+import glob
+import warnings
+import numpy as np
+import pandas as pd
+import paths
+import snapshot_store
+
+ALPHA = 0.05 # A metric is normally distributed if the p-value of the Shapiro-Wilk test is not lower than this
+
+RESULT_FILE = 'normality.csv'
+
+REPORT_COLUMNS = ['Subcloud', 'Snapshot', 'Metric', 'KGs', 'Statistic', 'p-value', 'Normal', 'Skipped']
+
+def test_normality(df, metrics, alpha=ALPHA):
+    '''
+        Shapiro-Wilk test of each metric of a snapshot, on its non-missing values. The count, the minimum and the maximum of
+        all the metrics are computed at once, so the metrics that cannot be tested are skipped without calling the test:
+        the constant ones (shapiro would report them as normal, with p-value 1) and the ones with fewer than 3 values.
+
+        :param df: DataFrame with the numeric metrics, e.g. a FAIRness evaluation.
+        :param metrics: columns to test, the missing ones are skipped.
+        :return: DataFrame with one row for each metric: the KGs tested, the statistic, the p-value, if the metric is normal
+                 and why it was skipped (empty if it was tested).
+    '''
+    from scipy.stats import shapiro
+    available = [metric for metric in metrics if metric in df.columns]
+    values = df[available].astype(float).to_numpy()
+    counts = (~np.isnan(values)).sum(axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # Minimum and maximum of the columns without values
+        constant = np.nanmin(values, axis=0) == np.nanmax(values, axis=0) if len(values) > 0 else np.zeros(len(available), dtype=bool)
+
+    rows = []
+    for k, metric in enumerate(available):
+        if counts[k] < 3:
+            rows.append([metric, counts[k], np.nan, np.nan, pd.NA, 'fewer than 3 values'])
+        elif constant[k]:
+            rows.append([metric, counts[k], np.nan, np.nan, pd.NA, 'constant'])
+        else:
+            column = values[:, k]
+            statistic, p = shapiro(column[~np.isnan(column)])
+            rows.append([metric, counts[k], statistic, p, p >= alpha, ''])
+    rows += [[metric, 0, np.nan, np.nan, pd.NA, 'missing'] for metric in metrics if metric not in available]
+    results = pd.DataFrame(rows, columns=REPORT_COLUMNS[2:])
+    results['Normal'] = results['Normal'].astype('boolean')
+    return results
+
+def test_snapshot(csv_file_path, metrics, alpha=ALPHA):
+    '''
+        Read only the metrics of a snapshot and test them (see test_normality).
+    '''
+    header = pd.read_csv(csv_file_path, nrows=0).columns
+    return test_normality(snapshot_store.read_snapshot(csv_file_path, usecols=[metric for metric in metrics if metric in header]), metrics, alpha)
+
+def get_correlation_method(results):
+    '''
+        Correlation to use for the matrix of a snapshot: 'pearson' if all the metrics tested are normally distributed, 'spearman'
+        otherwise (also if no metric could be tested). The skipped metrics are not counted.
+
+        :param results: normality of the metrics of the snapshot, as returned by test_normality (or its rows in the report).
+    '''
+    tested = results['Normal'].dropna()
+    return 'pearson' if len(tested) > 0 and tested.all() else 'spearman'
+
+def get_correlation_methods(report):
+    '''
+        Correlation to use for each (subcloud, snapshot) of the consolidated report, without reading the snapshots again.
+
+        :return: Series indexed by (Subcloud, Snapshot).
+    '''
+    return report.groupby(['Subcloud', 'Snapshot']).apply(get_correlation_method, include_groups=False).rename('Correlation')
+
+def save_results(results, output_file_path):
+    os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+    results.to_csv(output_file_path, index=False)
+
+def load_report(normality_path=None):
+    '''
+        Read the consolidated report written by save_report.
+
+        :param normality_path: folder of the normality results (None for the one in the output root).
+    '''
+    normality_path = normality_path if normality_path is not None else paths.output_path('normality_results')
+    report = pd.read_csv(os.path.join(normality_path, RESULT_FILE), dtype={'Snapshot': str})
+    report['Normal'] = report['Normal'].astype('boolean')
+    return report
+
+def save_report(normality_path=None):
+    '''
+        Consolidate the results of every snapshot of every subcloud (normality_path/<subcloud>/<snapshot>.csv) in a single table,
+        with the correlation that the matrix of each snapshot can use (see get_correlation_method).
+
+        :param normality_path: folder of the normality results (None for the one in the output root).
+        :return: DataFrame of the report, sorted by subcloud, snapshot and metric as in the results of each snapshot.
+    '''
+    normality_path = normality_path if normality_path is not None else paths.output_path('normality_results')
+    frames = []
+    for csv_file in sorted(glob.glob(os.path.join(normality_path, '*', '*.csv'))):
+        results = pd.read_csv(csv_file, keep_default_na=False, na_values=[''])
+        results.insert(0, 'Snapshot', os.path.basename(csv_file).split('.')[0])
+        results.insert(0, 'Subcloud', os.path.basename(os.path.dirname(csv_file)))
+        frames.append(results)
+    report = pd.concat(frames, ignore_index=True) if len(frames) > 0 else pd.DataFrame(columns=REPORT_COLUMNS)
+    report['Normal'] = report['Normal'].astype('boolean')
+    methods = get_correlation_methods(report) if len(report) > 0 else pd.Series(dtype=object, name='Correlation')
+    report = report.join(methods, on=['Subcloud', 'Snapshot'])
+    save_results(report, os.path.join(normality_path, RESULT_FILE))
+    return report
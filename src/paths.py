@@ -0,0 +1,34 @@
+import os
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# Folders of the pipeline, resolved from this folder so that the code runs from any working directory:
+# the data root has the inputs and the caches (quality data, LOD Cloud, probe cache), the output root the results
+# (FAIRness, correlations, trends, manifest, run reports) and the charts. By default the results are in the data root
+# and the charts in the charts folder of the repository. main.py changes them with --data-root and --output-root,
+# through environment variables inherited by the worker processes.
+data_root = os.path.abspath(os.environ.get('FAIRLENS_DATA_ROOT', os.path.join(here, '../data')))
+output_root = os.path.abspath(os.environ['FAIRLENS_OUTPUT_ROOT']) if 'FAIRLENS_OUTPUT_ROOT' in os.environ else None
+
+def set_roots(data=None, output=None):
+    '''
+        Change the data root and the output root (None keeps the current one), also for the worker processes started after.
+    '''
+    global data_root, output_root
+    if data is not None:
+        data_root = os.path.abspath(data)
+        os.environ['FAIRLENS_DATA_ROOT'] = data_root
+    if output is not None:
+        output_root = os.path.abspath(output)
+        os.environ['FAIRLENS_OUTPUT_ROOT'] = output_root
+
+def data_path(*parts):
+    return os.path.join(data_root, *parts)
+
+def output_path(*parts):
+    return os.path.join(output_root if output_root is not None else data_root, *parts)
+
+def charts_path(*parts):
+    if output_root is not None:
+        return os.path.join(output_root, 'charts', *parts)
+    return os.path.normpath(os.path.join(here, '../charts', *parts))
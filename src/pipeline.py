@@ -0,0 +1,592 @@
+import os
+import json
+import glob
+import hashlib
+from datetime import datetime
+from probe_cache import ProbeCache
+from scheduler import TaskGraph
+from rendering import RenderQueue
+from manifest import Manifest, code_version
+import paths
+import instrumentation
+
+FAIR_METRICS = ['F1-M Unique and persistent ID','F1-D URIs dereferenceability','F2a-M - Metadata availability via standard primary sources',
+                'F2b-M Metadata availability for all the attributes covered in the FAIR score computation','F3-M Data referrable via a DOI',
+                'F4-M Metadata registered in a searchable engine','F score','A1-D Working access point(s)','A1-M Metadata availability via working primary sources',
+                'A1.2 Authentication & HTTPS support','A2-M Registered in search engines','A score','I1-D Standard & open representation format',
+                'I1-M Metadata are described with VoID/DCAT predicates','I2 Use of FAIR vocabularies','I3-D Degree of connection','I score',
+                'R1.1 Machine- or human-readable license retrievable via any primary source',"R1.2 Publisher information, such as authors, contributors, publishers, and sources",
+                'R1.3-D Data organized in a standardized way','R1.3-M Metadata are described with VoID/DCAT predicates','R score','FAIR score']
+
+QUALITY_DIMENSIONS = ['Availability score','Security score','Verifiability score','Interlinking score','Licensing score']
+
+STAGES = ['split', 'evaluate', 'correlate', 'plot', 'trends', 'normality']
+
+# Source files of the code that computes each kind of output, their hash is the version recorded in the manifest
+EVALUATION_CODE = ['evaluate_fairness.py', 'fair_metrics.py', 'quality_data.py', 'lodcloud_index.py', 'lodcloud_store.py', 'endpoint_probing.py', 'fair_vocabularies.py', 'utils.py']
+CORRELATION_CODE = ['calculate_correlation.py', 'rendering.py', 'utils.py']
+BOXPLOT_CODE = ['generate_boxplots.py', 'rendering.py', 'utils.py']
+LONGITUDINAL_CODE = ['longitudinal.py']
+NORMALITY_CODE = ['normality.py']
+
+# Options of the RenderQueue of each task: rendering processes, dpi (None for the default of each figure), image format and render=False to write only the CSVs
+# The charts are drawn in the task process by default: with more jobs every task is already a worker process, and a rendering pool for each task costs more than it saves
+RENDER_OPTIONS = {'workers': 0, 'dpi': None, 'image_format': 'png', 'render': True}
+
+# Test of the significance stars of the correlation matrices: 'asymptotic' (p-value of spearmanr) or 'permutation',
+# with the number of permutations and the multiple-testing correction across each matrix ('holm', 'bh' or None),
+# and the seed of the bootstrap confidence intervals and of the permutations (None for results that change at every run)
+SIGNIFICANCE_OPTIONS = {'significance': 'asymptotic', 'n_permutations': 9999, 'correction': 'holm', 'seed': None}
+
+BOXPLOT_SCORES = [('F score',0,1.01),('A score',0,1.01),('I score',0,1.01),('R score',0,1.01),('FAIR score',0,4)]
+
+def load_kgs_by_topic():
+    with open(paths.data_path('kgs_by_topic.json'), "r", encoding="utf-8") as f:
+        kgs_by_topic = json.load(f)
+    kgs_by_topic['all'] = [] # Only useful to evaluate the FAIRness on the entire LOD Cloud, to use it as baseline (no topical distinction)
+    return kgs_by_topic
+
+def get_split_topics(lodcloud_version=None):
+    '''
+        Topics that the split writes with the LOD Cloud version it uses, for a task graph built before the split has run
+        (kgs_by_topic.json may be missing or written from another version).
+    '''
+    from lodcloud_store import LODCloudStore
+    from split_data_by_topic import group_kgs_by_topic
+    store = LODCloudStore()
+    kgs_by_topic = group_kgs_by_topic(store.load_compact(store.select(lodcloud_version)))
+    kgs_by_topic['all'] = []
+    return kgs_by_topic
+
+def get_snapshot_date(csv_file):
+    return os.path.basename(csv_file).split('.')[0]
+
+def sort_by_date(csv_files):
+    return sorted(csv_files, key=lambda x: datetime.strptime(get_snapshot_date(x), "%Y-%m-%d"))
+
+def list_snapshots(folder):
+    '''
+        Return the file names of the snapshot CSVs in the folder.
+    '''
+    return [os.path.basename(csv_file) for csv_file in glob.glob(os.path.join(folder, '*.csv'))]
+
+def select_snapshots(snapshot_files, dates=None):
+    '''
+        Keep only the snapshot files of the given dates (all of them if None).
+    '''
+    if snapshot_files is None or dates is None:
+        return snapshot_files
+    return [snapshot_file for snapshot_file in snapshot_files if get_snapshot_date(snapshot_file) in dates]
+
+# Split KGHB quality data into quality data separated by topic
+def split_quality_data(chunksize=None, lodcloud_version=None, snapshots=None):
+    from split_data_by_topic import SplitLODCKGsByTopic
+    split_data = SplitLODCKGsByTopic(paths.data_path('quality_data', 'kghb_output'), lodcloud_version)
+    split_data.split_kgs_csv_by_topic(chunksize=chunksize, snapshots=snapshots) # Writes also the 'all' partition, in the same pass
+
+def create_prober(probe_cache_ttl=None):
+    from endpoint_probing import EndpointProber # Imported by the stages that probe, with requests
+    probe_cache = ProbeCache(paths.data_path('probe_cache.sqlite'), ttl=probe_cache_ttl)
+    return EndpointProber(max_workers=32, per_host_limit=4, deadline=1800, cache=probe_cache)
+
+def get_probe_counters(prober):
+    return {'network_probes': prober.network_probes, 'probe_cache_hits': prober.cache.hits, 'probe_cache_misses': prober.cache.misses,
+            'expired_probes': prober.unknown_probes}
+
+# The KGs observed in every snapshot depend on all the snapshots of the 'all' subcloud
+def get_always_observed_inputs():
+    return glob.glob(paths.data_path('quality_data', 'all', '*.csv'))
+
+def get_evaluation_build(topic, snapshot_file):
+    '''
+        Return the (outputs, inputs, code version, parameters) of the FAIRness evaluation of a snapshot, as recorded in the manifest.
+    '''
+    outputs = [paths.output_path('fairness_evaluation_results', topic, snapshot_file)]
+    inputs = [paths.data_path('quality_data', topic, snapshot_file), paths.data_path('lodcloud.json')]
+    return outputs, inputs, code_version(EVALUATION_CODE), {'snapshot_date': get_snapshot_date(snapshot_file)}
+
+# Probe once the SPARQL endpoints of the topics of a snapshot, their evaluations find them in the cache
+def probe_snapshot(snapshot_file, probe_cache_ttl=None, topics=(), force=False):
+    '''
+        :param topics: topics evaluated on this snapshot, only the union of their endpoints is probed. The 'all' subcloud has
+                       all of them, so it is the only one read if it is among the topics (or if no topic is given).
+    '''
+    manifest = Manifest()
+    if not force and len(topics) > 0 and all(manifest.is_fresh(*get_evaluation_build(topic, snapshot_file)) for topic in topics):
+        print(f"FAIRness of {snapshot_file} up to date for all the subclouds, SPARQL endpoints not probed")
+        return {}
+    import snapshot_store
+    prober = create_prober(probe_cache_ttl)
+    endpoint_urls = []
+    for topic in ['all'] if len(topics) == 0 or 'all' in topics else topics:
+        quality_data_path = paths.data_path('quality_data', topic, snapshot_file)
+        if os.path.exists(quality_data_path):
+            endpoint_urls.extend(snapshot_store.read_snapshot(quality_data_path, usecols=['SPARQL endpoint URL'])['SPARQL endpoint URL'])
+    if len(endpoint_urls) > 0:
+        prober.probe(endpoint_urls, snapshot_date=get_snapshot_date(snapshot_file)) # The URLs of the KGs in more topics are probed once
+    return get_probe_counters(prober)
+
+def get_row_hashes_file(topic, snapshot_file):
+    return paths.output_path('row_hashes', topic, f'{get_snapshot_date(snapshot_file)}.json')
+
+def get_evaluation_entries(manifest, build, prober):
+    '''
+        Return the manifest entries of an evaluation just written. If some of its probes expired before the deadline their
+        endpoints were scored as failed, so the entries mark it as stale and the next run evaluates it again.
+    '''
+    if prober.unknown_probes > 0:
+        return manifest.build_stale_entries(build[0], f'{prober.unknown_probes} probes expired')
+    return manifest.build_entries(*build)
+
+def save_row_hashes(fairness, topic, snapshot_file, version, prober):
+    '''
+        Save the row hashes of an evaluation for the delta mode, only if none of its probes expired: otherwise the next snapshot
+        would reuse the metrics of the KGs scored with unknown probe results. The hashes of a previous evaluation are removed.
+    '''
+    row_hashes_file = get_row_hashes_file(topic, snapshot_file)
+    if prober.unknown_probes > 0:
+        if os.path.exists(row_hashes_file):
+            os.remove(row_hashes_file)
+        return
+    fairness.save_row_hashes(row_hashes_file, version)
+
+def get_previous_snapshot(snapshot_file, snapshot_files):
+    '''
+        Return the latest snapshot before the given one (None if it is the first).
+    '''
+    previous = [previous_file for previous_file in sort_by_date(snapshot_files) if get_snapshot_date(previous_file) < get_snapshot_date(snapshot_file)]
+    return previous[-1] if len(previous) > 0 else None
+
+def score(fairness):
+    with instrumentation.phase('score'):
+        fairness.evaluate_findability()
+        fairness.evaluate_availability()
+        fairness.evaluate_interoperability()
+        fairness.evaluate_reusability()
+        fairness.calculate_FAIR_score()
+    instrumentation.count('KGs scored', len(fairness.quality_data))
+
+def save(fairness):
+    with instrumentation.phase('save'):
+        fairness.save_file()
+
+def load_for_evaluation(topic, snapshot_file, prober, version, previous_snapshot=None):
+    '''
+        Load the quality data of a snapshot of a topic and probe its SPARQL endpoints, in delta mode only the ones of the changed KGs.
+
+        :return: (EvaluateFAIRness, number of KGs reused from the previous snapshot).
+    '''
+    from evaluate_fairness import EvaluateFAIRness, load_row_hashes
+    os.makedirs(paths.output_path('fairness_evaluation_results', topic),exist_ok=True)
+    with instrumentation.phase('load quality data'):
+        fairness = EvaluateFAIRness(paths.data_path('quality_data', topic, snapshot_file),paths.output_path('fairness_evaluation_results', topic, snapshot_file))
+    reused = 0
+    if previous_snapshot is not None:
+        previous_evaluation = paths.output_path('fairness_evaluation_results', topic, previous_snapshot)
+        previous_row_hashes = load_row_hashes(get_row_hashes_file(topic, previous_snapshot), version)
+        if os.path.exists(previous_evaluation) and previous_row_hashes is not None:
+            reused = fairness.reuse_unchanged(previous_evaluation, previous_row_hashes)
+        else:
+            print(f"No reusable evaluation of the {topic} subcloud before {snapshot_file}, all the KGs are evaluated")
+    fairness.probe_endpoints(prober, get_snapshot_date(snapshot_file)) # Probe the SPARQL endpoints concurrently before the scoring
+    return fairness, reused
+
+def evaluate_chunks(quality_chunks, output_file_path, prober, snapshot_date):
+    '''
+        Normalize, probe and score each chunk of quality data, one at a time.
+
+        :param quality_chunks: iterable of quality data chunks, as generated by load_quality_chunks.
+        :return: generator of the FAIRness evaluation of each chunk.
+    '''
+    from evaluate_fairness import EvaluateFAIRness
+    for quality_data in quality_chunks:
+        fairness = EvaluateFAIRness(quality_data, output_file_path)
+        fairness.probe_endpoints(prober, snapshot_date)
+        score(fairness)
+        yield fairness.fairness_evaluation
+
+def evaluate_in_chunks(topic, snapshot_file, chunksize, prober):
+    '''
+        Streaming evaluation of a snapshot of a topic: its quality data is read, evaluated and appended to the output in chunks of KGs,
+        so the memory used does not grow with the size of the snapshot. The output is the same of the evaluation of the whole snapshot.
+
+        :return: number of KGs evaluated.
+    '''
+    from evaluate_fairness import ChunkedEvaluationWriter
+    from quality_data import load_quality_chunks
+    os.makedirs(paths.output_path('fairness_evaluation_results', topic),exist_ok=True)
+    output_file_path = paths.output_path('fairness_evaluation_results', topic, snapshot_file)
+    with ChunkedEvaluationWriter(output_file_path) as writer:
+        for fairness_evaluation in evaluate_chunks(load_quality_chunks(paths.data_path('quality_data', topic, snapshot_file), chunksize), output_file_path, prober, get_snapshot_date(snapshot_file)):
+            writer.append(fairness_evaluation)
+        with instrumentation.phase('save'):
+            writer.write()
+    print(f"{writer.rows} KGs of the {topic} subcloud ({snapshot_file}) evaluated in {len(writer.chunk_files)} chunks")
+    return writer.rows
+
+# Calculate the FAIRness of a snapshot of a topic
+def evaluate_snapshot(topic, snapshot_file, probe_cache_ttl=None, force=False, previous_snapshot=None, chunksize=None):
+    '''
+        :param previous_snapshot: file of the previous snapshot of the topic, to reuse the evaluation of the KGs whose inputs did not change (delta mode).
+        :param chunksize: number of KGs to evaluate at a time (streaming mode, see evaluate_in_chunks), None to evaluate the whole snapshot at once.
+                          The row hashes of the delta mode are not saved in streaming mode.
+    '''
+    manifest = Manifest()
+    build = get_evaluation_build(topic, snapshot_file)
+    if not force and manifest.is_fresh(*build):
+        print(f"FAIRness of the {topic} subcloud ({snapshot_file}) up to date")
+        return {}
+    print(f"Evaluating the FAIRness of the {topic} subcloud ({snapshot_file})")
+    prober = create_prober(probe_cache_ttl)
+    if chunksize is not None:
+        evaluated, reused = evaluate_in_chunks(topic, snapshot_file, chunksize, prober), 0
+    else:
+        version = code_version(EVALUATION_CODE)
+        fairness, reused = load_for_evaluation(topic, snapshot_file, prober, version, previous_snapshot)
+        score(fairness)
+        save(fairness)
+        save_row_hashes(fairness, topic, snapshot_file, version, prober)
+        evaluated = len(fairness.quality_data) - reused
+    result = get_probe_counters(prober)
+    result['reused_rows'] = reused
+    result['evaluated_rows'] = evaluated
+    result['manifest'] = get_evaluation_entries(manifest, build, prober)
+    return result
+
+def get_subcloud_rows(kg_ids, kgs_by_topic):
+    '''
+        Positions of the KGs of each topic among the given KG ids, in their order, with a group-by on the topic of each KG.
+
+        :param kg_ids: Series with the KG ids of the 'all' subcloud.
+        :param kgs_by_topic: dictionary from the topic to its KG ids, as in kgs_by_topic.json.
+        :return: dictionary from the topic to the list of positions.
+    '''
+    import pandas as pd
+    topics_by_kg_id = {}
+    for topic, topic_kg_ids in kgs_by_topic.items():
+        for kg_id in topic_kg_ids:
+            topics_by_kg_id.setdefault(kg_id, []).append(topic)
+    topics = pd.Series(kg_ids.to_numpy(), dtype=object).map(topics_by_kg_id).explode().dropna()
+    if len(topics) == 0:
+        return {}
+    return pd.Series(topics.index, index=topics.index).groupby(topics.values).agg(list).to_dict()
+
+# Evaluate the 'all' subcloud of a snapshot once and derive the evaluation of each topic from it, every KG is loaded, probed and scored once
+def evaluate_subclouds(snapshot_file, topics, kgs_by_topic, probe_cache_ttl=None, force=False, previous_snapshot=None):
+    '''
+        :param topics: topics with this snapshot, derived from the 'all' subcloud (they are subsets of it).
+        :param previous_snapshot: file of the previous snapshot, to reuse the evaluation of the KGs whose inputs did not change (delta mode).
+    '''
+    manifest = Manifest()
+    builds = {topic: get_evaluation_build(topic, snapshot_file) for topic in ['all'] + topics}
+    stale = [topic for topic, build in builds.items() if force or not manifest.is_fresh(*build)]
+    if len(stale) == 0:
+        print(f"FAIRness of {snapshot_file} up to date for all the subclouds")
+        return {}
+    print(f"Evaluating the FAIRness of the all subcloud ({snapshot_file}) and deriving {len([topic for topic in stale if topic != 'all'])} topics from it")
+    prober = create_prober(probe_cache_ttl)
+    version = code_version(EVALUATION_CODE)
+    fairness, reused = load_for_evaluation('all', snapshot_file, prober, version, previous_snapshot)
+    score(fairness)
+    evaluations = {'all': fairness}
+    subcloud_rows = get_subcloud_rows(fairness.quality_data['KG id'], {topic: kgs_by_topic[topic] for topic in topics})
+    for topic in stale:
+        if topic == 'all':
+            continue
+        os.makedirs(paths.output_path('fairness_evaluation_results', topic),exist_ok=True)
+        try:
+            with instrumentation.phase('derive subclouds'):
+                evaluations[topic] = fairness.derive_subcloud(subcloud_rows.get(topic, []), paths.data_path('quality_data', topic, snapshot_file), paths.output_path('fairness_evaluation_results', topic, snapshot_file))
+        except ValueError as e:
+            print(f"{e}, the {topic} subcloud is evaluated on its own")
+            evaluations[topic], _ = load_for_evaluation(topic, snapshot_file, prober, version)
+        score(evaluations[topic])
+
+    entries = {}
+    for topic in stale:
+        save(evaluations[topic])
+        save_row_hashes(evaluations[topic], topic, snapshot_file, version, prober)
+        entries.update(get_evaluation_entries(manifest, builds[topic], prober))
+    result = get_probe_counters(prober)
+    result['reused_rows'] = reused
+    result['evaluated_rows'] = len(fairness.quality_data) - reused
+    result['manifest'] = entries
+    return result
+
+def get_render_outputs(output_file, render_options):
+    '''
+        Return the images written for an output (none in no-render mode) and the rendering parameters to record in the manifest.
+    '''
+    if not render_options['render']:
+        return [], {}
+    return [f"{output_file}.{render_options['image_format']}"], {'dpi': render_options['dpi'], 'image_format': render_options['image_format']}
+
+def get_significance_params(significance_options):
+    '''
+        Return the significance parameters to record in the manifest, none for the asymptotic test (as before the permutation test).
+        The seed is recorded only if given, so the matrices built with another seed are rebuilt.
+    '''
+    params = {}
+    if significance_options['significance'] != 'asymptotic':
+        params = {option: value for option, value in significance_options.items() if option != 'seed'}
+    if significance_options['seed'] is not None:
+        params['seed'] = significance_options['seed']
+    return params
+
+def get_matrix_seed(seed, csv_file):
+    '''
+        Seed of the bootstrap and of the permutations of a correlation matrix, derived from the seed of the run and from the matrix
+        (its CSV relative to the correlation results: topic, snapshot and kind), so the tasks running in parallel never share a random
+        stream and every matrix gets the same one whatever the order of the tasks.
+
+        :return: entropy for np.random.default_rng, None if the seed is None.
+    '''
+    if seed is None:
+        return None
+    matrix = os.path.relpath(csv_file, paths.output_path('correlation_results')).replace(os.sep, '/')
+    return [seed, int.from_bytes(hashlib.sha256(matrix.encode('utf-8')).digest()[:8], 'little')]
+
+def get_correlation_builds(correlation, columns_to_use, filter_by_ids=False, traditional_dimensions=False, sparql_up=False, render_options=RENDER_OPTIONS, significance_options=SIGNIFICANCE_OPTIONS):
+    '''
+        Return the (outputs, inputs, code version, parameters) of the CSV of a correlation matrix and of its heatmap, as recorded in the manifest.
+        The rendering parameters are recorded only for the heatmap, so a run without rendering does not rebuild the CSV.
+    '''
+    output_file = correlation.get_output_file(traditional_dimensions, sparql_up)
+    images, render_params = get_render_outputs(output_file, render_options)
+    inputs = [correlation.analysis_result] + (get_always_observed_inputs() if filter_by_ids else [])
+    params = {'columns': columns_to_use, 'filter_by_ids': filter_by_ids, 'traditional_dimensions': traditional_dimensions, 'sparql_up': sparql_up,
+              **get_significance_params(significance_options)}
+    builds = [([f'{output_file}.csv'], inputs, code_version(CORRELATION_CODE), params)]
+    if len(images) > 0:
+        builds.append((images, inputs, code_version(CORRELATION_CODE), {**params, **render_params}))
+    return builds
+
+def correlate_if_stale(correlation, manifest, force, render_queue, render_options, columns_to_use, filter_by_ids=False, traditional_dimensions=False, sparql_up=False, significance_options=SIGNIFICANCE_OPTIONS):
+    '''
+        Calculate a correlation matrix only if it is missing or stale, return the manifest entries of the files written.
+        The heatmap is queued in render_queue, the statistics do not wait for it.
+    '''
+    builds = get_correlation_builds(correlation, columns_to_use, filter_by_ids, traditional_dimensions, sparql_up, render_options, significance_options)
+    if not force and all(manifest.is_fresh(*build) for build in builds):
+        csv_file = builds[0][0][0]
+        print(f"Correlation matrix {os.path.relpath(csv_file, os.path.dirname(os.path.dirname(csv_file)))} up to date")
+        return {}
+    significance = {option: value for option, value in significance_options.items() if option != 'seed'}
+    random_state = get_matrix_seed(significance_options['seed'], builds[0][0][0])
+    correlation.calculate_spearman_correlation_matrix(columns_to_use, filter_by_ids, traditional_dimensions, sparql_up, random_state=random_state, render_queue=render_queue, **significance)
+    entries = {}
+    for build in builds:
+        entries.update(manifest.build_entries(*build))
+    return entries
+
+def correlate_snapshot(topic, snapshot_file, force=False, render_options=RENDER_OPTIONS, significance_options=SIGNIFICANCE_OPTIONS):
+    from calculate_correlation import CalculateCorrelation # Imported by the stages that correlate, with scipy
+    correlation = CalculateCorrelation(paths.output_path('fairness_evaluation_results', topic, snapshot_file),topic,get_snapshot_date(snapshot_file))
+    with RenderQueue(**render_options) as render_queue:
+        entries = correlate_if_stale(correlation, Manifest(), force, render_queue, render_options, FAIR_METRICS, True, significance_options=significance_options)
+    return {'manifest': entries}
+
+# Correlation between the quality dimensions mapped to the FAIR principles, on the last snapshot
+def correlate_quality_dimensions(topic, force=False, render_options=RENDER_OPTIONS, significance_options=SIGNIFICANCE_OPTIONS):
+    from calculate_correlation import CalculateCorrelation
+    csv_files = sort_by_date(glob.glob(paths.data_path('quality_data', topic, '*.csv')))
+    if len(csv_files) == 0:
+        return {}
+    last_snapshot = csv_files[len(csv_files) - 1]
+    correlation = CalculateCorrelation(paths.data_path('quality_data', topic, os.path.basename(last_snapshot)),topic,get_snapshot_date(last_snapshot))
+    manifest = Manifest()
+    with RenderQueue(**render_options) as render_queue:
+        entries = correlate_if_stale(correlation, manifest, force, render_queue, render_options, QUALITY_DIMENSIONS, True, True, False, significance_options)
+        entries.update(correlate_if_stale(correlation, manifest, force, render_queue, render_options, QUALITY_DIMENSIONS, True, True, True, significance_options))
+    return {'manifest': entries}
+
+def generate_boxplots(force=False, render_options=RENDER_OPTIONS):
+    manifest = Manifest()
+    outputs = []
+    for column_to_plot, y_min, y_max in BOXPLOT_SCORES:
+        images, render_params = get_render_outputs(paths.charts_path(column_to_plot), render_options)
+        outputs += images
+    if len(outputs) == 0:
+        print("Boxplots not rendered")
+        return {}
+    inputs = glob.glob(paths.output_path('fairness_evaluation_results', '*', '*.csv')) + [paths.data_path('kgs_by_topic.json')] + get_always_observed_inputs()
+    build = (outputs, inputs, code_version(BOXPLOT_CODE), {'scores': BOXPLOT_SCORES, **render_params})
+    if not force and manifest.is_fresh(*build):
+        print("Boxplots up to date")
+        return {}
+    from generate_boxplots import GenerateBoxplots
+    fair_score_boxplot = GenerateBoxplots(paths.output_path('fairness_evaluation_results'))
+    os.makedirs(paths.charts_path(), exist_ok=True)
+
+    with RenderQueue(**render_options) as render_queue:
+        for column_to_plot, y_min, y_max in BOXPLOT_SCORES:
+            fair_score_boxplot.generate_combined_boxplot(paths.charts_path(),column_to_plot,y_min,y_max,True,render_queue)
+    return {'manifest': manifest.build_entries(*build)}
+
+# Changes of the FAIR scores of every KG across all the snapshots of all the subclouds, from a single read of the FAIRness results
+def analyze_trends(force=False):
+    from longitudinal import LongitudinalScores, RESULT_FILES
+    manifest = Manifest()
+    outputs = [paths.output_path('longitudinal_results', result_file) for result_file in RESULT_FILES]
+    inputs = glob.glob(paths.output_path('fairness_evaluation_results', '*', '*.csv'))
+    build = (outputs, inputs, code_version(LONGITUDINAL_CODE), {})
+    if not force and manifest.is_fresh(*build):
+        print("Longitudinal results up to date")
+        return {}
+    scores = LongitudinalScores(paths.output_path('fairness_evaluation_results'))
+    with instrumentation.phase('longitudinal statistics'):
+        scores.save_results(paths.output_path('longitudinal_results'))
+    return {'manifest': manifest.build_entries(*build)}
+
+# Shapiro-Wilk test of every FAIR metric of a snapshot of a topic, from a single read of its FAIRness results
+def check_normality(topic, snapshot_file, force=False):
+    from normality import ALPHA, test_snapshot, save_results # Imported by the stage, with scipy
+    manifest = Manifest()
+    output_file = paths.output_path('normality_results', topic, snapshot_file)
+    build = ([output_file], [paths.output_path('fairness_evaluation_results', topic, snapshot_file)], code_version(NORMALITY_CODE), {'metrics': FAIR_METRICS, 'alpha': ALPHA})
+    if not force and manifest.is_fresh(*build):
+        print(f"Normality of the {topic} subcloud ({snapshot_file}) up to date")
+        return {}
+    with instrumentation.phase('normality tests'):
+        results = test_snapshot(build[1][0], FAIR_METRICS)
+    instrumentation.count('metrics tested', int(results['Normal'].notna().sum()))
+    instrumentation.count('metrics skipped', int(results['Normal'].isna().sum()))
+    save_results(results, output_file)
+    return {'manifest': manifest.build_entries(*build)}
+
+# Single table with the normality of the metrics of all the snapshots of all the subclouds, and the correlation each matrix can use
+def report_normality(force=False):
+    from normality import RESULT_FILE, save_report, get_correlation_methods
+    manifest = Manifest()
+    inputs = glob.glob(paths.output_path('normality_results', '*', '*.csv'))
+    build = ([paths.output_path('normality_results', RESULT_FILE)], inputs, code_version(NORMALITY_CODE), {})
+    if not force and manifest.is_fresh(*build):
+        print("Normality report up to date")
+        return {}
+    report = save_report()
+    methods = get_correlation_methods(report)
+    print(f"Normality of {len(methods)} snapshots: {int((methods == 'pearson').sum())} with all the tested metrics normally distributed (Pearson), {int((methods == 'spearman').sum())} not (Spearman)")
+    return {'manifest': manifest.build_entries(*build)}
+
+def build_task_graph(kgs_by_topic, stages, probe_cache_ttl=None, force=False, render_options=RENDER_OPTIONS, delta=False, derive_subclouds=False, significance_options=SIGNIFICANCE_OPTIONS, chunksize=None, lodcloud_version=None, snapshots=None):
+    '''
+        Expand the selected stages into (stage, topic, snapshot) tasks: split -> probe -> evaluate -> correlate -> plot / trends / normality.
+        Every (topic, snapshot) is independent from the others, so the tasks of the same stage can run in parallel.
+
+        :param kgs_by_topic: dictionary of the topics (subclouds) to process.
+        :param stages: stages to run, a subset of STAGES; the stages not selected are considered already done.
+        :param force: rebuild all the outputs, also the ones that the manifest reports as up to date.
+        :param render_options: options of the RenderQueue that draws the heatmaps and the boxplots (see RENDER_OPTIONS).
+        :param significance_options: test of the significance stars of the correlation matrices (see SIGNIFICANCE_OPTIONS).
+        :param delta: evaluate each snapshot after the previous one of its topic, reusing the evaluation of the unchanged KGs.
+                      Each evaluation probes only the endpoints of its changed KGs, so the shared probe tasks are not added.
+        :param derive_subclouds: evaluate only the 'all' subcloud of each snapshot and derive the topics from it, in the same task
+                                 (the topics of the snapshots without the 'all' subcloud are evaluated on their own).
+        :param chunksize: number of rows that the split and the evaluation process at a time (streaming mode), for the snapshots
+                          that do not fit in memory; None processes every snapshot at once. It cannot be combined with delta and derive_subclouds.
+        :param lodcloud_version: version of the LOD Cloud used by the split, from the local store (see lodcloud_store.LODCloudStore.select).
+        :param snapshots: dates of the snapshots to process (None for all). The correlation of the quality dimensions, on the last
+                          snapshot of each topic, is run only if that snapshot is selected; the boxplots, the trends and the normality report read all the snapshots.
+    '''
+    graph = TaskGraph()
+
+    # The split writes one file per topic for each KGHeartBeat snapshot
+    kghb_snapshots = [filename for filename in os.listdir(paths.data_path('quality_data', 'kghb_output')) if '.csv' in filename] if 'split' in stages else None
+    all_snapshots = {topic: kghb_snapshots if kghb_snapshots is not None else list_snapshots(paths.data_path('quality_data', topic)) for topic in kgs_by_topic}
+    quality_snapshots = {topic: select_snapshots(topic_snapshots, snapshots) for topic, topic_snapshots in all_snapshots.items()}
+    split_task = graph.add(('split',), split_quality_data, (chunksize, lodcloud_version, select_snapshots(kghb_snapshots, snapshots))) if 'split' in stages else ('split',)
+
+    evaluate_tasks = []
+    evaluation_task_ids = {} # (topic, snapshot) -> task that writes its FAIRness evaluation
+    if 'evaluate' in stages:
+        if derive_subclouds and 'all' in kgs_by_topic:
+            for snapshot_file in quality_snapshots['all']:
+                topics = [topic for topic in kgs_by_topic if topic != 'all' and snapshot_file in quality_snapshots[topic]]
+                previous_snapshot = get_previous_snapshot(snapshot_file, quality_snapshots['all']) if delta else None
+                task_id = graph.add(('evaluate', 'all', snapshot_file), evaluate_subclouds, (snapshot_file, topics, kgs_by_topic, probe_cache_ttl, force, previous_snapshot),
+                                    [split_task, ('evaluate', 'all', previous_snapshot)])
+                evaluate_tasks.append(task_id)
+                for topic in ['all'] + topics:
+                    evaluation_task_ids[(topic, snapshot_file)] = task_id
+        derived = set(evaluation_task_ids)
+        if not delta and len(derived) < sum(len(topic_snapshots) for topic_snapshots in quality_snapshots.values()):
+            for snapshot_file in sorted(set(snapshot for topic_snapshots in quality_snapshots.values() for snapshot in topic_snapshots)):
+                topics = [topic for topic in kgs_by_topic if snapshot_file in quality_snapshots[topic]]
+                if len(topics) == 1 and topics[0] != 'all':
+                    continue # The evaluation of a single topic probes only its endpoints, not all the ones of the snapshot
+                graph.add(('probe', snapshot_file), probe_snapshot, (snapshot_file, probe_cache_ttl, topics, force), [split_task])
+        for topic in kgs_by_topic:
+            for snapshot_file in quality_snapshots[topic]:
+                if (topic, snapshot_file) in derived:
+                    continue
+                previous_snapshot = get_previous_snapshot(snapshot_file, quality_snapshots[topic]) if delta else None
+                dependencies = [split_task, ('probe', snapshot_file), evaluation_task_ids.get((topic, previous_snapshot), ('evaluate', topic, previous_snapshot))]
+                task_id = graph.add(('evaluate', topic, snapshot_file), evaluate_snapshot, (topic, snapshot_file, probe_cache_ttl, force, previous_snapshot, chunksize), dependencies)
+                evaluate_tasks.append(task_id)
+                evaluation_task_ids[(topic, snapshot_file)] = task_id
+
+    if 'correlate' in stages:
+        for topic in kgs_by_topic:
+            fairness_snapshots = quality_snapshots[topic] if 'evaluate' in stages else select_snapshots(list_snapshots(paths.output_path('fairness_evaluation_results', topic)), snapshots)
+            for snapshot_file in fairness_snapshots:
+                # The filter on the always observed KGs reads the quality data of the 'all' subcloud
+                graph.add(('correlate', topic, snapshot_file), correlate_snapshot, (topic, snapshot_file, force, render_options, significance_options), [split_task, evaluation_task_ids.get((topic, snapshot_file), ('evaluate', topic, snapshot_file))])
+            if snapshots is None or (len(all_snapshots[topic]) > 0 and get_snapshot_date(sort_by_date(all_snapshots[topic])[-1]) in snapshots):
+                graph.add(('correlate_dimensions', topic), correlate_quality_dimensions, (topic, force, render_options, significance_options), [split_task])
+
+    if 'plot' in stages:
+        graph.add(('plot',), generate_boxplots, (force, render_options), [split_task] + evaluate_tasks)
+
+    if 'trends' in stages:
+        graph.add(('trends',), analyze_trends, (force,), [split_task] + evaluate_tasks)
+
+    if 'normality' in stages:
+        normality_tasks = []
+        for topic in kgs_by_topic:
+            fairness_snapshots = quality_snapshots[topic] if 'evaluate' in stages else select_snapshots(list_snapshots(paths.output_path('fairness_evaluation_results', topic)), snapshots)
+            for snapshot_file in fairness_snapshots:
+                normality_tasks.append(graph.add(('normality', topic, snapshot_file), check_normality, (topic, snapshot_file, force), [split_task, evaluation_task_ids.get((topic, snapshot_file), ('evaluate', topic, snapshot_file))]))
+        graph.add(('normality_report',), report_normality, (force,), normality_tasks)
+
+    return graph
+
+def report_probes(results):
+    '''
+        Sum the probe counters returned by the probe and evaluate tasks.
+    '''
+    counters = [result for task_id, result in results.items() if task_id[0] in ('probe', 'evaluate') and 'network_probes' in result]
+    if len(counters) == 0:
+        return
+    network_probes = sum(counter['network_probes'] for counter in counters)
+    hits = sum(counter['probe_cache_hits'] for counter in counters)
+    misses = sum(counter['probe_cache_misses'] for counter in counters)
+    total = hits + misses
+    print(f"{network_probes} SPARQL endpoint probes sent over the network")
+    print(f"Probe cache: {hits} hits, {misses} misses ({hits / total * 100 if total > 0 else 0:.1f}% hit rate)")
+    expired = sum(counter.get('expired_probes', 0) for counter in counters)
+    if expired > 0:
+        print(f"{expired} probes expired before the deadline: the evaluations that used them are rebuilt by the next run")
+
+def report_reuse(results):
+    '''
+        Sum the KGs evaluated and reused by the evaluate tasks in delta mode.
+    '''
+    counters = [result for task_id, result in results.items() if task_id[0] == 'evaluate' and 'reused_rows' in result]
+    reused = sum(counter['reused_rows'] for counter in counters)
+    if reused == 0:
+        return
+    evaluated = sum(counter['evaluated_rows'] for counter in counters)
+    print(f"Delta evaluation: {reused} KGs reused from the previous snapshots, {evaluated} evaluated ({reused / (reused + evaluated) * 100:.1f}% reused)")
+
+def update_manifest(results):
+    '''
+        Record in the manifest the outputs rebuilt by the tasks (the workers only read it, it is written once here).
+    '''
+    manifest = Manifest()
+    rebuilt = 0
+    for result in results.values():
+        if isinstance(result, dict) and len(result.get('manifest', {})) > 0:
+            manifest.update(result['manifest'])
+            rebuilt += len(result['manifest'])
+    manifest.save()
+    print(f"{rebuilt} outputs rebuilt, {len(manifest.entries)} outputs in the manifest")
@@ -0,0 +1,72 @@
+import os
+import time
+import sqlite3
+import paths
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+class ProbeCache:
+    def __init__(self, cache_file_path = None, ttl = None):
+        '''
+            On-disk cache of the SPARQL endpoint probe results, keyed by (endpoint URL, probe, snapshot date).
+
+            :param cache_file_path: path to the SQLite file with the cached results, relative to this folder (None for the one in the data root).
+            :param ttl: seconds after which a cached result is probed again (None to keep the results forever).
+        '''
+        self.cache_file_path = os.path.join(here, cache_file_path if cache_file_path is not None else paths.data_path('probe_cache.sqlite'))
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(self.cache_file_path), exist_ok=True)
+        self.connection = sqlite3.connect(self.cache_file_path, timeout=60)
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS probe_results (
+                    endpoint_url TEXT NOT NULL,
+                    probe TEXT NOT NULL,
+                    snapshot_date TEXT NOT NULL,
+                    result INTEGER NOT NULL,
+                    probed_at REAL NOT NULL,
+                    PRIMARY KEY (endpoint_url, probe, snapshot_date)
+                )
+            ''')
+
+    def get_many(self, keys):
+        '''
+            Return the cached results that are still valid for the given (endpoint URL, probe, snapshot date) keys.
+
+            :param keys: list of (endpoint URL, probe, snapshot date) tuples.
+            :return: dictionary from key to the cached 0/1 result; missing or expired keys are not in it.
+        '''
+        min_probed_at = time.time() - self.ttl if self.ttl is not None else float('-inf')
+        cached = {}
+        for snapshot_date in set(key[2] for key in keys):
+            rows = self.connection.execute(
+                'SELECT endpoint_url, probe, result, probed_at FROM probe_results WHERE snapshot_date = ?', (snapshot_date,))
+            for endpoint_url, probe, result, probed_at in rows:
+                if probed_at >= min_probed_at:
+                    cached[(endpoint_url, probe, snapshot_date)] = result
+        found = {key: cached[key] for key in keys if key in cached}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, results):
+        '''
+            Store the probe results.
+
+            :param results: dictionary from (endpoint URL, probe, snapshot date) to the 0/1 result.
+        '''
+        probed_at = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO probe_results (endpoint_url, probe, snapshot_date, result, probed_at) VALUES (?, ?, ?, ?, ?)',
+                [(endpoint_url, probe, snapshot_date, int(result), probed_at) for (endpoint_url, probe, snapshot_date), result in results.items()])
+
+    def report(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total > 0 else 0
+        print(f"Probe cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)")
+
+    def close(self):
+        self.connection.close()
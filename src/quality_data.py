@@ -0,0 +1,298 @@
+import re
+import numpy as np
+import pandas as pd
+import snapshot_store
+from fair_vocabularies import fair_vocabularies
+
+# Values used by KGHeartBeat to mark a missing or empty measurement
+EMPTY_MEDIA_TYPES = ('[]','[,]',"['']")
+
+FAIR_VOCABULARIES = frozenset(fair_vocabularies) # Hash-based membership instead of searching the list
+
+# Patterns of utils.check_publisher_info, compiled once
+AUTHOR_ABSENT_PATTERN = re.compile(r"Name:\s*absent,\s*email:\s*absent", re.IGNORECASE)
+SOURCES_VALUE_PATTERN = re.compile(r"(?:Web|Name|Email):\s*([^,]+)", re.IGNORECASE)
+
+# Columns of the KGHeartBeat output used by the FAIRness evaluation and how they are stored in memory:
+# 'text' as parsed, 'category' for the strings repeated by many KGs, 'flag' as nullable boolean, 'number' as nullable float
+QUALITY_COLUMNS = {
+    'KG id': 'text',
+    'KG name': 'text',
+    'SPARQL endpoint URL': 'text',
+    'URL for download the dataset': 'text',
+    'Url file VoID': 'text',
+    'Sparql endpoint': 'category',
+    'Availability of RDF dump (metadata)': 'flag',
+    'metadata-media-type': 'category',
+    'Serialization formats': 'category',
+    'License machine redeable (metadata)': 'text',
+    'License machine redeable (query)': 'text',
+    'License human redeable': 'flag',
+    'Vocabularies': 'text',
+    'Degree of connection': 'number',
+    'Number of samAs chains': 'number',
+    'URIs Deferenceability': 'number',
+    'Use HTTPS': 'flag',
+    'Requires authentication': 'flag',
+    'Author (query)': 'text',
+    'Author (metadata)': 'text',
+    'Contributor': 'text',
+    'Publisher': 'text',
+    'Sources': 'text',
+}
+
+# True and False values of the flags, any other value (e.g. '-') is missing
+FLAG_VALUES = {
+    'Availability of RDF dump (metadata)': ([1, '1'], [0, '0']),
+    'License human redeable': ([True, 'True'], [False, 'False']),
+    'Use HTTPS': ([True, 'True'], [False, 'False']),
+    'Requires authentication': ([True, 'True'], [False, 'False']),
+}
+
+# Columns renamed across the KGHeartBeat versions: the older outputs have only the serialization formats, used in place of the media types
+COLUMN_FALLBACKS = {
+    'metadata-media-type': 'Serialization formats',
+}
+
+def is_filled(column):
+    '''
+        True where the value is present and is not an empty string.
+    '''
+    return column.notna() & (column != '')
+
+def is_not_in(column, sentinels):
+    '''
+        True where the value is present and is not one of the sentinels.
+    '''
+    return column.notna() & ~column.isin(sentinels)
+
+def is_positive_count(column):
+    '''
+        True where the value is a count greater than zero ('-', '[]' and NaN are not).
+    '''
+    return (pd.to_numeric(column, errors='coerce') >= 1).fillna(False).astype(bool)
+
+def as_strings(column):
+    '''
+        The values of the column that are strings, NaN for the others, so that the .str methods work also on boolean or mixed columns.
+    '''
+    if pd.api.types.infer_dtype(column, skipna=True) in ('string', 'empty'):
+        return column.astype(object)
+    return column.astype(object).where(column.map(type) == str)
+
+def get_quality_columns(csv_file_path):
+    '''
+        Columns of QUALITY_COLUMNS available in a KGHeartBeat output, in the order of QUALITY_COLUMNS.
+        A column missing in the file is taken from its fallback (see COLUMN_FALLBACKS), otherwise a ValueError lists the missing columns.
+    '''
+    available_columns = set(pd.read_csv(csv_file_path, nrows=0).columns)
+    missing = [column for column in QUALITY_COLUMNS if column not in available_columns and COLUMN_FALLBACKS.get(column) not in available_columns]
+    if len(missing) > 0:
+        raise ValueError(f"{csv_file_path} is missing the KGHeartBeat columns {missing}")
+    return [column for column in QUALITY_COLUMNS if column in available_columns]
+
+def load_quality_data(csv_file_path):
+    '''
+        Load only the columns of a KGHeartBeat output used by the FAIRness evaluation (see QUALITY_COLUMNS), with compact types:
+        the flags as nullable booleans, the counts as nullable floats and the repeated strings as categoricals.
+        A column missing in the file is taken from its fallback (see COLUMN_FALLBACKS), otherwise a ValueError lists the missing columns.
+
+        :param csv_file_path: path to the KGHeartBeat CSV file.
+        :return: DataFrame with the columns of QUALITY_COLUMNS.
+    '''
+    quality_data = snapshot_store.read_snapshot(csv_file_path, usecols=get_quality_columns(csv_file_path))
+    return convert_quality_data(quality_data, csv_file_path)
+
+def load_quality_chunks(csv_file_path, chunksize):
+    '''
+        Load the quality data as load_quality_data does, in chunks of rows for the files that do not fit in memory.
+        Every chunk is parsed with the dtypes of the whole file (see snapshot_store.read_snapshot_chunks), so it is the same
+        of the rows it has in the quality data loaded at once.
+
+        :param chunksize: number of KGs of each chunk.
+        :return: generator of DataFrames with the columns of QUALITY_COLUMNS, at least one (empty if the file has no KGs).
+    '''
+    for i, chunk in enumerate(snapshot_store.read_snapshot_chunks(csv_file_path, chunksize, usecols=get_quality_columns(csv_file_path))):
+        yield convert_quality_data(chunk, csv_file_path, verbose=i == 0)
+
+def convert_quality_data(quality_data, csv_file_path, verbose=True):
+    '''
+        Convert the columns read from a KGHeartBeat output to the types of QUALITY_COLUMNS and add the missing ones from their fallback.
+    '''
+    for column, kind in QUALITY_COLUMNS.items():
+        if column not in quality_data.columns:
+            continue
+        if kind == 'flag':
+            true_values, false_values = FLAG_VALUES[column]
+            flag = pd.Series(pd.NA, index=quality_data.index, dtype='boolean')
+            flag[quality_data[column].isin(true_values)] = True
+            flag[quality_data[column].isin(false_values)] = False
+            quality_data[column] = flag
+        elif kind == 'number' and quality_data[column].dtype == object:
+            quality_data[column] = pd.to_numeric(quality_data[column], errors='coerce').astype('Float64')
+        elif kind == 'category' and quality_data[column].dtype == object:
+            quality_data[column] = quality_data[column].astype('category')
+
+    for column, fallback in COLUMN_FALLBACKS.items():
+        if column not in quality_data.columns:
+            if verbose:
+                print(f"{column} not available in {csv_file_path}, {fallback} used in place of it")
+            quality_data[column] = quality_data[fallback]
+    return quality_data
+
+def get_memory_usage(quality_data):
+    '''
+        Memory used by each column of the quality data, in bytes (the strings included).
+
+        :return: Series indexed by the column name, sorted from the largest.
+    '''
+    return quality_data.memory_usage(index=False, deep=True).sort_values(ascending=False)
+
+def is_true(flag):
+    '''
+        True where a flag loaded by load_quality_data is true, missing values are false.
+    '''
+    return flag.fillna(False).astype(bool)
+
+def normalize_quality_data(quality_data):
+    '''
+        Convert the KGHeartBeat sentinel values ('-', '[]', 'False', NaN, ...) into
+        boolean and numeric columns, so that every FAIR metric can be computed with column operations.
+
+        :param quality_data: DataFrame with the KGHeartBeat quality data, as returned by load_quality_data.
+        :return: DataFrame with one normalized column for each quality indicator used by the FAIR metrics.
+    '''
+    normalized = pd.DataFrame(index=quality_data.index)
+
+    normalized['sparql_url'] = is_filled(quality_data['SPARQL endpoint URL'])
+    normalized['sparql_available'] = quality_data['Sparql endpoint'] == 'Available'
+    normalized['dump_available'] = is_true(quality_data['Availability of RDF dump (metadata)'])
+    normalized['void_url'] = is_filled(quality_data['Url file VoID'])
+    normalized['media_types'] = ~quality_data['metadata-media-type'].isin(EMPTY_MEDIA_TYPES)
+    normalized['void_serialization'] = quality_data['Serialization formats'].str.contains('meta/void', na=False)
+
+    normalized['license_metadata'] = is_not_in(quality_data['License machine redeable (metadata)'], ['-', '',False,'False'])
+    normalized['license_query'] = is_not_in(quality_data['License machine redeable (query)'], ['-', '',False,'False','[]'])
+    normalized['license_query_retrievable'] = is_not_in(quality_data['License machine redeable (query)'], ['-', ''])
+    normalized['license_query_not_missing'] = ~quality_data['License machine redeable (query)'].isin(['-','',False,'False']) # NaN is not treated as missing here
+    normalized['license_human'] = is_true(quality_data['License human redeable'])
+
+    normalized['vocabularies'] = is_not_in(quality_data['Vocabularies'], ['[]','-'])
+    normalized['links'] = is_positive_count(quality_data['Degree of connection']) | is_positive_count(quality_data['Number of samAs chains'])
+
+    normalized['use_https'] = is_true(quality_data['Use HTTPS'])
+    normalized['authentication_declared'] = quality_data['Requires authentication'].notna() # Declared either way
+
+    return normalized
+
+def get_publisher_flags(quality_data):
+    '''
+        Column-level version of utils.check_publisher_info: one 0/1 column for each source of publisher information.
+        The author metadata and the sources are matched with the precompiled patterns; an author metadata that is not a string
+        (where check_publisher_info would fail) counts as present, sources that are not a string count as absent.
+
+        :param quality_data: DataFrame with the KGHeartBeat quality data.
+        :return: DataFrame with the author_query, author_metadata, contributors, publishers and sources columns.
+    '''
+    flags = pd.DataFrame(index=quality_data.index)
+    flags['author_query'] = is_not_in(quality_data['Author (query)'], ['[]', '-'])
+
+    author_metadata = quality_data['Author (metadata)']
+    flags['author_metadata'] = is_not_in(author_metadata, [False,'False']) & ~as_strings(author_metadata).str.fullmatch(AUTHOR_ABSENT_PATTERN, na=False).astype(bool)
+
+    flags['contributors'] = is_not_in(quality_data['Contributor'], ['[]', '-'])
+    flags['publishers'] = is_not_in(quality_data['Publisher'], ['[]', '-'])
+
+    # Values after "Web:", "Name:" and "Email:", the sources are declared if any of them is not "absent" or empty
+    sources = quality_data['Sources']
+    values = as_strings(sources).str.extractall(SOURCES_VALUE_PATTERN)[0]
+    declared = (~values.str.strip().str.lower().isin(['absent', ''])).groupby(level=0).any()
+    flags['sources'] = is_not_in(sources, ['-', '']) & declared.reindex(quality_data.index, fill_value=False).astype(bool)
+
+    return flags.astype(int)
+
+def get_publisher_info(publisher_flags):
+    '''
+        1 if at least one source of publisher information is declared (F2b-M and R1.2).
+    '''
+    return publisher_flags.any(axis=1).astype(int)
+
+def get_uris_dereferenceability(quality_data):
+    '''
+        Return the URIs dereferenceability as a number, with missing values set to 0.
+        If the value is missing for every KG the column stays integer, as in the published results.
+    '''
+    dereferenceability = pd.to_numeric(quality_data['URIs Deferenceability'], errors='coerce')
+    if isinstance(dereferenceability.dtype, pd.Float64Dtype):
+        dereferenceability = dereferenceability.astype('float64') # Written as the float column parsed from the CSV
+    if len(dereferenceability) > 0 and dereferenceability.isna().all():
+        return pd.Series(0, index=quality_data.index)
+    return dereferenceability.fillna(0)
+
+def parse_vocabularies(vocabularies):
+    '''
+        Split a stringified Vocabularies list as utils.check_if_fair_vocabs does, keeping the empty entries.
+    '''
+    vocabularies = vocabularies.replace('[','').replace(']','').split(',')
+    return [vocab.strip().replace("'","").replace('"',"") for vocab in vocabularies]
+
+def get_vocabulary_table(quality_data):
+    '''
+        Parse the stringified Vocabularies lists of a snapshot once, into a table with one row for each vocabulary declared by a KG.
+        Each distinct list is parsed only once. The empty entries (e.g. of '[]' or of a trailing comma) are kept because they count
+        in the I2 ratio; a missing value is parsed as '-'.
+
+        :param quality_data: DataFrame with the KGHeartBeat quality data.
+        :return: DataFrame indexed as quality_data (one row per vocabulary) with the KG id, the vocabulary (categorical) and whether it is a FAIR one.
+    '''
+    vocabularies = quality_data['Vocabularies'].astype(object).where(quality_data['Vocabularies'].notna(), '-').astype(str)
+    codes, unique_lists = pd.factorize(vocabularies)
+    parsed = [parse_vocabularies(unique_list) for unique_list in unique_lists]
+
+    # Vocabularies of each distinct list as codes of the categories, flattened
+    category_codes, categories = pd.factorize(pd.Series([vocab for vocabs in parsed for vocab in vocabs], dtype=object))
+    lengths = np.array([len(vocabs) for vocabs in parsed], dtype=np.int64)
+    starts = np.cumsum(lengths) - lengths
+
+    # Gather the vocabularies of each KG from the ones of its list
+    row_lengths = lengths[codes]
+    row_offsets = np.repeat(np.cumsum(row_lengths) - row_lengths, row_lengths)
+    flat_positions = np.repeat(starts[codes], row_lengths) + np.arange(row_lengths.sum()) - row_offsets
+    vocabulary_codes = category_codes[flat_positions]
+
+    rows = np.repeat(np.arange(len(quality_data)), row_lengths)
+    return pd.DataFrame({
+        'KG id': quality_data['KG id'].to_numpy()[rows],
+        'Vocabulary': pd.Categorical.from_codes(vocabulary_codes, categories=pd.Index(categories, dtype=object)),
+        'FAIR': np.asarray(categories.isin(FAIR_VOCABULARIES))[vocabulary_codes],
+    }, index=quality_data.index[rows])
+
+def get_fair_vocabularies_ratio(vocabulary_table, index):
+    '''
+        Share of the FAIR vocabularies among the ones declared by each KG (I2), computed with a grouped sum over the vocabulary table.
+
+        :param vocabulary_table: table returned by get_vocabulary_table.
+        :param index: index of the quality data, the order of the result.
+    '''
+    if len(index) == 0:
+        return pd.Series(index=index, dtype=object)
+    rows = index.get_indexer(vocabulary_table.index)
+    fair_vocabularies_defined = np.bincount(rows, weights=vocabulary_table['FAIR'].to_numpy(), minlength=len(index))
+    total_vocabs = np.bincount(rows, minlength=len(index))
+    return pd.Series(fair_vocabularies_defined / total_vocabs, index=index)
+
+def get_vocabulary_usage(vocabulary_tables):
+    '''
+        Number of KGs that use each vocabulary in each subcloud.
+
+        :param vocabulary_tables: dictionary from the subcloud to its vocabulary table (see get_vocabulary_table).
+        :return: DataFrame with one row for each vocabulary, whether it is a FAIR one and one column of counts for each subcloud, sorted by total usage.
+    '''
+    usage = {}
+    for subcloud, vocabulary_table in vocabulary_tables.items():
+        used = vocabulary_table[~vocabulary_table['Vocabulary'].astype(str).isin(['', '-'])]
+        usage[subcloud] = used.drop_duplicates(['KG id', 'Vocabulary']).groupby('Vocabulary', observed=True)['KG id'].size()
+    usage = pd.DataFrame(usage).fillna(0).astype(int)
+    usage.index = usage.index.astype(str)
+    usage.insert(0, 'FAIR', usage.index.isin(FAIR_VOCABULARIES))
+    return usage.loc[usage.drop(columns='FAIR').sum(axis=1).sort_values(ascending=False, kind='stable').index]
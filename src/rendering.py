@@ -0,0 +1,143 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import instrumentation
+
+class RenderQueue:
+    def __init__(self, workers=1, dpi=None, image_format='png', render=True):
+        '''
+            Queue of the figures to draw. The figures are rendered in worker processes, so the statistics never wait for matplotlib
+            and every figure is closed as soon as it is saved.
+
+            :param workers: number of rendering processes (0 renders each figure in this process when it is submitted).
+            :param dpi: resolution of the images (None for the default of each figure, 300 for the heatmaps and the matplotlib one for the boxplots).
+            :param image_format: format of the images, e.g. 'png', 'svg' or 'pdf'.
+            :param render: False to skip the rendering, for batch runs that only need the CSV results.
+        '''
+        self.workers = workers
+        self.dpi = dpi
+        self.image_format = image_format
+        self.render = render
+        self.executor = None
+        self.futures = {}
+        self.rendered = []
+        self.failed = []
+
+    def get_image_file(self, output_file):
+        return f'{output_file}.{self.image_format}'
+
+    def submit(self, render_function, output_file, *args):
+        '''
+            Add a figure to the queue.
+
+            :param render_function: top-level function that draws the figure, called as render_function(image_file, dpi, *args).
+            :param output_file: path of the image without the extension.
+            :return: path of the image that will be written (None in no-render mode).
+        '''
+        if not self.render:
+            return None
+        image_file = self.get_image_file(output_file)
+        if self.workers <= 0:
+            self.run(render_function, image_file, args)
+            return image_file
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.futures[self.executor.submit(render_function, image_file, self.dpi, *args)] = image_file
+        return image_file
+
+    def run(self, render_function, image_file, args):
+        try:
+            with instrumentation.phase('render'):
+                render_function(image_file, self.dpi, *args)
+            self.rendered.append(image_file)
+            instrumentation.count('charts rendered')
+        except Exception:
+            print(f"Rendering of {image_file} failed:\n{traceback.format_exc()}")
+            self.failed.append(image_file)
+
+    def wait(self):
+        '''
+            Wait for all the figures in the queue.
+
+            :return: (rendered, failed) lists of image paths.
+        '''
+        for future, image_file in self.futures.items():
+            try:
+                with instrumentation.phase('wait for rendering'):
+                    future.result()
+                self.rendered.append(image_file)
+                instrumentation.count('charts rendered')
+            except Exception:
+                print(f"Rendering of {image_file} failed:\n{traceback.format_exc()}")
+                self.failed.append(image_file)
+        self.futures = {}
+        return self.rendered, self.failed
+
+    def close(self):
+        self.wait()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+def render_heatmap(image_file, dpi, correlation_result, title):
+    """
+    Draw heatmap with numeric values for color and annotations with rho + stars only.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.colors import TwoSlopeNorm
+    from matplotlib.colors import LinearSegmentedColormap
+
+    # Heatmap colors still based on numeric rho
+    norm = TwoSlopeNorm(vmin=-1, vcenter=0, vmax=1)
+    cmap = LinearSegmentedColormap.from_list('BlueWhiteBlue', ['blue', 'white', 'blue'])
+
+    figure = plt.figure(figsize=(20, 10))
+    try:
+        ax = sns.heatmap(
+            correlation_result.get_rho_matrix(),
+            annot=correlation_result.get_heatmap_annotations(),
+            fmt="",
+            cmap=cmap,
+            cbar=True,
+            norm=norm,
+            linewidths=0.5,
+            linecolor="gray"
+        )
+
+        plt.title(title, fontsize=16)
+        ax.set_xticklabels(ax.get_xticklabels(), fontsize=14, rotation=45, ha="right")
+        ax.set_yticklabels(ax.get_yticklabels(), fontsize=14)
+        plt.tight_layout()
+        plt.savefig(image_file, dpi=dpi if dpi is not None else 300)
+    finally:
+        plt.close(figure)
+
+def render_boxplot(image_file, dpi, combined_df, column_to_plot, y_min, y_max):
+    '''
+        Draw the distribution of a score across the subclouds.
+    '''
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    figure = plt.figure(figsize=(12, 6))
+    try:
+        sns.boxplot(data=combined_df, x='Subclouds', y=f'{column_to_plot}')
+        plt.xticks(rotation=45)
+        plt.ylim(y_min,y_max)
+        plt.title(f'{column_to_plot} distribution across subclouds')
+        plt.tight_layout()
+        os.makedirs(os.path.dirname(image_file) or '.', exist_ok=True)
+        plt.savefig(image_file, dpi=dpi if dpi is not None else 'figure')
+    finally:
+        plt.close(figure)
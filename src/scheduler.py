@@ -0,0 +1,95 @@
+import traceback
+from instrumentation import run_task
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+class Task:
+    def __init__(self, task_id, function, args=(), dependencies=()):
+        '''
+            A unit of work of the pipeline.
+
+            :param task_id: unique identifier of the task, e.g. ('evaluate', topic, snapshot).
+            :param function: top-level function to run (it has to be picklable to run in a worker process).
+            :param args: arguments of the function.
+            :param dependencies: ids of the tasks that must be completed before this one.
+        '''
+        self.task_id = task_id
+        self.function = function
+        self.args = args
+        self.dependencies = list(dependencies)
+
+class TaskGraph:
+    def __init__(self):
+        self.tasks = {}
+        self.reports = {} # Time, phases and counters of each completed task, see instrumentation.run_task
+
+    def add(self, task_id, function, args=(), dependencies=()):
+        '''
+            Add a task to the graph, dependencies not in the graph are considered already satisfied.
+        '''
+        self.tasks[task_id] = Task(task_id, function, args, dependencies)
+        return task_id
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def run(self, jobs=1, instrumentation_options=None):
+        '''
+            Run all the tasks, each one as soon as its dependencies are completed.
+
+            :param jobs: number of worker processes (1 runs everything in this process, in dependency order).
+            :param instrumentation_options: profiling options of every task (see instrumentation.run_task), the reports are in self.reports.
+            :return: (results, failed) where results maps the id of every completed task to its return value
+                     and failed lists the ids of the tasks that raised an error or depend on one of them.
+        '''
+        dependencies = {task_id: set(dependency for dependency in task.dependencies if dependency in self.tasks) for task_id, task in self.tasks.items()}
+        pending = list(self.tasks)
+        results = {}
+        failed = []
+
+        def take_ready():
+            ready = [task_id for task_id in pending if dependencies[task_id] <= results.keys()]
+            for task_id in ready:
+                pending.remove(task_id)
+            return ready
+
+        def skip_dependents():
+            skipped = True
+            while skipped:
+                skipped = [task_id for task_id in pending if dependencies[task_id] & set(failed)]
+                for task_id in skipped:
+                    pending.remove(task_id)
+                    failed.append(task_id)
+                    print(f"Skipping {task_id}: a dependency failed")
+
+        if jobs <= 1:
+            ready = take_ready()
+            while ready:
+                for task_id in ready:
+                    task = self.tasks[task_id]
+                    try:
+                        results[task_id], self.reports[task_id] = run_task(task_id, task.function, task.args, instrumentation_options)
+                    except Exception:
+                        print(f"Task {task_id} failed:\n{traceback.format_exc()}")
+                        failed.append(task_id)
+                skip_dependents()
+                ready = take_ready()
+            return results, failed
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            running = {}
+            while pending or running:
+                for task_id in take_ready():
+                    task = self.tasks[task_id]
+                    running[executor.submit(run_task, task_id, task.function, task.args, instrumentation_options)] = task_id
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = running.pop(future)
+                    try:
+                        results[task_id], self.reports[task_id] = future.result()
+                    except Exception:
+                        print(f"Task {task_id} failed:\n{traceback.format_exc()}")
+                        failed.append(task_id)
+                skip_dependents()
+        return results, failed
@@ -0,0 +1,246 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+import paths
+import instrumentation
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# The store is optional: it is used only if enabled here or with the FAIRLENS_SNAPSHOT_STORE environment variable (inherited by the worker processes)
+enabled = os.environ.get('FAIRLENS_SNAPSHOT_STORE', '0') == '1'
+store_path = None # Folder of the store, None for the one in the data root
+
+SCHEMA_FILE = 'schema.json'
+SCHEMA_VERSION = 2
+NUMPY_DTYPES = ('int64', 'float64', 'bool')
+VALUE_TYPES = {'str': str, 'int': int, 'float': float, 'bool': bool}
+
+def read_snapshot(csv_file_path, usecols=None):
+    '''
+        Read a snapshot CSV as pd.read_csv does, with the same columns and dtypes.
+        If the store is enabled the CSV is parsed only the first time: its columns are saved as NumPy arrays with a JSON schema
+        and the next reads load only the requested columns from them. The CSV stays the interchange format, the store is only a cache.
+
+        :param csv_file_path: path to the CSV file.
+        :param usecols: columns to read (None for all), as in pd.read_csv.
+    '''
+    with instrumentation.phase('read snapshots'):
+        df = read_snapshot_columns(csv_file_path, usecols)
+    instrumentation.count('snapshot rows read', len(df))
+    return df
+
+def read_snapshot_columns(csv_file_path, usecols=None):
+    if not enabled:
+        return pd.read_csv(csv_file_path, usecols=usecols)
+    snapshot_path = get_snapshot_path(csv_file_path)
+    try:
+        schema = load_schema(snapshot_path, csv_file_path)
+    except (OSError, ValueError, KeyError):
+        schema = None # Store being rewritten by another process or corrupted: read the CSV
+    if schema is not None:
+        if usecols is not None:
+            select_columns([column['name'] for column in schema['columns']], usecols) # Columns not in the file, raised as pd.read_csv without parsing it again
+        try:
+            return load_columns(snapshot_path, schema, usecols, csv_file_path)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    df = pd.read_csv(csv_file_path)
+    save_snapshot(df, csv_file_path, snapshot_path)
+    return df[select_columns(df.columns, usecols)] if usecols is not None else df
+
+def get_chunk_kind(column):
+    '''
+        Kind of the dtype pd.read_csv inferred for a column of a chunk: 'int', 'float', 'bool', 'object', None if all the values are missing.
+    '''
+    if column.isna().all():
+        return None
+    return {'i': 'int', 'u': 'int', 'f': 'float', 'b': 'bool'}.get(column.dtype.kind, 'object')
+
+def get_file_dtypes(csv_file_path, chunksize, usecols=None):
+    '''
+        Find the columns that pd.read_csv parses with a different dtype in some chunks than in the whole file (e.g. integers in a chunk
+        and floats in another one), scanning the file in chunks.
+
+        :return: (dtypes to parse the columns with, dtypes to convert the parsed chunks to), dictionaries from the column name to the dtype.
+    '''
+    kinds, missing = {}, {}
+    for chunk in pd.read_csv(csv_file_path, usecols=usecols, chunksize=chunksize):
+        for column in chunk.columns:
+            kinds.setdefault(column, set()).add(get_chunk_kind(chunk[column]))
+            missing[column] = missing.get(column, False) or bool(chunk[column].isna().any())
+
+    parse_dtypes, convert_dtypes = {}, {}
+    for column, column_kinds in kinds.items():
+        column_kinds = column_kinds - {None}
+        if len(column_kinds) == 0:
+            continue # Missing everywhere, float in every chunk
+        if column_kinds <= {'int', 'float'}:
+            if column_kinds != {'int'} or missing[column]:
+                parse_dtypes[column] = 'float64'
+        elif column_kinds == {'bool'}:
+            if missing[column]:
+                convert_dtypes[column] = object # Booleans and NaN, as in the whole file
+        elif len(column_kinds) > 1 or missing[column]:
+            parse_dtypes[column] = object # Strings as they are written, as in the whole file
+    return parse_dtypes, convert_dtypes
+
+def read_snapshot_chunks(csv_file_path, chunksize, usecols=None):
+    '''
+        Read a snapshot CSV in chunks of rows, each chunk with the dtypes that pd.read_csv infers for the whole file
+        (read_csv with chunksize infers them chunk by chunk). The file is scanned once to find the dtypes and then read again,
+        so at most one chunk is in memory at a time.
+
+        :param chunksize: number of rows of each chunk.
+        :param usecols: columns to read (None for all), as in pd.read_csv.
+        :return: generator of DataFrames, indexed by the position of their rows in the file.
+    '''
+    with instrumentation.phase('read snapshots'):
+        parse_dtypes, convert_dtypes = get_file_dtypes(csv_file_path, chunksize, usecols)
+        chunks = pd.read_csv(csv_file_path, usecols=usecols, chunksize=chunksize, dtype=parse_dtypes)
+    while True:
+        with instrumentation.phase('read snapshots'):
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            chunk = chunk.astype(convert_dtypes) if len(convert_dtypes) > 0 else chunk
+        instrumentation.count('snapshot rows read', len(chunk))
+        yield chunk
+
+def get_snapshot_path(csv_file_path):
+    csv_file_path = os.path.abspath(csv_file_path)
+    path_hash = hashlib.sha1(csv_file_path.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(store_path if store_path is not None else paths.data_path('snapshot_store'), f"{os.path.basename(csv_file_path)}-{path_hash}")
+
+def get_source_signature(csv_file_path, with_hash=True):
+    stat = os.stat(csv_file_path)
+    signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        sha = hashlib.sha256()
+        with open(csv_file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                sha.update(block)
+        signature['sha256'] = sha.hexdigest()
+    return signature
+
+def load_schema(snapshot_path, csv_file_path):
+    '''
+        Return the schema of the stored snapshot if it was built from the current content of the CSV, None otherwise.
+    '''
+    schema_file_path = os.path.join(snapshot_path, SCHEMA_FILE)
+    if not os.path.exists(schema_file_path):
+        return None
+    with open(schema_file_path, "r", encoding="utf-8") as file:
+        schema = json.load(file)
+    if schema['version'] != SCHEMA_VERSION:
+        return None
+    source = schema['source']
+    signature = get_source_signature(csv_file_path, with_hash=False)
+    if signature['size'] != source['size']:
+        return None
+    if signature['mtime_ns'] != source['mtime_ns']: # Touched but maybe not changed
+        if get_source_signature(csv_file_path)['sha256'] != source['sha256']:
+            return None
+        # Same content: record the new mtime, so that the next reads do not hash the CSV again
+        source['mtime_ns'] = signature['mtime_ns']
+        save_schema(schema, snapshot_path)
+    return schema
+
+def save_schema(schema, snapshot_path):
+    '''
+        Rewrite the schema of a stored snapshot, replacing the file at once so that readers never see it half written.
+    '''
+    tmp_file_path = os.path.join(snapshot_path, f"{SCHEMA_FILE}.tmp{os.getpid()}")
+    try:
+        with open(tmp_file_path, 'w', encoding='utf-8') as file:
+            json.dump(schema, file)
+        os.replace(tmp_file_path, os.path.join(snapshot_path, SCHEMA_FILE))
+    except OSError:
+        pass # Store being rewritten by another process, the mtime is recorded by the next read
+
+def select_columns(columns, usecols):
+    missing = [column for column in usecols if column not in columns]
+    if len(missing) > 0:
+        raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+    return [column for column in columns if column in usecols] # Same order of the file, as pd.read_csv
+
+def load_columns(snapshot_path, schema, usecols=None, csv_file_path=None):
+    '''
+        Load the requested columns of a stored snapshot. The numeric and boolean columns are memory-mapped copy-on-write and used
+        by the DataFrame without copying them: only the pages read are loaded, and the stages can still modify the DataFrame in place
+        (the changes are never written to the store). The columns that could not be stored are read from the CSV, only them.
+    '''
+    columns = [column['name'] for column in schema['columns']]
+    selected = set(select_columns(columns, usecols)) if usecols is not None else set(columns)
+    csv_columns = [column['name'] for column in schema['columns'] if column['name'] in selected and column['dtype'] is None]
+    csv_data = pd.read_csv(csv_file_path, usecols=csv_columns) if len(csv_columns) > 0 else None
+    data = {}
+    for i, column in enumerate(schema['columns']):
+        if column['name'] not in selected:
+            continue
+        if column['dtype'] is None:
+            data[column['name']] = csv_data[column['name']]
+            continue
+        values = np.load(os.path.join(snapshot_path, f'{i}.npy'), mmap_mode='c')
+        if column['dtype'] == 'object':
+            # Strings (and mixed values) are stored as codes into the categories, -1 for the missing values
+            categories = np.empty(len(column['categories']) + 1, dtype=object)
+            categories[:-1] = [VALUE_TYPES[value_type](value) for value_type, value in column['categories']]
+            categories[-1] = np.nan
+            values = categories[values]
+        data[column['name']] = values
+    return pd.DataFrame(data, index=pd.RangeIndex(schema['rows']), copy=False)
+
+def encode_objects(values):
+    '''
+        Return the codes and the categories (as [type, value]) of an object column, values equal but of different types (e.g. 1 and '1') are kept apart.
+    '''
+    keys = pd.Series([(type(value).__name__, value) if not isinstance(value, float) or value == value else None for value in values], dtype=object)
+    codes, uniques = pd.factorize(keys, use_na_sentinel=True)
+    categories = []
+    for value_type, value in uniques:
+        if value_type == 'str':
+            categories.append(['str', value])
+        elif isinstance(value, (bool, np.bool_)):
+            categories.append(['bool', bool(value)])
+        elif isinstance(value, (int, np.integer)):
+            categories.append(['int', int(value)])
+        elif isinstance(value, (float, np.floating)):
+            categories.append(['float', float(value)])
+        else:
+            return None, None # Not representable in the schema
+    return codes.astype(np.int32), categories
+
+def save_snapshot(df, csv_file_path, snapshot_path):
+    '''
+        Write the columns of a snapshot in the store, in a temporary folder renamed at the end so that readers never see it half written.
+    '''
+    schema = {'version': SCHEMA_VERSION, 'source': get_source_signature(csv_file_path), 'rows': len(df), 'columns': []}
+    tmp_path = f"{snapshot_path}.tmp{os.getpid()}"
+    try:
+        os.makedirs(tmp_path, exist_ok=True)
+        for i, name in enumerate(df.columns):
+            dtype = str(df[name].dtype)
+            column = {'name': name, 'dtype': dtype}
+            values = None
+            if dtype in NUMPY_DTYPES:
+                values = df[name].to_numpy()
+            elif dtype == 'object':
+                values, column['categories'] = encode_objects(df[name].to_numpy())
+            if values is None:
+                column = {'name': name, 'dtype': None} # Not representable in the store, read from the CSV when requested
+            else:
+                np.save(os.path.join(tmp_path, f'{i}.npy'), values)
+            schema['columns'].append(column)
+        with open(os.path.join(tmp_path, SCHEMA_FILE), 'w', encoding='utf-8') as file:
+            json.dump(schema, file)
+        if os.path.exists(snapshot_path):
+            shutil.rmtree(snapshot_path, ignore_errors=True)
+        os.rename(tmp_path, snapshot_path)
+    except OSError:
+        pass # Another process stored the same snapshot
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
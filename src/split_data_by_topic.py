@@ -1,95 +1,125 @@
-import requests
 import json
 import os
 import pandas as pd
+import paths
+import instrumentation
+import snapshot_store
+from lodcloud_store import LODCloudStore
+
+def group_kgs_by_topic(lodcloud):
+    '''
+        Group the KG ids of the LOD Cloud by their domain, the topics of the split ('no-domain' for the KGs without one).
+
+        :param lodcloud: compact form of the LOD Cloud (see lodcloud_store.get_compact).
+    '''
+    kgs_by_topic = {}
+    for kg_id, domain in zip(lodcloud['kg_ids'], lodcloud['domains']):
+        if domain == '':
+            domain = 'no-domain'
+        if domain not in kgs_by_topic:
+            kgs_by_topic[domain] = []
+        kgs_by_topic[domain].append(kg_id) # The ',' of the LOD Cloud identifier is replaced by ';' as in the KG id in the KGHeartBeat CSV file
+    return kgs_by_topic
 
 class SplitLODCKGsByTopic:
-    def __init__(self,kghb_quality_data_path):
+    def __init__(self,kghb_quality_data_path, lodcloud_version=None):
+        '''
+            :param lodcloud_version: version of the LOD Cloud to use from the local store (the latest released on or before this date),
+                                     the latest stored if None. The store is filled with: python lodcloud_store.py refresh <version>
+        '''
         self.kghb_quality_data_path = kghb_quality_data_path
-        try:
-            response = requests.get("https://lod-cloud.net/versions/2025-03-26/lod-data.json")
-            response.raise_for_status() 
-            self.lodcloud_data = response.json()
-            with open('../data/lodcloud.json', "w", encoding="utf-8") as f:
-                json.dump(self.lodcloud_data, f, indent=4)
-            print(f"{len(self.lodcloud_data)} KGs recovered from the LOD Cloud")
-        except Exception as e:
-            print(e)
-            with open('../data/lodcloud.json', "r", encoding="utf-8") as file:
-                self.lodcloud_data = json.load(file)
-                print(f"{len(self.lodcloud_data)} KGs recovered from the LOD Cloud")
+        store = LODCloudStore()
+        self.lodcloud_version = store.select(lodcloud_version)
+        self.lodcloud = store.load_compact(self.lodcloud_version) # Only the KG ids, domains and flags, see lodcloud_store.get_compact
+        store.activate(self.lodcloud_version) # lodcloud.json, read by the evaluation
+        print(f"{len(self.lodcloud['kg_ids'])} KGs recovered from the LOD Cloud (version {self.lodcloud_version})")
     
     def recover_lodc_kgs_by_topic(self):
         '''
             Retrieves svg files from LOD Cloud and extracts links to KG metadata.
         '''
-        kgs_by_topic = {}
-
-        for dataset in self.lodcloud_data:
-            domain = self.lodcloud_data[dataset]['domain']
-            if domain == '':
-                domain = 'no-domain'
-            if domain not in kgs_by_topic:
-                kgs_by_topic[domain] = []
-            kgs_by_topic[domain].append(self.lodcloud_data[dataset]['identifier'].replace(',',';')) #The replace is useful only to match the identifier from the LODCloud with the KG id in the KGHeartBeat CSV file
-            
+        kgs_by_topic = group_kgs_by_topic(self.lodcloud)
+
         for topic in kgs_by_topic:
             print(f"Number of dataset in the topic {topic}: {len(kgs_by_topic[topic])}")
-            os.makedirs(f"../data/quality_data/{topic}",exist_ok=True)
-        with open('../data/kgs_by_topic.json','w',encoding='utf-8') as file: 
+            os.makedirs(paths.data_path('quality_data', topic),exist_ok=True)
+        with open(paths.data_path('kgs_by_topic.json'),'w',encoding='utf-8') as file: 
             json.dump(kgs_by_topic, file, indent=4, ensure_ascii=False)    
 
-    def split_kgs_csv_by_topic(self):
+    def split_kgs_csv_by_topic(self, include_all=True, chunksize=None, snapshots=None):
         '''
             Extract the KGs from LODCloud and split it by topic in different folder.
+            Each CSV is read only once and all the topic partitions (and the 'all' partition) are written from that single pass.
 
-            :param dir_path: path to csv where to get the KGs to split by topic.
+            :param include_all: write also the 'all' partition with every KG from the LOD Cloud (as extract_only_lodc).
+            :param chunksize: number of rows to process at a time, for CSVs that do not fit in memory (None reads the whole file).
+            :param snapshots: names of the CSVs to split (None for all the CSVs in the KGHeartBeat output).
         '''
         self.recover_lodc_kgs_by_topic()
-        with open('../data/kgs_by_topic.json', "r", encoding="utf-8") as file:
-            kgs_by_topic_dict = json.load(file)
+        with open(paths.data_path('kgs_by_topic.json'), "r", encoding="utf-8") as file:
+            kgs_by_partition = json.load(file)
+        if include_all:
+            kgs_by_partition['all'] = self.get_lodc_identifiers()
 
-        for topic in kgs_by_topic_dict:
-            kgs_in_the_topic = kgs_by_topic_dict[topic]
+        self.write_partitions(kgs_by_partition, chunksize, snapshots)
 
-            for filename in os.listdir(self.kghb_quality_data_path):
-                if '.csv' in filename:
-                    file_path = os.path.join(self.kghb_quality_data_path, filename)
-                    df = pd.read_csv(file_path)
-
-                    identifiers_in_csv = set(df['KG id'].unique())
-                    missing_identifiers = set(kgs_in_the_topic) - identifiers_in_csv
+    def extract_only_lodc(self, chunksize=None):
+        '''
+            Extract only KGs from LODCloud from the csv output from KGs Quality Analyzer.
 
-                    print(f"File: {file_path} filtered")
-                    print(f"For topic: {topic} {len(missing_identifiers)} KGs not analyzed by KGHB")
+            :param chunksize: number of rows to process at a time, for CSVs that do not fit in memory (None reads the whole file).
+        '''
+        self.write_partitions({'all': self.get_lodc_identifiers()}, chunksize)
 
-                    df['KG id'] = df['KG id'].astype(str).str.strip()
-                    df_filtered = df[df['KG id'].isin(kgs_in_the_topic)]
+    def get_lodc_identifiers(self):
+        identifiers = list(self.lodcloud['kg_ids'])
+        print(f"Total number of dataset form LOD Cloud: {len(identifiers)}")
+        return identifiers
 
-                    df_filtered.to_csv(f"../data/quality_data/{topic}/{filename}",index=False)
-    
-    def extract_only_lodc(self):
+    def write_partitions(self, kgs_by_partition, chunksize=None, snapshots=None):
         '''
-            Extract only KGs from LODCloud from the csv output from KGs Quality Analyzer.
+            Write, for each CSV in the KGHeartBeat output, one CSV for each partition with only its KGs.
 
-            :param analysis_results_path: path to csv where to discard the KGs.
+            :param kgs_by_partition: dictionary from the partition name (topic or 'all') to the list of its KG ids.
+            :param chunksize: number of rows to process at a time. The chunks are parsed with the dtypes of the whole CSV
+                              (see snapshot_store.read_snapshot_chunks), so the partitions are written as without chunks.
+            :param snapshots: names of the CSVs to split (None for all the CSVs in the KGHeartBeat output).
         '''
-        os.makedirs(f"../data/quality_data/all",exist_ok=True)
-        identifiers = [data['identifier'].replace(',',';') for key, data in self.lodcloud_data.items()] #The replace is useful only to match the identifier from the LODCloud with the KG id in the KGHeartBeat CSV file
-        print(f"Total number of dataset form LOD Cloud: {len(identifiers)}")
-        # Iterate throught all the csv and create a new csv with only the KGs from LODCloud
+        partitions_by_kg_id = {}
+        for partition, kg_ids in kgs_by_partition.items():
+            os.makedirs(paths.data_path('quality_data', partition),exist_ok=True)
+            for kg_id in kg_ids:
+                partitions = partitions_by_kg_id.setdefault(kg_id, [])
+                if partition not in partitions:
+                    partitions.append(partition)
+
         for filename in os.listdir(self.kghb_quality_data_path):
-            if '.csv' in filename:
+            if '.csv' in filename and (snapshots is None or filename in snapshots):
                 file_path = os.path.join(self.kghb_quality_data_path, filename)
-                df = pd.read_csv(file_path)
+                if chunksize is None:
+                    chunks = [pd.read_csv(file_path)]
+                else:
+                    chunks = snapshot_store.read_snapshot_chunks(file_path, chunksize)
 
-                identifiers_in_csv = set(df['KG id'].unique())
-                missing_identifiers = set(identifiers) - identifiers_in_csv
+                identifiers_in_csv = set()
+                for i, df in enumerate(chunks):
+                    identifiers_in_csv.update(df['KG id'].unique())
+                    df['KG id'] = df['KG id'].astype(str).str.strip()
 
-                print(f"File: {file_path} filtered")
-                print(f"{len(missing_identifiers)} KGs not analyzed by KGHeartBeat")
+                    # Row positions of each partition, in the order of the source CSV
+                    partitions = df['KG id'].map(partitions_by_kg_id).explode().dropna()
+                    rows_by_partition = pd.Series(range(len(df)), index=df.index)[partitions.index].groupby(partitions.values).agg(list).to_dict() if len(partitions) > 0 else {}
 
-                df['KG id'] = df['KG id'].astype(str).str.strip()
-                df_filtered = df[df['KG id'].isin(identifiers)]
+                    with instrumentation.phase('write partitions'):
+                        for partition in kgs_by_partition:
+                            df_filtered = df.iloc[rows_by_partition.get(partition, [])]
+                            df_filtered.to_csv(paths.data_path('quality_data', partition, filename),index=False, mode='w' if i == 0 else 'a', header=i == 0)
+                    instrumentation.count('rows split', len(df))
 
-                df_filtered.to_csv(f"../data/quality_data/all/{filename}",index=False)
+                print(f"File: {file_path} filtered")
+                for partition, kg_ids in kgs_by_partition.items():
+                    missing_identifiers = set(kg_ids) - identifiers_in_csv
+                    if partition == 'all':
+                        print(f"{len(missing_identifiers)} KGs not analyzed by KGHeartBeat")
+                    else:
+                        print(f"For topic: {partition} {len(missing_identifiers)} KGs not analyzed by KGHB")
@@ -1,39 +1,18 @@
 import os
 import json
+import glob
 import pandas as pd
 import re
-import requests
-from SPARQLWrapper import *
-from SPARQLWrapper import SPARQLWrapper
-from fair_vocabularies import fair_vocabularies
-from scipy.stats import shapiro
+import paths
+from quality_data import FAIR_VOCABULARIES
+from lodcloud_index import get_lodcloud_index
+import snapshot_store
 
-def check_if_ontology(kg_id,path_to_lodcloud_data_to_use = '../data/lodcloud.json'):
-    here = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(here,path_to_lodcloud_data_to_use), "r", encoding="utf-8") as file:
-        lodcloud_data = json.load(file)
-    
-    for key in lodcloud_data:
-        dataset = lodcloud_data[key]
-        if kg_id == dataset['identifier']:
-            keywords = dataset.get('keywords','')
-            if 'ontology' in keywords:
-                return True
-            else: 
-                return False
+def check_if_ontology(kg_id,path_to_lodcloud_data_to_use = None):
+    return get_lodcloud_index(path_to_lodcloud_data_to_use).is_ontology(kg_id)
             
-def recover_doi_from_lodcloud(kg_id, path_to_lodcloud_data_to_use = '../data/lodcloud.json'):
-    here = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(here,path_to_lodcloud_data_to_use), "r", encoding="utf-8") as file:
-        lodcloud_data = json.load(file)
-    for key in lodcloud_data:
-        kg_metadata = lodcloud_data[key]
-        if kg_id == kg_metadata['identifier']:
-            doi = kg_metadata.get('doi','')
-            if doi != '':
-                return 1
-            else:
-                return 0
+def recover_doi_from_lodcloud(kg_id, path_to_lodcloud_data_to_use = None):
+    return get_lodcloud_index(path_to_lodcloud_data_to_use).has_doi(kg_id)
 
 def check_publisher_info(row):
     author_query = 1 if pd.notna(row['Author (query)']) and row['Author (query)'] not in ['[]', '-'] else 0
@@ -58,71 +37,6 @@ def check_publisher_info(row):
 
     return 1 if author_query or author_metadata or contributors or  publishers or sources else 0
 
-def check_at_least_sparql_on(sparql_url):
-    '''
-    Check if the SPARQL endpoint return a 200 status, also if the sparql editor is not interoperable
-    '''
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-
-        response = requests.get(sparql_url, headers=headers, timeout=10,verify=False)
-
-        if 200 <= response.status_code < 300:
-            return 1
-        else:
-            return 0
-        
-    except requests.exceptions.RequestException as e:
-        # Handle any exceptions that may occur
-        return 0
-
-def check_meta_in_sparql(endpoint_url):
-    sparql = SPARQLWrapper(endpoint_url)
-    query = """
-    PREFIX void: <http://rdfs.org/ns/void#>
-    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-    PREFIX dcat: <http://www.w3.org/ns/dcat#>
-
-    SELECT DISTINCT ?s
-    WHERE {
-    {
-        ?s a void:Dataset .
-    }
-    UNION
-    {
-        ?s a dcat:Dataset .
-    }
-    }
-    """
-    sparql.setQuery(query)
-    sparql.setTimeout(5)
-    sparql.setReturnFormat(JSON)
-    try:
-        results = sparql.query().convert()
-        if isinstance(results,dict):
-            result = results.get('results')
-            bindings = result.get('bindings')
-            if isinstance(bindings,list) and len(bindings) > 0:
-                return 1
-            else:
-                return 0
-        elif isinstance(results,Document):
-            li = []
-            literalList = results.getElementsByTagName('literal')
-            numTags = results.getElementsByTagName("literal").length
-            for i in range(numTags):
-                if literalList[i].firstChild is not None:
-                    literal = literalList[i].firstChild.nodeValue
-                    li.append(literal)
-            if len(li) > 0:
-                return 1
-            else:
-                return 0
-    except:
-        return 0
-
 def check_if_fair_vocabs(vocabs):
     vocabs = vocabs.replace('[','')
     vocabs = vocabs.replace(']','')
@@ -133,34 +47,54 @@ def check_if_fair_vocabs(vocabs):
         vocab = vocab.strip()
         vocab = vocab.replace("'","")
         vocab = vocab.replace('"',"")
-        if vocab in fair_vocabularies:
+        if vocab in FAIR_VOCABULARIES:
             fair_vocabularies_defined.append(vocab)
     return len(fair_vocabularies_defined) / total_vocabs if total_vocabs > 0 else 0
 
-def verify_normal_distribution(csv_file_path,columns_to_verify):
-    df = pd.read_csv(csv_file_path)
-    for col in columns_to_verify:
-        data = df[col].dropna() 
-        stat, p = shapiro(data)
-        print(f'Statistic: {stat}, p-value: {p}')
-        if p < 0.05:
-            print("Not all column are normally distributed")
-            return False
-    print("All column are normally distributed")
-    return True
-
-def get_always_observed_ids(first_analysis):
-    all_ids = {}
+always_observed_ids = {}
 
-    df = pd.read_csv(first_analysis)
-
-    if 'KG id' not in df.columns:
-        return []  
+def get_always_observed_ids(snapshots_path = None):
+    '''
+        Return the ids of the KGs observed by KGHeartBeat in every snapshot (the intersection across all the snapshot CSVs).
+        The set is computed once, memoized and persisted in always_observed_ids.json next to the snapshots; it is computed again only if a snapshot changes.
 
-    for _, row in df.iterrows():
-        kg_id = row['KG id']
-        
-        if kg_id not in all_ids:
-            all_ids[kg_id] = True
-    print(f"All ids: {len(all_ids)}")
-    return list(all_ids.keys())
\ No newline at end of file
+        :param snapshots_path: folder with the snapshot CSVs of the 'all' subcloud (None for the one in the data root).
+    '''
+    snapshots_path = snapshots_path if snapshots_path is not None else paths.data_path('quality_data', 'all')
+    snapshot_files = sorted(glob.glob(os.path.join(snapshots_path, '*.csv')))
+    snapshots = {os.path.basename(snapshot_file): [os.stat(snapshot_file).st_size, os.stat(snapshot_file).st_mtime_ns] for snapshot_file in snapshot_files}
+    key = os.path.abspath(snapshots_path)
+    if key in always_observed_ids and always_observed_ids[key][0] == snapshots:
+        return always_observed_ids[key][1]
+
+    ids_file_path = os.path.join(snapshots_path, 'always_observed_ids.json')
+    if os.path.exists(ids_file_path):
+        with open(ids_file_path, "r", encoding="utf-8") as file:
+            persisted = json.load(file)
+        if persisted['snapshots'] == snapshots:
+            ids = frozenset(persisted['ids'])
+            always_observed_ids[key] = (snapshots, ids)
+            return ids
+
+    ids = None
+    for snapshot_file in snapshot_files:
+        try:
+            snapshot_ids = set(snapshot_store.read_snapshot(snapshot_file, usecols=['KG id'])['KG id'].dropna())
+        except ValueError:
+            snapshot_ids = set() # No KG id column
+        ids = snapshot_ids if ids is None else ids & snapshot_ids
+    ids = frozenset(ids if ids is not None else [])
+    print(f"KGs observed in all the {len(snapshot_files)} snapshots: {len(ids)}")
+
+    tmp_file_path = f'{ids_file_path}.tmp{os.getpid()}'
+    with open(tmp_file_path, 'w', encoding='utf-8') as file:
+        json.dump({'snapshots': snapshots, 'ids': sorted(ids, key=str)}, file, indent=4, ensure_ascii=False)
+    os.replace(tmp_file_path, ids_file_path)
+    always_observed_ids[key] = (snapshots, ids)
+    return ids
+
+def filter_always_observed(df, snapshots_path = None):
+    '''
+        Keep only the rows of the KGs observed in every snapshot (see get_always_observed_ids).
+    '''
+    return df[df['KG id'].isin(get_always_observed_ids(snapshots_path))]